@@ -1,11 +1,9 @@
-import os
 from dotenv import load_dotenv
 
 # Load .env file
 load_dotenv()
 
-# Now you can use os.environ to access environment variables
-polygon_key = os.environ.get("POLYGON_API_KEY")
-if not polygon_key:
-    raise EnvironmentError("POLYGON_API_KEY environment variable not found.")
+# The POLYGON_API_KEY is checked when a Polygon.io client is created, so commands
+# that don't call the API (and --help) work without it
+
 __version__ = "0.1.0"
\ No newline at end of file
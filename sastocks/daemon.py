@@ -0,0 +1,218 @@
+"""Long-running scheduler for the pipeline stages.
+
+Instead of starting a cold process for every cron tick, the daemon keeps the
+database engine, the Polygon.io connection pool, the sentiment backend and the
+ticker registry alive and runs each stage on its own interval. Every interval is stretched or shrunk
+by a random jitter so the stages don't fire in lockstep with other clients.
+
+SIGTERM and SIGINT set a stop event: the stage in progress finishes, and the
+daemon exits before starting another one. A stage that is killed outright
+resumes from its job checkpoints on the next run.
+"""
+
+import os
+import random
+import signal
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable, List, Optional
+
+from sastocks.console import console
+
+# Seconds between runs of each stage, 0 to disable a stage
+DAEMON_NEWS_INTERVAL = float(os.environ.get("DAEMON_NEWS_INTERVAL", 15 * 60))
+DAEMON_FINANCE_INTERVAL = float(os.environ.get("DAEMON_FINANCE_INTERVAL", 60 * 60))
+DAEMON_SENTIMENT_INTERVAL = float(os.environ.get("DAEMON_SENTIMENT_INTERVAL", 10 * 60))
+
+# Fraction of the interval that runs are moved earlier or later at random
+DAEMON_JITTER = float(os.environ.get("DAEMON_JITTER", 0.1))
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[[], object]
+    interval: float
+    # Monotonic time of the next run; the first run is due right away
+    next_run: float = 0.0
+    runs: int = 0
+    failures: int = 0
+
+
+def next_delay(interval: float, jitter: float, rng: random.Random) -> float:
+    """
+    Pick the delay until the next run of a stage.
+
+    Args:
+        interval (float): The nominal seconds between runs.
+        jitter (float): The fraction of the interval to move the run by, at most.
+        rng (random.Random): The source of randomness.
+
+    Returns:
+        float: The seconds to wait.
+    """
+    return interval * (1 + rng.uniform(-jitter, jitter))
+
+
+def install_signal_handlers(stop: threading.Event):
+    """Set `stop` on SIGTERM and SIGINT instead of exiting mid-stage."""
+
+    def handle(signum, frame):
+        console.info(
+            f"Received {signal.Signals(signum).name}, stopping after the current stage..."
+        )
+        stop.set()
+
+    signal.signal(signal.SIGTERM, handle)
+    signal.signal(signal.SIGINT, handle)
+
+
+def run_stages(
+    stages: List[Stage],
+    stop: threading.Event,
+    jitter: float = DAEMON_JITTER,
+    rng: Optional[random.Random] = None,
+    clock: Callable[[], float] = time.monotonic,
+):
+    """
+    Run the stages on their intervals until `stop` is set.
+
+    A stage that raises is logged and scheduled again as usual, so one failing
+    stage doesn't take the others down.
+
+    Args:
+        stages (List[Stage]): The stages to run; stages with an interval of 0 are skipped.
+        stop (threading.Event): The event that ends the loop.
+        jitter (float): The fraction of each interval to move runs by, at most.
+        rng (Optional[random.Random]): The source of randomness for the jitter.
+        clock (Callable[[], float]): The monotonic clock to schedule with.
+    """
+    rng = rng or random.Random()
+    stages = [stage for stage in stages if stage.interval > 0]
+    if not stages:
+        console.info("No stages to run.")
+        return
+    while not stop.is_set():
+        for stage in sorted(stages, key=lambda stage: stage.next_run):
+            if stop.is_set() or stage.next_run > clock():
+                continue
+            console.info(f"Running the {stage.name} stage...")
+            started = clock()
+            try:
+                stage.run()
+            except Exception as e:
+                stage.failures += 1
+                console.error(f"The {stage.name} stage failed: {e}")
+            stage.runs += 1
+            stage.next_run = clock() + next_delay(stage.interval, jitter, rng)
+            console.info(
+                f"Finished the {stage.name} stage in {clock() - started:.1f}s, "
+                f"next run in {stage.next_run - clock():.0f}s."
+            )
+        wait = min(stage.next_run for stage in stages) - clock()
+        if wait > 0:
+            stop.wait(wait)
+    console.info("Daemon stopped.")
+
+
+def recent_window() -> tuple:
+    """The (yesterday, today) date range that the stages pull on every run."""
+    today = date.today()
+    return (today - timedelta(days=1)).isoformat(), today.isoformat()
+
+
+def run_daemon(
+    news_interval: float = DAEMON_NEWS_INTERVAL,
+    finance_interval: float = DAEMON_FINANCE_INTERVAL,
+    sentiment_interval: float = DAEMON_SENTIMENT_INTERVAL,
+    jitter: float = DAEMON_JITTER,
+    backend_name: Optional[str] = None,
+    stop: Optional[threading.Event] = None,
+):
+    """
+    Run the news, finance and sentiment stages until SIGTERM or SIGINT.
+
+    Args:
+        news_interval (float): The seconds between news pulls, 0 to disable them.
+        finance_interval (float): The seconds between price pulls, 0 to disable them.
+        sentiment_interval (float): The seconds between sentiment runs, 0 to disable them.
+        jitter (float): The fraction of each interval to move runs by, at most.
+        backend_name (Optional[str]): The sentiment backend, SENTIMENT_BACKEND when not given.
+        stop (Optional[threading.Event]): The event that stops the daemon, one set by the
+            signal handlers when not given.
+    """
+    from sastocks.polygon_client import PolygonClient
+    from sastocks.pull_financials import pull_financials
+    from sastocks.pull_news import polygon_key, pull_news
+
+    backend = None
+    if sentiment_interval > 0:
+        from sastocks.sentiment_backends import get_backend
+
+        backend = get_backend(backend_name)
+        if not backend.persists:
+            raise ValueError(
+                f"The {backend.name} backend doesn't save its results, "
+                "so it can't run as a scheduled stage."
+            )
+
+    if stop is None:
+        stop = threading.Event()
+        install_signal_handlers(stop)
+
+    # One client, and so one connection pool, is shared by every run of every stage
+    polygon_client = PolygonClient(api_key=polygon_key)
+    sentiment_cache = None
+    # Every run starts over rather than resuming the checkpoints of a failed one, so
+    # a ticker or date that keeps failing can't stop the others from being refreshed
+    stages = [
+        Stage(
+            "news",
+            lambda: pull_news(
+                recent_window(), resume=False, polygon_client=polygon_client
+            ),
+            news_interval,
+        ),
+        Stage(
+            "finance",
+            lambda: pull_financials(
+                recent_window(), resume=False, polygon_client=polygon_client
+            ),
+            finance_interval,
+        ),
+    ]
+    if sentiment_interval > 0:
+        from sastocks.pull_sentiment import (
+            SENTIMENT_CACHE_MAX_BYTES,
+            SENTIMENT_CACHE_PATH,
+            do_news_sentiment_analysis,
+        )
+        from sastocks.response_cache import ResponseCache
+
+        sentiment_cache = ResponseCache(SENTIMENT_CACHE_PATH, SENTIMENT_CACHE_MAX_BYTES)
+        stages.append(
+            Stage(
+                "sentiment",
+                lambda: do_news_sentiment_analysis(
+                    cache=sentiment_cache, backend=backend
+                ),
+                sentiment_interval,
+            )
+        )
+
+    console.info(
+        "Starting the daemon: "
+        + ", ".join(
+            f"{stage.name} every {stage.interval:.0f}s"
+            for stage in stages
+            if stage.interval > 0
+        )
+    )
+    try:
+        run_stages(stages, stop, jitter=jitter)
+    finally:
+        polygon_client.close()
+        if sentiment_cache:
+            sentiment_cache.close()
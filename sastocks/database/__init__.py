@@ -1,26 +1,196 @@
 """Database initialization for SAStocks.
 
-This module sets up the SQLAlchemy engine and session factory for interacting with the database.
+This module sets up the SQLAlchemy engine and session factory for interacting with the database,
+and the unit of work that lets ingestion, finance and sentiment code share a session.
 """
 
 import os
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+from typing import Optional
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
 
 # Constants for the database file and path
 DATABASE_FILE_NAME = "sastocks_db.sqlite"
 DATABASE_PATH = os.path.join(os.path.dirname(__file__), "../../", DATABASE_FILE_NAME)
 
-# Construct the database URL for SQLite
-DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+# Construct the database URL, the SQLite file next to the package unless configured otherwise
+DATABASE_URL = os.environ.get("SASTOCKS_DATABASE_URL", f"sqlite:///{DATABASE_PATH}")
+
+# PRAGMAs applied to every new SQLite connection, by profile name
+SQLITE_PROFILES = {
+    # Readers don't block the writer under WAL, and commits only fsync at checkpoints
+    "performance": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        # Negative sizes are in KiB, so 64 MB of page cache
+        "cache_size": -64 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    # SQLite's own defaults
+    "default": {},
+}
+
+SQLITE_PROFILE = os.environ.get("SASTOCKS_SQLITE_PROFILE", "performance")
+
+
+def apply_sqlite_profile(engine: Engine, profile: str = SQLITE_PROFILE):
+    """
+    Apply a SQLite PRAGMA profile to every connection the engine opens.
+
+    Args:
+        engine (Engine): The engine to configure. Engines of other dialects are left alone.
+        profile (str): A profile name from SQLITE_PROFILES.
+    """
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(
+            f"Invalid SQLite profile: {profile}. Use one of: {', '.join(SQLITE_PROFILES)}."
+        )
+    if engine.dialect.name != "sqlite" or not SQLITE_PROFILES[profile]:
+        return
+    pragmas = SQLITE_PROFILES[profile]
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def build_engine(url: str = DATABASE_URL, profile: str = SQLITE_PROFILE) -> Engine:
+    """
+    Create an engine for the database URL, tuned with the SQLite profile when it applies.
+
+    Args:
+        url (str): The SQLAlchemy database URL.
+        profile (str): A profile name from SQLITE_PROFILES.
+
+    Returns:
+        Engine: The configured engine.
+    """
+    engine = create_engine(url, echo=False)
+    apply_sqlite_profile(engine, profile)
+    return engine
+
 
 # Create the SQLAlchemy engine
-engine = create_engine(DATABASE_URL, echo=False)
+engine = build_engine()
 
-# Create a scoped session factory using the engine
+# Create a session factory using the engine
 DatabaseSession = sessionmaker(bind=engine)
-# Session = scoped_session(session_factory)
 
-# Create a session object from the session factory
-# session = Session()
+# Thread-local session for reads made outside of a unit of work
+ScopedSession = scoped_session(DatabaseSession)
+
+# The session of the unit of work active in the current thread or task
+_current_session: ContextVar[Optional[Session]] = ContextVar(
+    "current_session", default=None
+)
+
+
+class UnitOfWork(ContextDecorator):
+    """Share one session, and its transaction, across a block of database work.
+
+    Use it as a context manager::
+
+        with unit_of_work(batch_size=100) as uow:
+            uow.session.add(...)
+            uow.checkpoint()
+
+    or as a decorator (`@unit_of_work()`). A unit of work opened while another one
+    is active joins it, so helpers can open their own without knowing whether they
+    run inside a larger job. Only the outermost unit, the owner, ends transactions:
+    it commits on success, rolls back on error, and always closes its session.
+    `commit` and `checkpoint` are the owner's explicit commit points for long
+    batches; in a joined unit they only flush, so a helper never commits its
+    caller's work part-way through.
+    """
+
+    def __init__(self, batch_size: Optional[int] = None):
+        """
+        Args:
+            batch_size (Optional[int]): The number of checkpoints after which to commit.
+        """
+        self.batch_size = batch_size
+        self.session: Optional[Session] = None
+        self._token = None
+        self._pending = 0
+
+    def _recreate_cm(self):
+        # Every decorated call gets its own unit of work
+        return UnitOfWork(self.batch_size)
+
+    @property
+    def owner(self) -> bool:
+        """Whether this unit opened the session, rather than joining an active unit."""
+        return self._token is not None
+
+    def __enter__(self) -> "UnitOfWork":
+        session = _current_session.get()
+        if session is None:
+            # Loaded objects stay usable after batch commits and after the unit closes
+            session = DatabaseSession(expire_on_commit=False)
+            self._token = _current_session.set(session)
+        self.session = session
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.owner:
+            # A failed block can leave the shared transaction unusable, so the work
+            # since the owner's last commit point is rolled back with it
+            if exc_type is not None:
+                self.session.rollback()
+            return False
+        try:
+            if exc_type is None:
+                self.session.commit()
+            else:
+                self.session.rollback()
+        finally:
+            self.session.close()
+            _current_session.reset(self._token)
+            self._token = None
+            # Release the thread-local read session along with the unit
+            ScopedSession.remove()
+        return False
+
+    def commit(self):
+        """Commit the work done so far, or only flush it in a joined unit."""
+        if self.owner:
+            self.session.commit()
+        else:
+            # The owner decides when the shared transaction commits
+            self.session.flush()
+        self._pending = 0
+
+    def checkpoint(self, count: int = 1) -> bool:
+        """
+        Record finished work and commit once `batch_size` items are pending.
+
+        Args:
+            count (int): The number of items finished since the last checkpoint.
+
+        Returns:
+            bool: Whether a commit was made.
+        """
+        self._pending += count
+        if self.batch_size and self._pending >= self.batch_size:
+            self.commit()
+            return True
+        return False
+
+
+def unit_of_work(batch_size: Optional[int] = None) -> UnitOfWork:
+    """Open a unit of work, or join the one already active."""
+    return UnitOfWork(batch_size)
+
+
+def get_session() -> Session:
+    """Get the session of the active unit of work, or the thread-local read session."""
+    return _current_session.get() or ScopedSession()
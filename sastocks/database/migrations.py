@@ -0,0 +1,228 @@
+"""Schema migrations for the SAStocks database.
+
+Each migration has a version number and an upgrade function that receives an open
+connection. The versions applied so far are recorded in the `schema_version`
+table, so `upgrade` only runs the missing ones and an existing database evolves in
+place instead of being rebuilt. Migrations check the schema before changing it, so
+they also apply cleanly to a database created from the current models.
+"""
+
+from datetime import datetime, timezone
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from sastocks.database import engine as default_engine
+from sastocks.models import (
+    Base,
+    IndicatorState,
+    Job,
+    JobCheckpoint,
+    NewsArticle,
+    NewsWatermark,
+    SentimentScore,
+)
+
+SCHEMA_VERSION_TABLE = "schema_version"
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def create_tables(connection: Connection):
+    """Create the tables that don't exist yet."""
+    Base.metadata.create_all(bind=connection)
+
+
+def create_index(connection: Connection, table, name: str):
+    """Create an index declared on a model table, unless it already exists."""
+    index = next(index for index in table.indexes if index.name == name)
+    index.create(bind=connection, checkfirst=True)
+
+
+def add_column(connection: Connection, table, name: str):
+    """Add a column declared on a model table, unless it already exists."""
+    existing = {
+        column["name"] for column in inspect(connection).get_columns(table.name)
+    }
+    if name in existing:
+        return
+    column = table.columns[name]
+    column_type = column.type.compile(dialect=connection.dialect)
+    connection.execute(
+        text(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}")
+    )
+
+
+def has_unique_key(connection: Connection, table_name: str, columns: List[str]) -> bool:
+    """Check whether a unique constraint or index covers exactly the given columns."""
+    inspector = inspect(connection)
+    keys = inspector.get_unique_constraints(table_name) + [
+        index for index in inspector.get_indexes(table_name) if index["unique"]
+    ]
+    return any(key["column_names"] == columns for key in keys)
+
+
+def add_hot_path_indexes(connection: Connection):
+    """Index the news dedupe and backlog lookups and make price rows unique per day."""
+    for name in (
+        "ix_news_article_url",
+        "ix_news_article_ticker_id",
+        "ix_news_article_unscored",
+    ):
+        create_index(connection, NewsArticle.__table__, name)
+
+    if not has_unique_key(connection, "sentiment_scores", ["ticker_id", "date"]):
+        # Keep the latest row of every ticker and date before enforcing uniqueness
+        connection.execute(
+            text(
+                "DELETE FROM sentiment_scores WHERE id NOT IN "
+                "(SELECT MAX(id) FROM sentiment_scores GROUP BY ticker_id, date)"
+            )
+        )
+        connection.execute(
+            text(
+                "CREATE UNIQUE INDEX uq_sentiment_scores_ticker_date "
+                "ON sentiment_scores (ticker_id, date)"
+            )
+        )
+
+
+def add_news_clusters(connection: Connection):
+    """Add the near-duplicate fingerprint and cluster of news articles."""
+    table = NewsArticle.__table__
+    add_column(connection, table, "simhash")
+    add_column(connection, table, "cluster_id")
+    create_index(connection, table, "ix_news_article_cluster_id")
+
+
+def add_vader_scores(connection: Connection):
+    """Add the VADER compound score of news articles and its backlog index."""
+    table = NewsArticle.__table__
+    add_column(connection, table, "vader_compound")
+    create_index(connection, table, "ix_news_article_vader_unscored")
+
+
+def add_news_watermarks(connection: Connection):
+    """Add the table of per-ticker news ingestion watermarks."""
+    NewsWatermark.__table__.create(bind=connection, checkfirst=True)
+
+
+def add_jobs(connection: Connection):
+    """Add the tables of resumable jobs and their completed units."""
+    for table in (Job.__table__, JobCheckpoint.__table__):
+        table.create(bind=connection, checkfirst=True)
+
+
+def add_indicator_state(connection: Connection):
+    """Add the table of per-ticker RSI and MACD state for incremental updates."""
+    IndicatorState.__table__.create(bind=connection, checkfirst=True)
+
+
+def add_news_watermark_coverage(connection: Connection):
+    """Add how far back each news watermark holds without gaps."""
+    add_column(connection, NewsWatermark.__table__, "covered_from")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Create the initial tables", create_tables),
+    Migration(2, "Add hot-path indexes", add_hot_path_indexes),
+    Migration(3, "Add news near-duplicate clusters", add_news_clusters),
+    Migration(4, "Add news VADER compound scores", add_vader_scores),
+    Migration(5, "Add per-ticker news watermarks", add_news_watermarks),
+    Migration(6, "Add job checkpoints", add_jobs),
+    Migration(7, "Add incremental indicator state", add_indicator_state),
+    Migration(8, "Add news watermark coverage", add_news_watermark_coverage),
+]
+
+
+def ensure_version_table(connection: Connection):
+    connection.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} ("
+            "version INTEGER PRIMARY KEY, description TEXT NOT NULL, "
+            "applied_at TEXT NOT NULL)"
+        )
+    )
+
+
+def current_version(engine: Engine = default_engine) -> int:
+    """
+    Get the schema version of the database.
+
+    Args:
+        engine (Engine): The engine of the database to inspect.
+
+    Returns:
+        int: The version of the latest applied migration, 0 for an unversioned database.
+    """
+    with engine.begin() as connection:
+        ensure_version_table(connection)
+        version = connection.execute(
+            text(f"SELECT MAX(version) FROM {SCHEMA_VERSION_TABLE}")
+        ).scalar()
+    return version or 0
+
+
+def require_current(engine: Engine = default_engine):
+    """
+    Check that every migration has been applied, so writes that rely on the
+    newer constraints, such as the upserts on (ticker_id, date), don't fail
+    halfway through a run.
+
+    Args:
+        engine (Engine): The engine of the database to check.
+
+    Raises:
+        RuntimeError: When the database is behind the latest migration.
+    """
+    version = current_version(engine)
+    latest = MIGRATIONS[-1].version
+    if version < latest:
+        command = "sastocks db init" if version == 0 else "sastocks db upgrade"
+        raise RuntimeError(
+            f"The database schema is at version {version}, the code needs version "
+            f"{latest}. Run `{command}` first."
+        )
+
+
+def upgrade(
+    engine: Engine = default_engine, target: Optional[int] = None
+) -> List[Migration]:
+    """
+    Apply the pending migrations, each in its own transaction.
+
+    Args:
+        engine (Engine): The engine of the database to upgrade.
+        target (Optional[int]): The version to stop at, the latest when not given.
+
+    Returns:
+        List[Migration]: The migrations applied.
+    """
+    version = current_version(engine)
+    pending = [
+        migration
+        for migration in MIGRATIONS
+        if migration.version > version
+        and (target is None or migration.version <= target)
+    ]
+    for migration in pending:
+        with engine.begin() as connection:
+            migration.upgrade(connection)
+            connection.execute(
+                text(
+                    f"INSERT INTO {SCHEMA_VERSION_TABLE} "
+                    "(version, description, applied_at) "
+                    "VALUES (:version, :description, :applied_at)"
+                ),
+                {
+                    "version": migration.version,
+                    "description": migration.description,
+                    "applied_at": datetime.now(timezone.utc).isoformat(),
+                },
+            )
+    return pending
@@ -0,0 +1,179 @@
+"""Local RSI and MACD calculations over stored close prices.
+
+Every series is a row of a 2D array (one row per ticker, one column per trading
+day), so a single pass over the dates updates the indicators of the whole ticker
+universe at once. Missing closes are NaN: the indicator state of that ticker is
+carried over and its output for the day is NaN.
+
+RSI uses Wilder's smoothing, seeded with the simple average of the first `window`
+changes. MACD is the difference between the short and long exponential moving
+averages of the close, with an exponential moving average of the MACD as signal.
+"""
+
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+DEFAULT_RSI_WINDOW = int(os.environ.get("RSI_WINDOW", 14))
+DEFAULT_MACD_SHORT_WINDOW = int(os.environ.get("MACD_SHORT_WINDOW", 12))
+DEFAULT_MACD_LONG_WINDOW = int(os.environ.get("MACD_LONG_WINDOW", 26))
+DEFAULT_MACD_SIGNAL_WINDOW = int(os.environ.get("MACD_SIGNAL_WINDOW", 9))
+
+
+class IndicatorValues(NamedTuple):
+    rsi: np.ndarray
+    macd: np.ndarray
+    signal: np.ndarray
+    histogram: np.ndarray
+
+
+class IndicatorEngine:
+    """Incremental RSI/MACD state for a fixed set of series."""
+
+    # The per-series arrays that make up the state of the engine
+    STATE_FIELDS = (
+        "last_close",
+        "avg_gain",
+        "avg_loss",
+        "changes",
+        "closes_seen",
+        "macd_seen",
+        "ema_short",
+        "ema_long",
+        "ema_signal",
+    )
+
+    def __init__(
+        self,
+        n_series: int,
+        rsi_window: int = DEFAULT_RSI_WINDOW,
+        short_window: int = DEFAULT_MACD_SHORT_WINDOW,
+        long_window: int = DEFAULT_MACD_LONG_WINDOW,
+        signal_window: int = DEFAULT_MACD_SIGNAL_WINDOW,
+    ):
+        """
+        Args:
+            n_series (int): The number of series (tickers) updated together.
+            rsi_window (int): The window size for RSI calculation.
+            short_window (int): The short window size for MACD calculation.
+            long_window (int): The long window size for MACD calculation.
+            signal_window (int): The signal window size for MACD calculation.
+        """
+        if min(rsi_window, short_window, long_window, signal_window) < 1:
+            raise ValueError("Invalid window. Windows must be at least 1.")
+        if short_window >= long_window:
+            raise ValueError(
+                "Invalid MACD windows. The short window must be below the long window."
+            )
+        self.rsi_window = rsi_window
+        self.short_window = short_window
+        self.long_window = long_window
+        self.signal_window = signal_window
+
+        self.last_close = np.full(n_series, np.nan)
+        self.avg_gain = np.zeros(n_series)
+        self.avg_loss = np.zeros(n_series)
+        self.changes = np.zeros(n_series, dtype=np.int64)
+        self.closes_seen = np.zeros(n_series, dtype=np.int64)
+        self.macd_seen = np.zeros(n_series, dtype=np.int64)
+        self.ema_short = np.full(n_series, np.nan)
+        self.ema_long = np.full(n_series, np.nan)
+        self.ema_signal = np.full(n_series, np.nan)
+
+    def get_state(self, series: int) -> dict:
+        """The state of one series, to continue it later with set_state."""
+        return {name: getattr(self, name)[series].item() for name in self.STATE_FIELDS}
+
+    def set_state(self, series: int, state: dict):
+        """Continue one series from a state returned by get_state."""
+        for name in self.STATE_FIELDS:
+            getattr(self, name)[series] = state[name]
+
+    @staticmethod
+    def _ema(
+        previous: np.ndarray, values: np.ndarray, mask: np.ndarray, window: int
+    ) -> np.ndarray:
+        """Advance an exponential moving average where `mask` is set, seeding it if empty."""
+        alpha = 2.0 / (window + 1)
+        advanced = np.where(
+            np.isnan(previous), values, previous + alpha * (values - previous)
+        )
+        return np.where(mask, advanced, previous)
+
+    def update(self, closes: np.ndarray) -> IndicatorValues:
+        """
+        Feed one day of closes into every series.
+
+        Args:
+            closes (np.ndarray): One close per series, NaN where the series has no bar.
+
+        Returns:
+            IndicatorValues: The RSI, MACD, signal and histogram of the day, NaN while warming up.
+        """
+        closes = np.asarray(closes, dtype=float)
+        valid = ~np.isnan(closes)
+
+        # RSI: average gains and losses over the close-to-close changes
+        n = self.rsi_window
+        has_change = valid & ~np.isnan(self.last_close)
+        delta = np.where(has_change, closes - np.nan_to_num(self.last_close), 0.0)
+        gain = np.clip(delta, 0.0, None)
+        loss = np.clip(-delta, 0.0, None)
+        self.changes += has_change
+        seeding = has_change & (self.changes <= n)
+        smoothing = has_change & (self.changes > n)
+        count = np.maximum(self.changes, 1)
+        self.avg_gain = np.where(
+            seeding, self.avg_gain + (gain - self.avg_gain) / count, self.avg_gain
+        )
+        self.avg_loss = np.where(
+            seeding, self.avg_loss + (loss - self.avg_loss) / count, self.avg_loss
+        )
+        self.avg_gain = np.where(
+            smoothing, (self.avg_gain * (n - 1) + gain) / n, self.avg_gain
+        )
+        self.avg_loss = np.where(
+            smoothing, (self.avg_loss * (n - 1) + loss) / n, self.avg_loss
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi = 100.0 - 100.0 / (1.0 + self.avg_gain / self.avg_loss)
+        flat = np.where(self.avg_gain > 0, 100.0, 50.0)
+        rsi = np.where(self.avg_loss > 0, rsi, flat)
+        rsi = np.where(valid & (self.changes >= n), rsi, np.nan)
+        self.last_close = np.where(valid, closes, self.last_close)
+
+        # MACD: short EMA minus long EMA, smoothed again for the signal line
+        self.closes_seen += valid
+        self.ema_short = self._ema(self.ema_short, closes, valid, self.short_window)
+        self.ema_long = self._ema(self.ema_long, closes, valid, self.long_window)
+        macd_ready = valid & (self.closes_seen >= self.long_window)
+        macd = np.where(macd_ready, self.ema_short - self.ema_long, np.nan)
+        self.macd_seen += macd_ready
+        self.ema_signal = self._ema(
+            self.ema_signal, macd, macd_ready, self.signal_window
+        )
+        signal_ready = macd_ready & (self.macd_seen >= self.signal_window)
+        signal = np.where(signal_ready, self.ema_signal, np.nan)
+
+        return IndicatorValues(rsi, macd, signal, macd - signal)
+
+
+def compute_indicators(closes: np.ndarray, **windows) -> IndicatorValues:
+    """
+    Compute RSI and MACD over whole close series.
+
+    Args:
+        closes (np.ndarray): A (series, days) array of closes, NaN where a series has no bar.
+        **windows: The window sizes accepted by IndicatorEngine.
+
+    Returns:
+        IndicatorValues: (series, days) arrays of RSI, MACD, signal and histogram.
+    """
+    closes = np.atleast_2d(np.asarray(closes, dtype=float))
+    engine = IndicatorEngine(closes.shape[0], **windows)
+    days = [engine.update(closes[:, day]) for day in range(closes.shape[1])]
+    if not days:
+        empty = np.empty(closes.shape)
+        return IndicatorValues(empty, empty.copy(), empty.copy(), empty.copy())
+    return IndicatorValues(*(np.stack(values, axis=1) for values in zip(*days)))
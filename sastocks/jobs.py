@@ -0,0 +1,217 @@
+"""Resumable jobs for the long-running pipeline stages.
+
+A job is one run of a stage with a given set of parameters, such as the date
+range of a news pull. As each unit of work (a ticker, a date, or a ticker and a
+date) finishes, a checkpoint row is written. When a run is interrupted or some
+units fail, running the same command again resumes the unfinished job with the
+same stage and parameters, skipping the units that are already checkpointed.
+Units that can never succeed are checkpointed as skipped, so they don't keep
+the job open.
+"""
+
+import json
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import Iterator, Optional, Set, Tuple, Union
+
+from sqlalchemy import select, update
+
+from sastocks.console import console
+from sastocks.database import unit_of_work
+from sastocks.models import Job, JobCheckpoint
+
+RUNNING = "running"
+COMPLETED = "completed"
+ABANDONED = "abandoned"
+
+Unit = Tuple[Optional[int], Optional[str]]
+
+
+def now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def unit_key(
+    ticker_id: Optional[int] = None, day: Union[date, str, None] = None
+) -> Unit:
+    """Normalize a unit of work to the (ticker_id, ISO date) stored in checkpoints."""
+    if isinstance(day, (date, datetime)):
+        day = (day.date() if isinstance(day, datetime) else day).isoformat()
+    return ticker_id, day
+
+
+@dataclass
+class JobRun:
+    job_id: Optional[int]
+    stage: str
+    done: Set[Unit] = field(default_factory=set)
+    resumed: bool = False
+    failed: int = 0
+    skipped: int = 0
+
+    @property
+    def name(self) -> str:
+        """How the job is referred to in messages."""
+        if self.job_id is None:
+            return f"{self.stage} run"
+        return f"{self.stage} job #{self.job_id}"
+
+    def is_done(
+        self, ticker_id: Optional[int] = None, day: Union[date, str, None] = None
+    ) -> bool:
+        """Check whether a unit was completed by this job, in this run or an earlier one."""
+        return unit_key(ticker_id, day) in self.done
+
+    def mark_done(
+        self, ticker_id: Optional[int] = None, day: Union[date, str, None] = None
+    ):
+        """Checkpoint a completed unit, so a resumed run skips it."""
+        key = unit_key(ticker_id, day)
+        if key in self.done:
+            return
+        if self.job_id is None:
+            # An untracked run only keeps its checkpoints in memory
+            self.done.add(key)
+            return
+        with unit_of_work() as uow:
+            uow.session.add(
+                JobCheckpoint(job_id=self.job_id, ticker_id=key[0], date=key[1])
+            )
+            uow.commit()
+        self.done.add(key)
+
+    def mark_failed(self):
+        """Record a unit that failed, which keeps the job open for a retry."""
+        self.failed += 1
+
+    def mark_skipped(
+        self,
+        ticker_id: Optional[int] = None,
+        day: Union[date, str, None] = None,
+        reason: str = "",
+    ):
+        """Checkpoint a unit that can never succeed, such as an invalid symbol.
+
+        Unlike a failure it doesn't keep the job open, since retrying it is pointless.
+        """
+        console.error(f"{self.name}: skipping {reason}")
+        self.skipped += 1
+        self.mark_done(ticker_id, day)
+
+
+def params_key(params: dict) -> str:
+    """Serialize job parameters so equal parameters always match."""
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def start_job(stage: str, params: dict, resume: bool = True) -> JobRun:
+    """
+    Start a job, or resume the unfinished job with the same stage and parameters.
+
+    Args:
+        stage (str): The name of the stage.
+        params (dict): The parameters that define the work of the job.
+        resume (bool): Whether to resume an unfinished job. When False, an unfinished
+            job is abandoned and a fresh one started.
+
+    Returns:
+        JobRun: The job, with the units already completed.
+    """
+    key = params_key(params)
+    with unit_of_work() as uow:
+        unfinished = uow.session.scalars(
+            select(Job)
+            .where(Job.stage == stage, Job.params == key, Job.status == RUNNING)
+            .order_by(Job.id.desc())
+        ).first()
+        if unfinished is not None and resume:
+            done = set(
+                uow.session.execute(
+                    select(JobCheckpoint.ticker_id, JobCheckpoint.date).where(
+                        JobCheckpoint.job_id == unfinished.id
+                    )
+                ).all()
+            )
+            console.info(
+                f"Resuming {stage} job #{unfinished.id}: {len(done)} units already done."
+            )
+            return JobRun(unfinished.id, stage, {tuple(unit) for unit in done}, True)
+
+        if unfinished is not None:
+            uow.session.execute(
+                update(Job)
+                .where(Job.id == unfinished.id)
+                .values(status=ABANDONED, finished_at=now())
+            )
+        started = Job(stage=stage, params=key, status=RUNNING, started_at=now())
+        uow.session.add(started)
+        uow.commit()
+        return JobRun(started.id, stage)
+
+
+def finish_job(run: JobRun) -> bool:
+    """
+    Mark a job completed, unless some of its units failed.
+
+    Args:
+        run (JobRun): The job to finish.
+
+    Returns:
+        bool: Whether the job was completed.
+    """
+    if run.failed:
+        console.error(
+            f"{run.name}: {run.failed} units failed. "
+            "Run the same command again to retry them."
+        )
+        return False
+    if run.skipped:
+        console.error(f"{run.name}: {run.skipped} units skipped.")
+    if run.job_id is None:
+        return True
+    with unit_of_work() as uow:
+        uow.session.execute(
+            update(Job)
+            .where(Job.id == run.job_id)
+            .values(status=COMPLETED, finished_at=now())
+        )
+        uow.commit()
+    return True
+
+
+@contextmanager
+def job(
+    stage: str, params: dict, resume: bool = True, checkpoint: bool = True
+) -> Iterator[JobRun]:
+    """Run a block as a resumable job, completing it if the block succeeds.
+
+    Example::
+
+        with job("news", {"start": start, "end": end}) as run:
+            for ticker in tickers:
+                if run.is_done(ticker.id):
+                    continue
+                ...
+                run.mark_done(ticker.id)
+
+    Args:
+        stage (str): The name of the stage.
+        params (dict): The parameters that define the work of the job.
+        resume (bool): Whether to resume an unfinished job with the same parameters.
+        checkpoint (bool): Whether to record the job and its checkpoints at all. Runs
+            that keep their own progress, such as incremental news pulls, pass False.
+
+    Yields:
+        JobRun: The job.
+    """
+    run = start_job(stage, params, resume) if checkpoint else JobRun(None, stage)
+    try:
+        yield run
+    except BaseException:
+        console.error(
+            f"{run.name} stopped with {len(run.done)} units done. "
+            "Run the same command again to resume it."
+        )
+        raise
+    finish_job(run)
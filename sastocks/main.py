@@ -1,12 +1,16 @@
+import asyncio
 from datetime import date, timedelta
 
 import typer
 
-from sastocks.pull_financials import pull_financials
-from sastocks.pull_news import pull_news
-from sastocks.tickers import add_ticker
+# Commands import what they need when they run, so starting the CLI (and --help)
+# doesn't pay for SQLAlchemy, requests, NLTK or LangChain
 
 app = typer.Typer()
+db_app = typer.Typer(help="Manage the database schema.")
+app.add_typer(db_app, name="db")
+ticker_app = typer.Typer(help="Manage ticker symbols in the database.")
+app.add_typer(ticker_app, name="ticker")
 
 
 @app.callback()
@@ -16,20 +20,93 @@ def callback():
     """
 
 
-@app.command()
-def ticker(
-    action: str = typer.Argument(..., help="The action to perform: add or remove")
+def require_schema():
+    """
+    Stop with a hint when the database schema is behind the code.
+    """
+    from sastocks.database import migrations
+
+    try:
+        migrations.require_current()
+    except RuntimeError as e:
+        typer.echo(str(e), err=True)
+        raise typer.Exit(code=1)
+
+
+@db_app.command("init")
+def db_init():
+    """
+    Create the database schema, or bring an existing one up to date.
+    """
+    db_upgrade(target=None)
+
+
+@db_app.command("upgrade")
+def db_upgrade(
+    target: int = typer.Option(
+        None, "--target", help="The schema version to stop at, the latest by default"
+    )
 ):
     """
-    Manage ticker symbols in the database.
+    Apply the pending schema migrations.
     """
-    if action == "add":
-        symbol = typer.prompt("Enter the ticker symbol to add")
-        add_ticker(symbol)
-    elif action == "remove":
-        typer.echo("Remove functionality not implemented yet.")
-    else:
-        typer.echo("Invalid action. Please use 'add' or 'remove'.")
+    from sastocks.database import migrations
+
+    applied = migrations.upgrade(target=target)
+    for migration in applied:
+        typer.echo(f"Applied migration {migration.version}: {migration.description}")
+    typer.echo(f"Database is at schema version {migrations.current_version()}.")
+
+
+@ticker_app.command("add")
+def ticker_add():
+    """
+    Add a ticker symbol to the database.
+    """
+    require_schema()
+    from sastocks.tickers import add_ticker
+
+    symbol = typer.prompt("Enter the ticker symbol to add")
+    add_ticker(symbol)
+
+
+@ticker_app.command("remove")
+def ticker_remove():
+    """
+    Remove a ticker symbol from the database.
+    """
+    typer.echo("Remove functionality not implemented yet.")
+
+
+@ticker_app.command("import")
+def ticker_import(
+    path: str = typer.Argument(
+        ..., help="A CSV file with a ticker column, and optionally a name column"
+    ),
+    lookup: bool = typer.Option(
+        True,
+        "--lookup/--no-lookup",
+        help="Validate and name the symbols with the Polygon.io ticker reference list",
+    ),
+):
+    """
+    Add the tickers of a CSV file to the database in bulk.
+    """
+    require_schema()
+    from sastocks.tickers import import_tickers
+
+    import_tickers(path, lookup=lookup)
+
+
+@ticker_app.command("sync")
+def ticker_sync():
+    """
+    Refresh the ticker names from the Polygon.io ticker reference list.
+    """
+    require_schema()
+    from sastocks.tickers import sync_tickers
+
+    sync_tickers()
 
 
 @app.command()
@@ -44,11 +121,85 @@ def finance(
         "--end-date",
         help="The end date for news in YYYY-MM-DD format",
     ),
+    pool_size: int = typer.Option(
+        None,
+        "--pool-size",
+        min=1,
+        help="The number of keep-alive connections to keep open to Polygon.io "
+        "[default: POLYGON_POOL_SIZE or 10]",
+    ),
+    concurrency: int = typer.Option(
+        1,
+        "--concurrency",
+        min=1,
+        help="The number of requests in flight at once: dates of grouped daily prices, "
+        "or tickers with --backfill; above 1 uses the async client",
+    ),
+    cache: bool = typer.Option(
+        False,
+        "--cache/--no-cache",
+        help="Reuse Polygon.io responses stored on disk by earlier runs",
+    ),
+    backfill: bool = typer.Option(
+        False,
+        "--backfill",
+        help="Fetch the whole date range with one request per ticker",
+    ),
+    resume: bool = typer.Option(
+        True,
+        "--resume/--no-resume",
+        help="Continue an interrupted run with the same date range where it stopped",
+    ),
 ):
     """
     Load Daily Stock prices
     """
-    pull_financials((start_date, end_date))
+    require_schema()
+    from sastocks.polygon_client import DEFAULT_POOL_SIZE
+    from sastocks.pull_financials import (
+        backfill_financials,
+        backfill_financials_async,
+        pull_financials,
+        pull_financials_async,
+    )
+    from sastocks.response_cache import ResponseCache
+
+    pool_size = pool_size or DEFAULT_POOL_SIZE
+    response_cache = ResponseCache() if cache else None
+    if backfill and concurrency > 1:
+        asyncio.run(
+            backfill_financials_async(
+                (start_date, end_date),
+                concurrency=concurrency,
+                pool_size=pool_size,
+                cache=response_cache,
+                resume=resume,
+            )
+        )
+    elif backfill:
+        backfill_financials(
+            (start_date, end_date),
+            pool_size=pool_size,
+            cache=response_cache,
+            resume=resume,
+        )
+    elif concurrency > 1:
+        asyncio.run(
+            pull_financials_async(
+                (start_date, end_date),
+                concurrency=concurrency,
+                pool_size=pool_size,
+                cache=response_cache,
+                resume=resume,
+            )
+        )
+    else:
+        pull_financials(
+            (start_date, end_date),
+            pool_size=pool_size,
+            cache=response_cache,
+            resume=resume,
+        )
 
 
 @app.command()
@@ -63,9 +214,216 @@ def news(
         "--end-date",
         help="The end date for news in YYYY-MM-DD format",
     ),
+    pool_size: int = typer.Option(
+        None,
+        "--pool-size",
+        min=1,
+        help="The number of keep-alive connections to keep open to Polygon.io "
+        "[default: POLYGON_POOL_SIZE or 10]",
+    ),
+    concurrency: int = typer.Option(
+        1,
+        "--concurrency",
+        min=1,
+        help="The number of tickers to pull at once; above 1 uses the async client",
+    ),
+    full: bool = typer.Option(
+        False,
+        "--full",
+        help="Fetch the whole date range instead of only articles newer than "
+        "each ticker's watermark",
+    ),
+    resume: bool = typer.Option(
+        True,
+        "--resume/--no-resume",
+        help="Continue an interrupted --full run with the same date range where it "
+        "stopped; incremental runs always start from the watermarks",
+    ),
 ):
     """
     Load News
     """
-    pull_news((start_date, end_date))
+    require_schema()
+    from sastocks.polygon_client import DEFAULT_POOL_SIZE
+    from sastocks.pull_news import pull_news, pull_news_async
+
+    pool_size = pool_size or DEFAULT_POOL_SIZE
+    if concurrency > 1:
+        asyncio.run(
+            pull_news_async(
+                (start_date, end_date),
+                concurrency=concurrency,
+                pool_size=pool_size,
+                full=full,
+                resume=resume,
+            )
+        )
+    else:
+        pull_news((start_date, end_date), pool_size=pool_size, full=full, resume=resume)
     typer.echo("Loading news...")
+
+
+@app.command()
+def sentiment(
+    concurrency: int = typer.Option(
+        None,
+        "--concurrency",
+        min=1,
+        help="The number of model requests to keep in flight at once "
+        "[default: SENTIMENT_CONCURRENCY or 8]",
+    ),
+    batch_size: int = typer.Option(
+        None,
+        "--batch-size",
+        min=1,
+        help="The number of articles scored and written per batch "
+        "[default: SENTIMENT_COMMIT_BATCH or 50]",
+    ),
+    cache: bool = typer.Option(
+        True,
+        "--cache/--no-cache",
+        help="Reuse the model results of headlines scored by earlier runs",
+    ),
+    pack_size: int = typer.Option(
+        None,
+        "--pack-size",
+        min=1,
+        help="The number of headlines about one company sent per request "
+        "[default: SENTIMENT_PACK_SIZE or 1]",
+    ),
+    backend: str = typer.Option(
+        None,
+        "--backend",
+        help="The sentiment backend: langchain, vader or fake "
+        "[default: SENTIMENT_BACKEND or langchain]",
+    ),
+    dry_run: bool = typer.Option(
+        False,
+        "--dry-run",
+        help="Score without saving the results; always the case for vader and fake",
+    ),
+):
+    """
+    Score the sentiment of unscored news headlines
+    """
+    require_schema()
+    from sastocks.pull_sentiment import (
+        SENTIMENT_CACHE_MAX_BYTES,
+        SENTIMENT_CACHE_PATH,
+        SENTIMENT_COMMIT_BATCH,
+        SENTIMENT_CONCURRENCY,
+        SENTIMENT_PACK_SIZE,
+        do_news_sentiment_analysis,
+    )
+    from sastocks.response_cache import ResponseCache
+    from sastocks.sentiment_backends import get_backend
+
+    sentiment_cache = (
+        ResponseCache(SENTIMENT_CACHE_PATH, SENTIMENT_CACHE_MAX_BYTES)
+        if cache
+        else None
+    )
+    do_news_sentiment_analysis(
+        concurrency=concurrency or SENTIMENT_CONCURRENCY,
+        batch_size=batch_size or SENTIMENT_COMMIT_BATCH,
+        cache=sentiment_cache,
+        pack_size=pack_size or SENTIMENT_PACK_SIZE,
+        backend=get_backend(backend),
+        dry_run=dry_run,
+    )
+
+
+@app.command()
+def vader(
+    batch_size: int = typer.Option(
+        None,
+        "--batch-size",
+        min=1,
+        help="The number of articles scored and written per batch "
+        "[default: VADER_BATCH_SIZE or 2000]",
+    ),
+    workers: int = typer.Option(
+        None,
+        "--workers",
+        min=1,
+        help="The number of worker processes [default: VADER_WORKERS or the CPU count]",
+    ),
+):
+    """
+    Score the VADER sentiment of unscored news articles
+    """
+    require_schema()
+    from sastocks.pull_vader import (
+        VADER_BATCH_SIZE,
+        VADER_WORKERS,
+        do_vader_sentiment_analysis,
+    )
+
+    do_vader_sentiment_analysis(
+        batch_size=batch_size or VADER_BATCH_SIZE, workers=workers or VADER_WORKERS
+    )
+
+
+@app.command()
+def daemon(
+    news_interval: float = typer.Option(
+        None,
+        "--news-interval",
+        min=0,
+        help="Seconds between news pulls, 0 to disable them "
+        "[default: DAEMON_NEWS_INTERVAL or 900]",
+    ),
+    finance_interval: float = typer.Option(
+        None,
+        "--finance-interval",
+        min=0,
+        help="Seconds between price pulls, 0 to disable them "
+        "[default: DAEMON_FINANCE_INTERVAL or 3600]",
+    ),
+    sentiment_interval: float = typer.Option(
+        None,
+        "--sentiment-interval",
+        min=0,
+        help="Seconds between sentiment runs, 0 to disable them "
+        "[default: DAEMON_SENTIMENT_INTERVAL or 600]",
+    ),
+    jitter: float = typer.Option(
+        None,
+        "--jitter",
+        min=0,
+        max=1,
+        help="Fraction of each interval that runs are moved by at random "
+        "[default: DAEMON_JITTER or 0.1]",
+    ),
+    backend: str = typer.Option(
+        None,
+        "--backend",
+        help="The sentiment backend, one that saves its results such as langchain "
+        "[default: SENTIMENT_BACKEND or langchain]",
+    ),
+):
+    """
+    Run the news, finance and sentiment stages on a schedule until stopped
+    """
+    require_schema()
+    from sastocks.daemon import (
+        DAEMON_FINANCE_INTERVAL,
+        DAEMON_JITTER,
+        DAEMON_NEWS_INTERVAL,
+        DAEMON_SENTIMENT_INTERVAL,
+        run_daemon,
+    )
+
+    run_daemon(
+        news_interval=DAEMON_NEWS_INTERVAL if news_interval is None else news_interval,
+        finance_interval=(
+            DAEMON_FINANCE_INTERVAL if finance_interval is None else finance_interval
+        ),
+        sentiment_interval=(
+            DAEMON_SENTIMENT_INTERVAL
+            if sentiment_interval is None
+            else sentiment_interval
+        ),
+        jitter=DAEMON_JITTER if jitter is None else jitter,
+        backend_name=backend,
+    )
@@ -1,42 +1,92 @@
-from sqlalchemy import Column, Integer, String, Float
-from sqlalchemy import Date, ForeignKey
+from typing import List, Optional
+
+from sqlalchemy import BigInteger, Column, Integer, String, Float, text
+from sqlalchemy import Date, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.orm import relationship
 
-from sastocks.database import DatabaseSession, engine
+from sastocks.database import engine, get_session, unit_of_work
 
 
 class Base(DeclarativeBase):
     @classmethod
     def create(cls, **kw):
-        with DatabaseSession() as s:
+        with unit_of_work() as uow:
             obj = cls(**kw)
-            s.add(obj)
-            s.commit()
-            s.refresh(obj)
+            uow.session.add(obj)
+            uow.commit()
             return obj
 
     @classmethod
     def update(cls, id, **kwargs):
-        with DatabaseSession() as s:
-            obj = s.query(cls).get(id)
+        with unit_of_work() as uow:
+            obj = uow.session.get(cls, id)
             for key, value in kwargs.items():
                 setattr(obj, key, value)
-            s.commit()
-            s.refresh(obj)
+            uow.commit()
             return obj
 
     @classmethod
     def remove(cls, id):
-        with DatabaseSession() as s:
-            obj = s.query(cls).get(id)
-            s.delete(obj)
-            s.commit()
+        with unit_of_work() as uow:
+            obj = uow.session.get(cls, id)
+            uow.session.delete(obj)
+            uow.commit()
 
     @classmethod
     def query(cls):
-        return DatabaseSession().query(cls)
+        """Query through the active unit of work, or the thread-local read session."""
+        return get_session().query(cls)
+
+    @classmethod
+    def upsert(
+        cls,
+        rows: List[dict],
+        index_elements: List[str],
+        update_columns: Optional[List[str]] = None,
+    ) -> int:
+        """Insert rows, updating the rows that already exist, in a single transaction.
+
+        Uses INSERT ... ON CONFLICT DO UPDATE, so `index_elements` must match a unique
+        constraint of the table.
+
+        Args:
+            rows (List[dict]): The rows to write, all with the same keys.
+            index_elements (List[str]): The columns of the unique constraint to match on.
+            update_columns (Optional[List[str]]): The columns to overwrite on conflict,
+                by default every column in the rows except the index elements.
+
+        Returns:
+            int: The number of rows written.
+        """
+        if not rows:
+            return 0
+        dialect = {"sqlite": sqlite, "postgresql": postgresql}.get(engine.dialect.name)
+        if dialect is None:
+            raise NotImplementedError(
+                f"Upsert is not supported for the {engine.dialect.name} dialect."
+            )
+        if update_columns is None:
+            update_columns = [
+                key for key in rows[0] if key not in index_elements and key != "id"
+            ]
+
+        statement = dialect.insert(cls)
+        if update_columns:
+            statement = statement.on_conflict_do_update(
+                index_elements=index_elements,
+                set_={column: statement.excluded[column] for column in update_columns},
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=index_elements)
+
+        with unit_of_work() as uow:
+            # Executemany batches the rows into as few statements as the driver allows
+            uow.session.execute(statement, rows)
+            uow.commit()
+        return len(rows)
 
 
 class Ticker(Base):
@@ -52,6 +102,26 @@ class Ticker(Base):
 
 class NewsArticle(Base):
     __tablename__ = "news_article"
+    __table_args__ = (
+        # URL dedupe lookups during ingestion
+        Index("ix_news_article_url", "url"),
+        Index("ix_news_article_ticker_id", "ticker_id"),
+        # Only the articles still waiting for a GPT sentiment, for the scoring backlog scan
+        Index(
+            "ix_news_article_unscored",
+            "id",
+            sqlite_where=text("gpt_sentiment IS NULL"),
+            postgresql_where=text("gpt_sentiment IS NULL"),
+        ),
+        Index("ix_news_article_cluster_id", "cluster_id"),
+        # Only the articles still waiting for a VADER score
+        Index(
+            "ix_news_article_vader_unscored",
+            "id",
+            sqlite_where=text("vader_compound IS NULL"),
+            postgresql_where=text("vader_compound IS NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     date: Mapped[str] = mapped_column(Date)
@@ -64,8 +134,13 @@ class NewsArticle(Base):
     image_url: Mapped[str] = mapped_column(String, nullable=True)
     amp_url: Mapped[str] = mapped_column(String)
     vader_sentiment: Mapped[str] = Column(String)
+    # VADER compound score of the title and description, from -1 (bad) to 1 (good)
+    vader_compound: Mapped[float] = Column(Float, nullable=True)
     gpt_sentiment: Mapped[str] = Column(String)
     gpt_response: Mapped[str] = Column(String)
+    # SimHash of the title and description, and the near-duplicate story it belongs to
+    simhash: Mapped[int] = Column(BigInteger, nullable=True)
+    cluster_id: Mapped[int] = Column(BigInteger, nullable=True)
 
     ticker_id = Column(Integer, ForeignKey("ticker.id"))
     ticker: Mapped["Ticker"] = relationship("Ticker", back_populates="news_articles")
@@ -76,8 +151,67 @@ class NewsArticle(Base):
         )
 
 
+class NewsWatermark(Base):
+    """The newest article published_utc ingested for each ticker."""
+
+    __tablename__ = "news_watermark"
+
+    ticker_id: Mapped[int] = Column(Integer, ForeignKey("ticker.id"), primary_key=True)
+    # UTC timestamp in the YYYY-MM-DDTHH:MM:SSZ format of the news endpoint
+    published_utc: Mapped[str] = Column(String, nullable=False)
+    # Start of the window ingested without gaps up to published_utc, NULL if unknown
+    covered_from: Mapped[Optional[str]] = Column(String, nullable=True)
+
+    def __repr__(self) -> str:
+        return (
+            f"<NewsWatermark(ticker_id={self.ticker_id}, "
+            f"published_utc={self.published_utc}, covered_from={self.covered_from})>"
+        )
+
+
+class Job(Base):
+    """A run of a pipeline stage, resumable until it completes."""
+
+    __tablename__ = "job"
+    __table_args__ = (Index("ix_job_stage_params", "stage", "params"),)
+
+    id: Mapped[int] = Column(Integer, primary_key=True)
+    stage: Mapped[str] = Column(String, nullable=False)
+    # The parameters that define the work of the run, as canonical JSON
+    params: Mapped[str] = Column(String, nullable=False)
+    # running, completed or abandoned
+    status: Mapped[str] = Column(String, nullable=False)
+    started_at: Mapped[str] = Column(String, nullable=False)
+    finished_at: Mapped[str] = Column(String, nullable=True)
+
+    checkpoints = relationship("JobCheckpoint", back_populates="job")
+
+    def __repr__(self) -> str:
+        return f"<Job(id={self.id}, stage={self.stage}, status={self.status})>"
+
+
+class JobCheckpoint(Base):
+    """A unit of work of a job that has been completed: a ticker, a date, or both."""
+
+    __tablename__ = "job_checkpoint"
+    __table_args__ = (Index("ix_job_checkpoint_job_id", "job_id"),)
+
+    id: Mapped[int] = Column(Integer, primary_key=True)
+    job_id = Column(Integer, ForeignKey("job.id"), nullable=False)
+    ticker_id = Column(Integer, ForeignKey("ticker.id"), nullable=True)
+    date: Mapped[str] = Column(String, nullable=True)
+
+    job: Mapped["Job"] = relationship("Job", back_populates="checkpoints")
+
+    def __repr__(self) -> str:
+        return f"<JobCheckpoint(job_id={self.job_id}, ticker_id={self.ticker_id}, date={self.date})>"
+
+
 class SentimentScore(Base):
     __tablename__ = "sentiment_scores"
+    __table_args__ = (
+        UniqueConstraint("ticker_id", "date", name="uq_sentiment_scores_ticker_date"),
+    )
 
     id: Mapped[int] = Column(Integer, primary_key=True)
     date: Mapped[str] = Column(String)
@@ -100,4 +234,25 @@ class SentimentScore(Base):
         return f"<SentimentScore(ticker={self.ticker}, date={self.date})>"
 
 
-Base.metadata.create_all(bind=engine)
+class IndicatorState(Base):
+    """The RSI and MACD state of a ticker after the last close folded into it."""
+
+    __tablename__ = "indicator_state"
+
+    ticker_id: Mapped[int] = Column(Integer, ForeignKey("ticker.id"), primary_key=True)
+    # The last day folded in, and the indicator windows, as canonical JSON
+    date: Mapped[str] = Column(String, nullable=False)
+    params: Mapped[str] = Column(String, nullable=False)
+
+    last_close: Mapped[float] = Column(Float, nullable=True)
+    avg_gain: Mapped[float] = Column(Float, nullable=True)
+    avg_loss: Mapped[float] = Column(Float, nullable=True)
+    changes: Mapped[int] = Column(Integer, nullable=False)
+    closes_seen: Mapped[int] = Column(Integer, nullable=False)
+    macd_seen: Mapped[int] = Column(Integer, nullable=False)
+    ema_short: Mapped[float] = Column(Float, nullable=True)
+    ema_long: Mapped[float] = Column(Float, nullable=True)
+    ema_signal: Mapped[float] = Column(Float, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<IndicatorState(ticker_id={self.ticker_id}, date={self.date})>"
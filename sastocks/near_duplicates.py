@@ -0,0 +1,185 @@
+"""Near-duplicate detection for news articles.
+
+Wire stories are syndicated by many publishers with small wording changes, so
+exact URL or title matching misses them. Each article gets a 64-bit SimHash of
+the character 4-grams of its title and description: similar texts produce
+fingerprints that differ in only a few bits. Character grams are used rather
+than words because headlines are short, and a single changed word would move
+too many word features at once.
+
+SimHashIndex finds earlier fingerprints within `max_distance` bits without
+comparing against every article. The fingerprint is split into 8 bands of 8
+bits, and two fingerprints that differ in at most 7 bits must agree on at least
+one band, so only articles sharing a band are compared.
+"""
+
+import hashlib
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+FINGERPRINT_BITS = 64
+BANDS = 8
+BAND_BITS = FINGERPRINT_BITS // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+# The largest number of differing bits for two articles to count as the same story.
+# Keep it below BANDS so every near-duplicate shares at least one band. Rewordings
+# of one story land within about 5 bits, while the same template with the opposite
+# news ("rise"/"fall", "beat"/"miss") lands 8 or more bits away.
+DEFAULT_MAX_DISTANCE = int(os.environ.get("NEWS_CLUSTER_MAX_DISTANCE", 5))
+
+GRAM_SIZE = 4
+
+NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+
+BIT_POSITIONS = np.arange(FINGERPRINT_BITS, dtype=np.uint64)
+
+
+def features(text: str) -> Counter:
+    """Count the character 4-grams of a text, ignoring case and punctuation."""
+    normalized = NON_ALPHANUMERIC.sub(" ", text.lower()).strip()
+    if len(normalized) <= GRAM_SIZE:
+        return Counter([normalized] if normalized else [])
+    return Counter(
+        normalized[i : i + GRAM_SIZE] for i in range(len(normalized) - GRAM_SIZE + 1)
+    )
+
+
+def simhash(text: str) -> int:
+    """
+    Fingerprint a text so that similar texts get fingerprints a few bits apart.
+
+    Args:
+        text (str): The text to fingerprint.
+
+    Returns:
+        int: An unsigned 64-bit fingerprint, 0 for a text without letters or digits.
+    """
+    counts = features(text)
+    if not counts:
+        return 0
+    hashes = np.array(
+        [
+            int.from_bytes(
+                hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(),
+                "big",
+            )
+            for feature in counts
+        ],
+        dtype=np.uint64,
+    )
+    weights = np.array(list(counts.values()), dtype=np.int64)
+    # Every feature votes for the bits set in its hash and against the others
+    bits = ((hashes[:, None] >> BIT_POSITIONS) & np.uint64(1)).astype(np.int64)
+    votes = (weights[:, None] * (2 * bits - 1)).sum(axis=0)
+    return sum(1 << int(bit) for bit in np.flatnonzero(votes > 0))
+
+
+def article_fingerprint(title: Optional[str], description: Optional[str]) -> int:
+    """Fingerprint an article from its title and description."""
+    return simhash(f"{title or ''} {description or ''}")
+
+
+def to_signed(fingerprint: int) -> int:
+    """Map an unsigned 64-bit fingerprint onto the signed range of a database BIGINT."""
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+
+def to_unsigned(value: int) -> int:
+    """Map a stored BIGINT back onto the unsigned fingerprint."""
+    return value + (1 << 64) if value < 0 else value
+
+
+class SimHashIndex:
+    """LSH index from fingerprints to the cluster of their story."""
+
+    def __init__(self, max_distance: int = DEFAULT_MAX_DISTANCE):
+        """
+        Args:
+            max_distance (int): The largest number of differing bits within a cluster.
+        """
+        if not 0 <= max_distance < BANDS:
+            raise ValueError(
+                f"Invalid max distance. It must be between 0 and {BANDS - 1}."
+            )
+        self.max_distance = max_distance
+        self.buckets: List[Dict[int, List[Tuple[int, int]]]] = [
+            {} for _ in range(BANDS)
+        ]
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self.buckets[0].values())
+
+    @staticmethod
+    def _bands(fingerprint: int) -> List[int]:
+        return [
+            (fingerprint >> (band * BAND_BITS)) & BAND_MASK for band in range(BANDS)
+        ]
+
+    def find(self, fingerprint: int) -> Optional[int]:
+        """
+        Find the cluster of the closest indexed fingerprint.
+
+        Args:
+            fingerprint (int): The unsigned fingerprint to look up.
+
+        Returns:
+            Optional[int]: The cluster id, or None when no fingerprint is close enough.
+        """
+        best = None
+        for band, key in enumerate(self._bands(fingerprint)):
+            for other, cluster_id in self.buckets[band].get(key, ()):
+                distance = bin(fingerprint ^ other).count("1")
+                if distance <= self.max_distance and (
+                    best is None or distance < best[0]
+                ):
+                    best = distance, cluster_id
+        return best[1] if best else None
+
+    def add(self, fingerprint: int, cluster_id: int):
+        """Index a fingerprint under a cluster."""
+        for band, key in enumerate(self._bands(fingerprint)):
+            self.buckets[band].setdefault(key, []).append((fingerprint, cluster_id))
+
+    def assign(self, fingerprint: int) -> int:
+        """
+        Index a fingerprint and return its cluster, starting a new one if needed.
+
+        A new cluster is identified by the signed fingerprint of its first article.
+
+        Args:
+            fingerprint (int): The unsigned fingerprint of the article.
+
+        Returns:
+            int: The cluster id.
+        """
+        cluster_id = self.find(fingerprint)
+        if cluster_id is None:
+            cluster_id = to_signed(fingerprint)
+        self.add(fingerprint, cluster_id)
+        return cluster_id
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: Iterable[Tuple[int, int]],
+        max_distance: int = DEFAULT_MAX_DISTANCE,
+    ) -> "SimHashIndex":
+        """
+        Build an index from stored (simhash, cluster_id) pairs.
+
+        Args:
+            rows (Iterable[Tuple[int, int]]): The signed fingerprints and clusters of stored articles.
+            max_distance (int): The largest number of differing bits within a cluster.
+
+        Returns:
+            SimHashIndex: The populated index.
+        """
+        index = cls(max_distance)
+        for fingerprint, cluster_id in rows:
+            index.add(to_unsigned(fingerprint), cluster_id)
+        return index
@@ -1,17 +1,270 @@
+import asyncio
 import os
 import re
-from typing import Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date as date_type
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+from functools import partial
+from typing import AsyncIterator, Iterator, Optional
+from zoneinfo import ZoneInfo
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from sastocks.rate_limiter import RateLimiter, default_rate_limiter
+from sastocks.response_cache import ResponseCache
 
 # Load the Polygon API key from the environment variable
 API_KEY = os.environ.get("POLYGON_API_KEY")
 BASE_URL = "https://api.polygon.io"
 
+# Number of keep-alive connections held open to the API host
+DEFAULT_POOL_SIZE = int(os.environ.get("POLYGON_POOL_SIZE", 10))
+
+# Number of requests the async client keeps in flight at once
+DEFAULT_CONCURRENCY = int(os.environ.get("POLYGON_CONCURRENCY", 8))
+
+# Number of times a request answered with 429 Too Many Requests is retried
+DEFAULT_MAX_RETRIES = int(os.environ.get("POLYGON_MAX_RETRIES", 5))
+
+# Largest page the news endpoint will return
+NEWS_PAGE_LIMIT = 1000
+
+# Largest number of base aggregates the aggregates endpoint will return
+AGGREGATES_LIMIT = 50000
+
+# Largest page the ticker reference endpoint will return
+TICKERS_PAGE_LIMIT = 1000
+
+# Seconds a cached response about the current trading day stays fresh
+TODAY_CACHE_TTL = int(os.environ.get("POLYGON_TODAY_CACHE_TTL", 300))
+
+# Alphanumeric symbols, with the share class after a dot for class shares such as BRK.B
+TICKER_PATTERN = re.compile(r"^[A-Za-z0-9]+(\.[A-Za-z0-9]+)?$")
+
+# The exchange time zone and closing hour that decide when a trading day is over
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+MARKET_CLOSE_HOUR = 16
+
+# Seconds after the close before a day's data is treated as final and cached forever,
+# leaving room for after-hours trading and late corrections
+MARKET_SETTLE_GRACE = int(os.environ.get("POLYGON_MARKET_SETTLE_GRACE", 6 * 60 * 60))
+
+# Seconds cached reference data (ticker details) stays fresh
+REFERENCE_CACHE_TTL = 24 * 60 * 60
+
+
+def market_day_settled(day: date_type, now: Optional[datetime] = None) -> bool:
+    """
+    Check whether a trading day is over in New York, grace period included.
+
+    Args:
+        day (date): The trading day.
+        now (Optional[datetime]): The current time, timezone-aware; the clock when not given.
+
+    Returns:
+        bool: Whether the day's data is final.
+    """
+    close = datetime(
+        day.year, day.month, day.day, MARKET_CLOSE_HOUR, tzinfo=MARKET_TIMEZONE
+    )
+    now = now or datetime.now(MARKET_TIMEZONE)
+    return now >= close + timedelta(seconds=MARKET_SETTLE_GRACE)
+
+
+def has_results(data: dict) -> bool:
+    """Check whether a response is final and carries data, so replaying it is safe."""
+    if data.get("status") != "OK":
+        return False
+    # The open-close endpoint returns its prices at the top level instead of in results
+    return bool(data.get("results")) or "close" in data
+
+
+class InvalidTickerError(ValueError):
+    """A ticker symbol the API can never answer for, so retrying it is pointless."""
+
+
+def validate_ticker(ticker: str):
+    """
+    Check a ticker symbol before it is put in a request.
+
+    Args:
+        ticker (str): The ticker symbol.
+
+    Raises:
+        InvalidTickerError: If the symbol isn't alphanumeric, save for a class suffix.
+    """
+    if not isinstance(ticker, str) or not TICKER_PATTERN.match(ticker):
+        raise InvalidTickerError(
+            "Invalid ticker symbol. Ticker must be alphanumeric, "
+            "with an optional class suffix such as BRK.B."
+        )
+
 
 class PolygonClient:
-    def __init__(self, api_key: str = API_KEY):
+    def __init__(
+        self,
+        api_key: str = API_KEY,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        rate_limiter: Optional[RateLimiter] = None,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        cache: Optional[ResponseCache] = None,
+    ):
+        if not api_key:
+            raise EnvironmentError("POLYGON_API_KEY environment variable not found.")
         self.api_key = api_key
+        self.pool_size = pool_size
+        self.session = self._build_session(pool_size)
+        # Share the process-wide limiter unless the caller brings its own budget
+        self.rate_limiter = rate_limiter or default_rate_limiter
+        self.max_retries = max_retries
+        self.cache = cache
+
+    @staticmethod
+    def _build_session(pool_size: int) -> requests.Session:
+        """
+        Build a pooled HTTP session shared by every endpoint of the client.
+
+        Args:
+            pool_size (int): The maximum number of connections kept alive in the pool.
+
+        Returns:
+            requests.Session: A session reusing TCP/TLS connections across calls.
+        """
+        if pool_size < 1:
+            raise ValueError("Invalid pool size. Pool size must be at least 1.")
+        session = requests.Session()
+        # Block instead of opening throwaway connections when the pool is exhausted
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(
+            {"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"}
+        )
+        return session
+
+    @property
+    def stats(self) -> dict:
+        """The request, wait, and throttle counters of the client's rate limiter."""
+        return self.rate_limiter.snapshot()
+
+    @staticmethod
+    def _retry_after(response: requests.Response, attempt: int) -> float:
+        """
+        Work out how long to back off after a 429 response.
+
+        Args:
+            response (requests.Response): The throttled response.
+            attempt (int): The number of retries already made for the request.
+
+        Returns:
+            float: The number of seconds to wait, from `Retry-After` when the API sends it.
+        """
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return max(float(retry_after), 0.0)
+            except ValueError:
+                try:
+                    retry_at = parsedate_to_datetime(retry_after)
+                    return max(retry_at.timestamp() - time.time(), 0.0)
+                except (TypeError, ValueError):
+                    pass
+        # Fall back to exponential back-off capped at a minute
+        return float(min(2**attempt, 60))
+
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        """
+        Issue a rate limited GET request through the pooled session.
+
+        Requests answered with 429 Too Many Requests pause the shared rate limiter for
+        the `Retry-After` period and are retried up to `max_retries` times.
+        """
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            response = self.session.get(url, **kwargs)
+            if response.status_code != 429:
+                return response
+            if attempt >= self.max_retries:
+                response.raise_for_status()
+            self.rate_limiter.throttle(self._retry_after(response, attempt))
+            self.rate_limiter.record_retry()
+            attempt += 1
+
+    def _get_json(
+        self,
+        url: str,
+        cacheable: bool = False,
+        ttl: Optional[float] = None,
+        raise_for_status: bool = False,
+        **kwargs,
+    ) -> dict:
+        """
+        Issue a GET request and decode the JSON body, going through the response cache.
+
+        Args:
+            url (str): The request URL.
+            cacheable (bool): Whether the response may be served from and stored in the cache.
+            ttl (Optional[float]): Seconds a stored response stays fresh, None to keep it forever.
+            raise_for_status (bool): Whether to raise on an HTTP error instead of returning its body.
+            **kwargs: Extra arguments for the request, such as `params`.
+
+        Returns:
+            dict: The decoded API response.
+        """
+        if cacheable and self.cache:
+            key = self.cache.make_key(url, kwargs.get("params"))
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        response = self._get(url, **kwargs)
+        if raise_for_status and response.status_code != 200:
+            response.raise_for_status()
+        data = response.json()
+        if not (cacheable and self.cache):
+            return data
+        # Only successful responses are worth replaying, and only final ones forever;
+        # an empty or DELAYED answer about a past day is asked again later
+        if response.status_code == 200:
+            if ttl is None and not has_results(data):
+                ttl = TODAY_CACHE_TTL
+            self.cache.set(key, url.split("?")[0], data, ttl=ttl)
+        return data
+
+    @staticmethod
+    def _date_ttl(
+        day: Optional[str], now: Optional[datetime] = None
+    ) -> Optional[float]:
+        """
+        Pick the cache lifetime of a response about a given trading day.
+
+        Args:
+            day (Optional[str]): A date in YYYY-MM-DD format, or None for the latest data.
+            now (Optional[datetime]): The current time, timezone-aware; the clock when not given.
+
+        Returns:
+            Optional[float]: None (keep forever) for settled days, otherwise a short TTL.
+        """
+        if day and re.match(r"^\d{4}-\d{2}-\d{2}$", day):
+            if market_day_settled(date_type.fromisoformat(day), now):
+                return None
+        return TODAY_CACHE_TTL
+
+    def close(self):
+        """Close the pooled session and release its connections."""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def get_ticker_details(self, ticker: str) -> dict:
         """
@@ -23,12 +276,59 @@ class PolygonClient:
         Returns:
             dict: A dictionary containing the details of the ticker.
         """
-        # Validate and sanitize ticker input
-        if not isinstance(ticker, str) or not ticker.isalnum():
-            raise ValueError("Invalid ticker symbol. Ticker must be alphanumeric.")
+        validate_ticker(ticker)
         url = f"{BASE_URL}/v3/reference/tickers/{ticker.upper()}?&apiKey={self.api_key}"
-        response = requests.get(url)
-        return response.json()
+        return self._get_json(url, cacheable=True, ttl=REFERENCE_CACHE_TTL)
+
+    def get_tickers(
+        self,
+        market: str = "stocks",
+        active: bool = True,
+        limit: int = TICKERS_PAGE_LIMIT,
+        **filters,
+    ) -> dict:
+        """
+        Get a page of the ticker reference list.
+
+        Args:
+            market (str): The market to list tickers of.
+            active (bool): Whether to list only the tickers actively traded today.
+            limit (int): The number of results to return.
+            **filters: Other query parameters of the endpoint, such as `ticker` or `exchange`.
+
+        Returns:
+            dict: The API response containing the tickers.
+        """
+        params = {
+            "apiKey": self.api_key,
+            "market": market,
+            "active": str(active).lower(),
+            "limit": limit,
+            **filters,
+        }
+        url = f"{BASE_URL}/v3/reference/tickers"
+        return self._get_json(
+            url, cacheable=True, ttl=REFERENCE_CACHE_TTL, params=params
+        )
+
+    def iter_tickers(self, **kwargs) -> Iterator[dict]:
+        """
+        Get every ticker of the reference list, following `next_url`.
+
+        Args:
+            **kwargs: The filters accepted by get_tickers.
+
+        Yields:
+            dict: Each ticker of the API response pages.
+        """
+        page = self.get_tickers(**kwargs)
+        while True:
+            if page.get("status") != "OK":
+                raise RuntimeError(f"Error: {page.get('status')} - {page.get('error')}")
+            yield from page.get("results") or []
+            if not page.get("next_url"):
+                return
+            page = self.get_next_page(page["next_url"])
 
     def get_news(
         self,
@@ -38,6 +338,7 @@ class PolygonClient:
         order: str = None,
         limit: int = 10,
         sort: str = None,
+        published_utc_until: str = None,
     ) -> dict:
         """Get news for a single ticker with optional filters.
 
@@ -49,6 +350,7 @@ class PolygonClient:
             order (str): The order of the results.
             limit (int): The number of results to return.
             sort (str): The field to sort by.
+            published_utc_until (str): The latest UTC date and time to include (inclusive).
 
         Returns:
             dict: The API response containing news articles.
@@ -59,8 +361,7 @@ class PolygonClient:
             raise ValueError(
                 f"Invalid published_utc_operator: {published_utc_operator}. Allowed values are {allowed_operators}."
             )
-        if not isinstance(ticker, str) or not ticker.isalnum():
-            raise ValueError("Invalid ticker symbol. Ticker must be alphanumeric.")
+        validate_ticker(ticker)
 
         params = {
             "apiKey": self.api_key,
@@ -72,13 +373,70 @@ class PolygonClient:
         # Add published_utc filter if provided
         if published_utc:
             params[f"published_utc.{published_utc_operator}"] = published_utc
+        if published_utc_until:
+            params["published_utc.lte"] = published_utc_until
 
         # Filter out None values
         params = {k: v for k, v in params.items() if v is not None}
         url = f"{BASE_URL}/v2/reference/news"
-        response = requests.get(url, params=params)
+        response = self._get(url, params=params)
+        return response.json()
+
+    def get_next_page(self, next_url: str) -> dict:
+        """
+        Follow the `next_url` cursor of a paginated response.
+
+        Args:
+            next_url (str): The `next_url` value of the previous page.
+
+        Returns:
+            dict: The API response for the next page.
+        """
+        if not next_url.startswith(BASE_URL):
+            raise ValueError(f"Invalid next_url. It must point to {BASE_URL}.")
+        # The cursor URL carries every filter except the API key
+        response = self._get(next_url, params={"apiKey": self.api_key})
         return response.json()
 
+    def iter_news_pages(
+        self, ticker: str, limit: int = NEWS_PAGE_LIMIT, **kwargs
+    ) -> Iterator[dict]:
+        """
+        Get every page of news for a single ticker, following `next_url`.
+
+        Pages are fetched lazily, one request at a time, so only the page being
+        consumed is held in memory.
+
+        Args:
+            ticker (str): The ticker symbol to get news for.
+            limit (int): The number of results per page, the API maximum by default.
+            **kwargs: The filters accepted by get_news.
+
+        Yields:
+            dict: Each API response page; iteration stops after a page that is not OK.
+        """
+        page = self.get_news(ticker, limit=limit, **kwargs)
+        yield page
+        while page.get("status") == "OK" and page.get("next_url"):
+            page = self.get_next_page(page["next_url"])
+            yield page
+
+    def iter_news(self, ticker: str, **kwargs) -> Iterator[dict]:
+        """
+        Get every news article for a single ticker, page by page.
+
+        Args:
+            ticker (str): The ticker symbol to get news for.
+            **kwargs: The filters accepted by iter_news_pages.
+
+        Yields:
+            dict: Each news article in the API response pages.
+        """
+        for page in self.iter_news_pages(ticker, **kwargs):
+            if page.get("status") != "OK":
+                raise RuntimeError(f"Error: {page.get('status')} - {page.get('error')}")
+            yield from page.get("results", [])
+
     def get_open_close(self, ticker: str, date: str) -> dict:
         """
         Get the open and close prices for a single ticker on a given date.
@@ -90,15 +448,110 @@ class PolygonClient:
         Returns:
             dict: A dictionary containing the open and close prices along with other relevant information.
         """
-        # Validate and sanitize ticker input
-        if not isinstance(ticker, str) or not ticker.isalnum():
-            raise ValueError("Invalid ticker symbol. Ticker must be alphanumeric.")
+        validate_ticker(ticker)
         # Validate date format (YYYY-MM-DD)
         if not isinstance(date, str) or not re.match(r"\d{4}-\d{2}-\d{2}", date):
             raise ValueError("Invalid date format. Date must be in YYYY-MM-DD format.")
         url = f"{BASE_URL}/v1/open-close/{ticker.upper()}/{date}?adjusted=true&apiKey={self.api_key}"
-        response = requests.get(url)
-        return response.json()
+        return self._get_json(url, cacheable=True, ttl=self._date_ttl(date))
+
+    def get_grouped_daily(
+        self, date: str, adjusted: bool = True, include_otc: bool = False
+    ) -> dict:
+        """
+        Get the daily open, high, low, close and volume of every US stock for a given date.
+
+        Args:
+            date (str): The date to get the bars for in YYYY-MM-DD format.
+            adjusted (bool): Whether to adjust the results for splits.
+            include_otc (bool): Whether to include OTC securities.
+
+        Returns:
+            dict: The API response, with one result per ticker keyed by `T` (the symbol).
+        """
+        # Validate date format (YYYY-MM-DD)
+        if not isinstance(date, str) or not re.match(r"^\d{4}-\d{2}-\d{2}$", date):
+            raise ValueError("Invalid date format. Date must be in YYYY-MM-DD format.")
+        params = {
+            "adjusted": str(adjusted).lower(),
+            "include_otc": str(include_otc).lower(),
+            "apiKey": self.api_key,
+        }
+        url = f"{BASE_URL}/v2/aggs/grouped/locale/us/market/stocks/{date}"
+        return self._get_json(
+            url, cacheable=True, ttl=self._date_ttl(date), params=params
+        )
+
+    def get_aggregates(
+        self,
+        ticker: str,
+        from_date: str,
+        to_date: str,
+        multiplier: int = 1,
+        timespan: str = "day",
+        adjusted: bool = True,
+        sort: str = "asc",
+        limit: int = AGGREGATES_LIMIT,
+    ) -> dict:
+        """
+        Get aggregate bars for a single ticker over a date range.
+
+        Args:
+            ticker (str): The ticker symbol to get bars for.
+            from_date (str): The first day of the range in YYYY-MM-DD format.
+            to_date (str): The last day of the range in YYYY-MM-DD format.
+            multiplier (int): The size of the timespan multiplier.
+            timespan (str): The size of the time window, e.g. 'day'.
+            adjusted (bool): Whether to adjust the results for splits.
+            sort (str): The order of the results by timestamp, 'asc' or 'desc'.
+            limit (int): The maximum number of base aggregates, at most 50000.
+
+        Returns:
+            dict: The API response, with one bar per timespan in `results`.
+        """
+        validate_ticker(ticker)
+        for day in (from_date, to_date):
+            if not isinstance(day, str) or not re.match(r"^\d{4}-\d{2}-\d{2}$", day):
+                raise ValueError(
+                    "Invalid date format. Date must be in YYYY-MM-DD format."
+                )
+        params = {
+            "adjusted": str(adjusted).lower(),
+            "sort": sort,
+            "limit": limit,
+            "apiKey": self.api_key,
+        }
+        url = (
+            f"{BASE_URL}/v2/aggs/ticker/{ticker.upper()}/range/"
+            f"{multiplier}/{timespan}/{from_date}/{to_date}"
+        )
+        return self._get_json(
+            url, cacheable=True, ttl=self._date_ttl(to_date), params=params
+        )
+
+    def iter_aggregates(
+        self, ticker: str, from_date: str, to_date: str, **kwargs
+    ) -> Iterator[dict]:
+        """
+        Get every aggregate bar for a single ticker over a date range, following `next_url`.
+
+        Args:
+            ticker (str): The ticker symbol to get bars for.
+            from_date (str): The first day of the range in YYYY-MM-DD format.
+            to_date (str): The last day of the range in YYYY-MM-DD format.
+            **kwargs: The options accepted by get_aggregates.
+
+        Yields:
+            dict: Each bar of the API response pages.
+        """
+        page = self.get_aggregates(ticker, from_date, to_date, **kwargs)
+        while True:
+            if page.get("status") not in ("OK", "DELAYED"):
+                raise RuntimeError(f"Error: {page.get('status')} - {page.get('error')}")
+            yield from page.get("results") or []
+            if not page.get("next_url"):
+                return
+            page = self.get_next_page(page["next_url"])
 
     def get_rsi(
         self,
@@ -149,11 +602,13 @@ class PolygonClient:
                     "Invalid timestamp format. Must be YYYY-MM-DD or a millisecond timestamp."
                 )
         url = f"{BASE_URL}/v1/indicators/rsi/{ticker.upper()}"
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            response.raise_for_status()
+        return self._get_json(
+            url,
+            cacheable=True,
+            ttl=self._date_ttl(timestamp),
+            raise_for_status=True,
+            params=params,
+        )
 
     def get_macd(
         self,
@@ -210,8 +665,113 @@ class PolygonClient:
                     "Invalid timestamp format. Must be YYYY-MM-DD or a millisecond timestamp."
                 )
         url = f"{BASE_URL}/v1/indicators/macd/{ticker.upper()}"
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            response.raise_for_status()
+        return self._get_json(
+            url,
+            cacheable=True,
+            ttl=self._date_ttl(timestamp),
+            raise_for_status=True,
+            params=params,
+        )
+
+
+class AsyncPolygonClient:
+    """Asyncio counterpart of PolygonClient with bounded concurrency.
+
+    Each call runs the matching PolygonClient method on a worker thread, so the
+    async client shares the pooled session (and its keep-alive connections) of the
+    sync client it wraps. A semaphore caps the number of requests in flight.
+    """
+
+    def __init__(
+        self,
+        api_key: str = API_KEY,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        pool_size: Optional[int] = None,
+        client: Optional[PolygonClient] = None,
+        cache: Optional[ResponseCache] = None,
+    ):
+        if concurrency < 1:
+            raise ValueError("Invalid concurrency. Concurrency must be at least 1.")
+        self.concurrency = concurrency
+        # Size the pool so every in-flight request can hold a connection
+        self.client = client or PolygonClient(
+            api_key=api_key,
+            pool_size=max(pool_size or DEFAULT_POOL_SIZE, concurrency),
+            cache=cache,
+        )
+        self.rate_limiter = self.client.rate_limiter
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="polygon"
+        )
+
+    async def _call(self, method, *args, **kwargs):
+        """Run a blocking client method on the executor once a slot is free."""
+        async with self.semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, partial(method, *args, **kwargs)
+            )
+
+    async def get_ticker_details(self, ticker: str) -> dict:
+        """Async version of PolygonClient.get_ticker_details."""
+        return await self._call(self.client.get_ticker_details, ticker)
+
+    async def get_news(self, ticker: str, **kwargs) -> dict:
+        """Async version of PolygonClient.get_news."""
+        return await self._call(self.client.get_news, ticker, **kwargs)
+
+    async def iter_news_pages(
+        self, ticker: str, limit: int = NEWS_PAGE_LIMIT, **kwargs
+    ) -> AsyncIterator[dict]:
+        """Async version of PolygonClient.iter_news_pages."""
+        page = await self.get_news(ticker, limit=limit, **kwargs)
+        yield page
+        while page.get("status") == "OK" and page.get("next_url"):
+            page = await self._call(self.client.get_next_page, page["next_url"])
+            yield page
+
+    async def get_open_close(self, ticker: str, date: str) -> dict:
+        """Async version of PolygonClient.get_open_close."""
+        return await self._call(self.client.get_open_close, ticker, date)
+
+    async def get_grouped_daily(self, date: str, **kwargs) -> dict:
+        """Async version of PolygonClient.get_grouped_daily."""
+        return await self._call(self.client.get_grouped_daily, date, **kwargs)
+
+    async def get_aggregates(
+        self, ticker: str, from_date: str, to_date: str, **kwargs
+    ) -> dict:
+        """Async version of PolygonClient.get_aggregates."""
+        return await self._call(
+            self.client.get_aggregates, ticker, from_date, to_date, **kwargs
+        )
+
+    async def list_aggregates(
+        self, ticker: str, from_date: str, to_date: str, **kwargs
+    ) -> list:
+        """Get every bar of PolygonClient.iter_aggregates in a single worker thread."""
+        return await self._call(
+            lambda: list(
+                self.client.iter_aggregates(ticker, from_date, to_date, **kwargs)
+            )
+        )
+
+    async def get_rsi(self, ticker: str, **kwargs) -> dict:
+        """Async version of PolygonClient.get_rsi."""
+        return await self._call(self.client.get_rsi, ticker, **kwargs)
+
+    async def get_macd(self, ticker: str, **kwargs) -> dict:
+        """Async version of PolygonClient.get_macd."""
+        return await self._call(self.client.get_macd, ticker, **kwargs)
+
+    def close(self):
+        """Shut down the worker threads and close the pooled session."""
+        self.executor.shutdown(wait=True)
+        self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
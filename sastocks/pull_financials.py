@@ -1,86 +1,560 @@
+import asyncio
+import bisect
+import json
 import os
-from datetime import datetime, timedelta
-from typing import Tuple
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from sqlalchemy.orm import sessionmaker
+import numpy as np
+from sqlalchemy import select, update
 
 from sastocks.console import console
-from sastocks.database import engine
-from sastocks.models import SentimentScore, Ticker
-from sastocks.polygon_client import PolygonClient
-
-# Create a session factory using the database engine from the config module
-DatabaseSession = sessionmaker(bind=engine)
+from sastocks.database import unit_of_work
+from sastocks.indicators import IndicatorEngine
+from sastocks.jobs import job
+from sastocks.models import IndicatorState, SentimentScore
+from sastocks.polygon_client import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_POOL_SIZE,
+    AsyncPolygonClient,
+    InvalidTickerError,
+    PolygonClient,
+)
+from sastocks.response_cache import ResponseCache
+from sastocks.ticker_registry import TickerRecord, ticker_registry
 
 # Load the Polygon API key from the environment variable
 API_KEY = os.environ.get("POLYGON_API_KEY")
 
-# Initialize the PolygonClient with the API key
-polygon_client = PolygonClient(api_key=API_KEY)
+
+def price_columns(bar: dict) -> dict:
+    """Map an aggregate bar from the API onto the SentimentScore price columns.
+
+    Aggregate bars carry no after-hours price, so that column is left out: new rows
+    get NULL, and an after-hours price stored earlier is not overwritten.
+
+    Args:
+        bar (dict): A bar with the `o`, `h`, `l`, `c` and `v` keys used by the aggregates endpoints.
+
+    Returns:
+        dict: The price columns of a SentimentScore row.
+    """
+    return {
+        "historical_price_high": bar.get("h"),
+        "historical_price_low": bar.get("l"),
+        "historical_price_open": bar.get("o"),
+        "historical_price_close": bar.get("c"),
+        "historical_price_volume": bar.get("v"),
+    }
+
+
+def match_grouped_daily(
+    grouped_data: dict, tickers: List[TickerRecord]
+) -> Dict[str, Tuple[TickerRecord, dict]]:
+    """Pick the bars of the tracked tickers out of a grouped daily response.
+
+    Args:
+        grouped_data (dict): The grouped daily API response for the whole market.
+        tickers (List[TickerRecord]): The tickers tracked in the database.
+
+    Returns:
+        Dict[str, Tuple[TickerRecord, dict]]: The tracked ticker and its bar, keyed by symbol.
+    """
+    if grouped_data.get("status") not in ("OK", "DELAYED"):
+        raise RuntimeError(
+            f"Error: {grouped_data.get('status')} - {grouped_data.get('error')}"
+        )
+    tracked = {}
+    for ticker in tickers:
+        # A symbol added twice resolves to its first row, as in the ticker registry
+        tracked.setdefault(ticker.symbol.upper(), ticker)
+    return {
+        bar["T"]: (tracked[bar["T"]], bar)
+        for bar in grouped_data.get("results") or []
+        if bar.get("T") in tracked
+    }
+
+
+def bar_date(bar: dict) -> date:
+    """Get the trading day of an aggregate bar from its millisecond `t` timestamp."""
+    return datetime.fromtimestamp(bar["t"] / 1000, tz=timezone.utc).date()
+
+
+def save_ticker_bars(ticker: TickerRecord, bars: Iterable[dict]) -> int:
+    """Save a range of daily bars for a ticker to the database in one transaction.
+
+    Args:
+        ticker (TickerRecord): The ticker the bars belong to.
+        bars (Iterable[dict]): The bars from the aggregates API response.
+
+    Returns:
+        int: The number of days written.
+    """
+    rows = [
+        {
+            "date": bar_date(bar).isoformat(),
+            "ticker_id": ticker.id,
+            **price_columns(bar),
+        }
+        for bar in bars
+    ]
+    return SentimentScore.upsert(rows, index_elements=["ticker_id", "date"])
+
+
+def save_daily_bars(
+    current_date: datetime, bars: Dict[str, Tuple[TickerRecord, dict]]
+) -> int:
+    """Save the prices of every tracked ticker for a day to the database in one transaction.
+
+    Args:
+        current_date (datetime): The day the data was pulled for.
+        bars (Dict[str, Tuple[TickerRecord, dict]]): The tracked tickers and their bars, as
+            returned by match_grouped_daily.
+
+    Returns:
+        int: The number of tickers written.
+    """
+    rows = [
+        {
+            "date": current_date.date().isoformat(),
+            "ticker_id": ticker.id,
+            **price_columns(bar),
+        }
+        for ticker, bar in bars.values()
+    ]
+    written = SentimentScore.upsert(rows, index_elements=["ticker_id", "date"])
+    console.info(
+        f"Saved financial data for {written} tickers on date: {current_date.date()}"
+    )
+    return written
+
+
+def indicator_params(**windows) -> str:
+    """Serialize the indicator windows, so a stored state is only reused with the same ones."""
+    engine = IndicatorEngine(0, **windows)
+    return json.dumps(
+        {
+            "rsi": engine.rsi_window,
+            "short": engine.short_window,
+            "long": engine.long_window,
+            "signal": engine.signal_window,
+        }
+    )
+
+
+def state_values(state: IndicatorState) -> dict:
+    """Read an engine state from a stored row, with NaN for empty floats."""
+    values = {}
+    for name in IndicatorEngine.STATE_FIELDS:
+        value = getattr(state, name)
+        values[name] = np.nan if value is None else value
+    return values
+
+
+def state_row(ticker_id: int, day: str, params: str, state: dict) -> dict:
+    """Build a stored row from an engine state, with NULL for NaN floats."""
+    row = {"ticker_id": ticker_id, "date": day, "params": params}
+    for name, value in state.items():
+        row[name] = None if isinstance(value, float) and np.isnan(value) else value
+    return row
+
+
+def update_indicators(start_date: datetime, end_date: datetime, **windows) -> int:
+    """Compute RSI and MACD locally and fill them in for every row in the date range.
+
+    Each ticker continues from its stored indicator state when that state ends
+    before `start_date`, so a run only reads and folds in the closes since then.
+    Tickers without a usable state, such as after a backfill of earlier dates, are
+    computed over their whole stored history up to `end_date`. Either way the
+    indicators of each date only depend on the closes known at that date. The state
+    stored for the next run is the one at the last close before `start_date`, so
+    running the same window again, or the next overlapping one, still continues
+    from it, and closes inside the window that are corrected later are folded in
+    again. No API calls are made.
+
+    Args:
+        start_date (datetime): The first day to fill in.
+        end_date (datetime): The last day to fill in.
+        **windows: The window sizes accepted by IndicatorEngine.
+
+    Returns:
+        int: The number of rows updated.
+    """
+    start_str = start_date.strftime("%Y-%m-%d")
+    end_str = end_date.strftime("%Y-%m-%d")
+    params = indicator_params(**windows)
+    columns = (
+        SentimentScore.id,
+        SentimentScore.ticker_id,
+        SentimentScore.date,
+        SentimentScore.historical_price_close,
+    )
+    with unit_of_work() as uow:
+        # The tickers whose stored state can be continued, and the day it ends on
+        states = {
+            state.ticker_id: state
+            for state in uow.session.scalars(
+                select(IndicatorState).where(
+                    IndicatorState.params == params, IndicatorState.date < start_str
+                )
+            )
+        }
+        resumed = list(states)
+
+        rows = []
+        if states:
+            since = min(state.date for state in states.values())
+            rows += [
+                row
+                for row in uow.session.execute(
+                    select(*columns).where(
+                        SentimentScore.ticker_id.in_(resumed),
+                        SentimentScore.date > since,
+                        SentimentScore.date <= end_str,
+                    )
+                )
+                if str(row.date) > states[row.ticker_id].date
+            ]
+        rows += uow.session.execute(
+            select(*columns).where(
+                SentimentScore.ticker_id.not_in(resumed),
+                SentimentScore.date <= end_str,
+            )
+        ).all()
+        if not rows:
+            return 0
+        rows.sort(key=lambda row: str(row.date))
+
+        # Lay the closes out as one row per ticker and one column per trading day
+        ticker_index = {
+            ticker_id: i for i, ticker_id in enumerate({row.ticker_id for row in rows})
+        }
+        date_index = {
+            day: i for i, day in enumerate(sorted({str(row.date) for row in rows}))
+        }
+        closes = np.full((len(ticker_index), len(date_index)), np.nan)
+        for row in rows:
+            if row.historical_price_close is not None:
+                closes[
+                    ticker_index[row.ticker_id], date_index[str(row.date)]
+                ] = row.historical_price_close
+
+        engine = IndicatorEngine(len(ticker_index), **windows)
+        for ticker_id, i in ticker_index.items():
+            if ticker_id in states:
+                engine.set_state(i, state_values(states[ticker_id]))
+        # Fold the closes before the window, keep the state there, then fold the window
+        window_start = bisect.bisect_left(sorted(date_index), start_str)
+        days = [engine.update(closes[:, day]) for day in range(window_start)]
+        before_window = {
+            ticker_id: engine.get_state(i) for ticker_id, i in ticker_index.items()
+        }
+        days += [
+            engine.update(closes[:, day])
+            for day in range(window_start, closes.shape[1])
+        ]
+        rsi = np.stack([values.rsi for values in days], axis=1)
+        macd = np.stack([values.macd for values in days], axis=1)
+
+        updates = []
+        last_day_before = {}
+        for row in rows:
+            if str(row.date) < start_str:
+                last_day_before[row.ticker_id] = str(row.date)
+            # Earlier rows of a recomputed ticker already have their indicators
+            if str(row.date) < start_str and row.ticker_id not in states:
+                continue
+            cell = ticker_index[row.ticker_id], date_index[str(row.date)]
+            updates.append(
+                {
+                    "id": row.id,
+                    "rsi": None if np.isnan(rsi[cell]) else float(rsi[cell]),
+                    "macd": None if np.isnan(macd[cell]) else float(macd[cell]),
+                }
+            )
+        if updates:
+            uow.session.execute(update(SentimentScore), updates)
+
+        # The state after the last close before the window, for the next run to
+        # continue; a ticker without closes before it keeps the state it had
+        IndicatorState.upsert(
+            [
+                state_row(ticker_id, day, params, before_window[ticker_id])
+                for ticker_id, day in last_day_before.items()
+            ],
+            index_elements=["ticker_id"],
+        )
+        uow.commit()
+
+    console.info(f"Updated RSI and MACD for {len(updates)} rows.")
+    return len(updates)
 
 
-def pull_financials(date_range: Tuple[str, str] = None):
-    """Pull financial data for all tickers and save them to the database."""
+def pull_financials(
+    date_range: Tuple[str, str] = None,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    cache: Optional[ResponseCache] = None,
+    resume: bool = True,
+    polygon_client: Optional[PolygonClient] = None,
+):
+    """Pull financial data for all tickers and save them to the database.
+
+    Each date is checkpointed once it is saved, so an interrupted run with the same
+    date range resumes with the remaining dates unless `resume` is False. A
+    long-running caller can pass its own `polygon_client` to keep its connections warm.
+    """
     console.info("Starting to pull financial data...")
+    if polygon_client is None:
+        # Initialize the PolygonClient with the API key and a pooled session
+        polygon_client = PolygonClient(
+            api_key=API_KEY, pool_size=pool_size, cache=cache
+        )
+
+    # Share one session for the run; it commits after every finished date
+    with unit_of_work() as uow:
+        # Parse the start and end dates from the date_range parameter
+        start_date = datetime.strptime(date_range[0], "%Y-%m-%d")
+        end_date = datetime.strptime(date_range[1], "%Y-%m-%d")
+
+        # Retrieve all tickers once from the registry, rather than once per day
+        tickers = ticker_registry.records()
+
+        # Iterate over each day within the date range
+        with job(
+            "finance", {"start": date_range[0], "end": date_range[1]}, resume
+        ) as run:
+            current_date = start_date
+            while current_date <= end_date:
+                date_str = current_date.strftime("%Y-%m-%d")
+                if run.is_done(day=date_str):
+                    current_date += timedelta(days=1)
+                    continue
+
+                # One grouped daily request covers the prices of the whole ticker universe
+                bars = match_grouped_daily(
+                    polygon_client.get_grouped_daily(date_str), tickers
+                )
+                if not bars:
+                    console.info(f"No trading data for {date_str}, skipping.")
+                    run.mark_done(day=date_str)
+                    uow.commit()
+                    current_date += timedelta(days=1)
+                    continue
+
+                # Write the whole day in one transaction
+                save_daily_bars(current_date, bars)
+                run.mark_done(day=date_str)
+                uow.commit()
+
+                # Move to the next day
+                current_date += timedelta(days=1)
+
+        # Indicators are derived from the stored closes rather than fetched
+        update_indicators(start_date, end_date)
+
+    console.info(f"Polygon.io usage: {polygon_client.rate_limiter.summary()}")
+    if cache:
+        console.info(f"Response cache: {cache.summary()}")
+    console.info("Finished pulling financial data.")
+
+
+async def pull_financials_async(
+    date_range: Tuple[str, str] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    cache: Optional[ResponseCache] = None,
+    resume: bool = True,
+):
+    """Pull financial data for up to `concurrency` dates at once.
+
+    Requests run concurrently; database writes stay on the event loop thread and
+    happen as each date's response arrives. Saved dates are checkpointed for `resume`.
+    """
+    console.info(
+        f"Starting to pull financial data with a concurrency of {concurrency}..."
+    )
+
     # Parse the start and end dates from the date_range parameter
     start_date = datetime.strptime(date_range[0], "%Y-%m-%d")
     end_date = datetime.strptime(date_range[1], "%Y-%m-%d")
+    dates = [
+        start_date + timedelta(days=offset)
+        for offset in range((end_date - start_date).days + 1)
+    ]
 
-    # Iterate over each day within the date range
-    current_date = start_date
-    while current_date <= end_date:
+    async def fetch(polygon_client: AsyncPolygonClient, current_date: datetime):
         date_str = current_date.strftime("%Y-%m-%d")
+        return current_date, await polygon_client.get_grouped_daily(date_str)
 
-        # Establish a session with the database
-
-        # Retrieve all tickers from the database
-        tickers = Ticker.query().all()
-
-        # Process each ticker
-        for ticker in tickers:
-            # Retrieve financial data using PolygonClient
-            rsi_data = polygon_client.get_rsi(ticker.symbol)
-            macd_data = polygon_client.get_macd(ticker.symbol)
-            open_close_data = polygon_client.get_open_close(ticker.symbol, date_str)
-
-            # Combine the data
-            combined_data = {
-                "date": current_date.date(),
-                "ticker_id": ticker.id,
-                "rsi": rsi_data.get("results", {}).get("values", [])[0].get("value"),
-                "macd": macd_data.get("results", {}).get("values", [])[0].get("value"),
-                "historical_price_high": open_close_data.get("high"),
-                "historical_price_low": open_close_data.get("low"),
-                "historical_price_open": open_close_data.get("open"),
-                "historical_price_close": open_close_data.get("close"),
-                "historical_price_after_hours": open_close_data.get("afterHours"),
-                "historical_price_volume": open_close_data.get("volume"),
-            }
-
-            # Check if there is already a record for this ticker and date
-            existing_score = (
-                SentimentScore.query()
-                .filter_by(ticker_id=ticker.id, date=combined_data["date"])
-                .first()
-            )
-            if existing_score:
-                # Update the existing record with the new data
-                existing_score.update(existing_score.id, kwargs=combined_data.items())
-                console.info(
-                    f"Updated financial data for ticker: {ticker.symbol} on date: {combined_data['date']}"
-                )
-            else:
-                # Create a new SentimentScore object with the combined data
-                SentimentScore().create(**combined_data)
-                console.info(
-                    f"Added new financial data for ticker: {ticker.symbol} on date: {combined_data['date']}"
-                )
+    # Share one session for the run; it commits after every finished unit
+    with unit_of_work() as uow:
+        async with AsyncPolygonClient(
+            api_key=API_KEY, concurrency=concurrency, pool_size=pool_size, cache=cache
+        ) as polygon_client:
+            # Retrieve all tickers from the registry
+            tickers = ticker_registry.records()
 
-            console.info(
-                f"Successfully pulled financial data for ticker: {ticker.symbol}"
-            )
+            params = {"start": date_range[0], "end": date_range[1]}
+            with job("finance", params, resume) as run:
+                # One grouped daily request per date covers the whole ticker universe
+                tasks = [
+                    fetch(polygon_client, current_date)
+                    for current_date in dates
+                    if not run.is_done(day=current_date)
+                ]
+                for next_result in asyncio.as_completed(tasks):
+                    try:
+                        current_date, grouped_data = await next_result
+                        bars = match_grouped_daily(grouped_data, tickers)
+                    except Exception as e:
+                        console.error(
+                            f"An error occurred while pulling financials: {e}"
+                        )
+                        run.mark_failed()
+                        continue
+                    if not bars:
+                        console.info(
+                            f"No trading data for {current_date.date()}, skipping."
+                        )
+                        run.mark_done(day=current_date)
+                        uow.commit()
+                        continue
+                    # Write the whole day in one transaction
+                    save_daily_bars(current_date, bars)
+                    run.mark_done(day=current_date)
+                    uow.commit()
 
-        # Move to the next day
-        current_date += timedelta(days=1)
+        # Indicators are derived from the stored closes rather than fetched
+        update_indicators(start_date, end_date)
 
+    console.info(f"Polygon.io usage: {polygon_client.rate_limiter.summary()}")
+    if cache:
+        console.info(f"Response cache: {cache.summary()}")
     console.info("Finished pulling financial data.")
+
+
+def backfill_financials(
+    date_range: Tuple[str, str] = None,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    cache: Optional[ResponseCache] = None,
+    resume: bool = True,
+):
+    """Backfill financial data with one range request per ticker for the whole date range.
+
+    Each ticker is checkpointed once its range is saved, so an interrupted backfill
+    of the same range resumes with the remaining tickers unless `resume` is False.
+    """
+    console.info("Starting to backfill financial data...")
+    # Initialize the PolygonClient with the API key and a pooled session
+    polygon_client = PolygonClient(api_key=API_KEY, pool_size=pool_size, cache=cache)
+
+    # Share one session for the run; it commits after every finished ticker
+    with unit_of_work() as uow:
+        # Retrieve all tickers from the registry
+        tickers = ticker_registry.records()
+
+        params = {"start": date_range[0], "end": date_range[1]}
+        with job("finance-backfill", params, resume) as run:
+            for i, ticker in enumerate(tickers, start=1):
+                if run.is_done(ticker.id):
+                    continue
+                try:
+                    bars = polygon_client.iter_aggregates(
+                        ticker.symbol, date_range[0], date_range[1]
+                    )
+                    days = save_ticker_bars(ticker, bars)
+                except InvalidTickerError as e:
+                    run.mark_skipped(ticker.id, reason=f"{ticker.symbol}: {e}")
+                    uow.commit()
+                    continue
+                except Exception as e:
+                    console.error(
+                        f"An error occurred while backfilling {ticker.symbol}: {e}"
+                    )
+                    run.mark_failed()
+                    continue
+                run.mark_done(ticker.id)
+                uow.commit()
+                console.info(f"Backfilled {days} days for ticker #{i}: {ticker.symbol}")
+
+        # Indicators are derived from the stored closes rather than fetched
+        update_indicators(
+            datetime.strptime(date_range[0], "%Y-%m-%d"),
+            datetime.strptime(date_range[1], "%Y-%m-%d"),
+        )
+
+    console.info(f"Polygon.io usage: {polygon_client.rate_limiter.summary()}")
+    if cache:
+        console.info(f"Response cache: {cache.summary()}")
+    console.info("Finished backfilling financial data.")
+
+
+async def backfill_financials_async(
+    date_range: Tuple[str, str] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    cache: Optional[ResponseCache] = None,
+    resume: bool = True,
+):
+    """Backfill financial data for up to `concurrency` tickers at once.
+
+    Saved tickers are checkpointed for `resume`, as in backfill_financials.
+    """
+    console.info(
+        f"Starting to backfill financial data with a concurrency of {concurrency}..."
+    )
+
+    async def fetch(polygon_client: AsyncPolygonClient, ticker: TickerRecord):
+        try:
+            bars = await polygon_client.list_aggregates(
+                ticker.symbol, date_range[0], date_range[1]
+            )
+        except Exception as e:
+            return ticker, None, e
+        return ticker, bars, None
+
+    # Share one session for the run; it commits after every finished unit
+    with unit_of_work() as uow:
+        async with AsyncPolygonClient(
+            api_key=API_KEY, concurrency=concurrency, pool_size=pool_size, cache=cache
+        ) as polygon_client:
+            # Retrieve all tickers from the registry
+            tickers = ticker_registry.records()
+
+            params = {"start": date_range[0], "end": date_range[1]}
+            with job("finance-backfill", params, resume) as run:
+                tasks = [
+                    fetch(polygon_client, ticker)
+                    for ticker in tickers
+                    if not run.is_done(ticker.id)
+                ]
+                for next_result in asyncio.as_completed(tasks):
+                    ticker, bars, error = await next_result
+                    try:
+                        if error:
+                            raise error
+                        days = save_ticker_bars(ticker, bars)
+                    except InvalidTickerError as e:
+                        run.mark_skipped(ticker.id, reason=f"{ticker.symbol}: {e}")
+                        uow.commit()
+                        continue
+                    except Exception as e:
+                        console.error(
+                            f"An error occurred while backfilling {ticker.symbol}: {e}"
+                        )
+                        run.mark_failed()
+                        continue
+                    run.mark_done(ticker.id)
+                    uow.commit()
+                    console.info(f"Backfilled {days} days for ticker: {ticker.symbol}")
+
+        # Indicators are derived from the stored closes rather than fetched
+        update_indicators(
+            datetime.strptime(date_range[0], "%Y-%m-%d"),
+            datetime.strptime(date_range[1], "%Y-%m-%d"),
+        )
+
+    console.info(f"Polygon.io usage: {polygon_client.rate_limiter.summary()}")
+    if cache:
+        console.info(f"Response cache: {cache.summary()}")
+    console.info("Finished backfilling financial data.")
@@ -1,159 +1,553 @@
 # Get required components
+import asyncio
 import os
-from datetime import datetime, timedelta
-from typing import List, Optional, Tuple
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from sqlalchemy import insert, select
 
 from sastocks.console import console
-from sastocks.models import NewsArticle
-from sastocks.models import Ticker
-from sastocks.polygon_client import PolygonClient
+from sastocks.database import unit_of_work
+from sastocks.jobs import job
+from sastocks.models import NewsArticle, NewsWatermark
+from sastocks.near_duplicates import SimHashIndex, article_fingerprint, to_signed
+from sastocks.polygon_client import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_POOL_SIZE,
+    AsyncPolygonClient,
+    InvalidTickerError,
+    PolygonClient,
+)
+from sastocks.ticker_registry import TickerRecord, ticker_registry
 
 # Load API keys from CSV
 polygon_key = os.environ.get("POLYGON_API_KEY")
 
+# Number of URLs checked against the database per query
+URL_LOOKUP_CHUNK = 500
+
+# Days of stored articles that new articles are matched against as near-duplicates
+CLUSTER_LOOKBACK_DAYS = int(os.environ.get("NEWS_CLUSTER_LOOKBACK_DAYS", 3))
+
 
-def load_tickers() -> List[Ticker]:
-    """Load all tickers from the database using the Ticker model.
+def load_tickers() -> List[TickerRecord]:
+    """Load all tickers from the ticker registry.
 
     Returns:
-        List[Ticker]: A list of Ticker objects.
+        List[TickerRecord]: The id, symbol and name of each ticker.
     """
-    tickers = Ticker.query().all()
-    return tickers
-
-
-def save_news_to_db(
-    date: datetime,
-    ticker: Ticker,
-    title: str,
-    description: str,
-    article_url: str,
-    author: str,
-    keywords: str,
-    publisher: str,
-    image_url: Optional[str] = None,
-    amp_url: Optional[str] = None,
-):
-    """Save news article to the database using the NewsArticle model.
+    return ticker_registry.records()
+
+
+def parse_result(result: dict, ticker: TickerRecord) -> dict:
+    """Turn a single article from the API response into a NewsArticle row.
 
     Args:
-        date (str): The publication date of the article.
-        ticker (Ticker): The Ticker object associated with the article.
-        title (str): The title of the article.
-        description (str): The description of the article.
-        article_url (str): The URL of the article.
-        author (str): The author of the article.
-        keywords (str): The keywords associated with the article.
-        publisher (str): The publisher of the article.
-        image_url (str): The URL of the article's image.
-        amp_url (str): The AMP URL of the article.
+        result (dict): The article as returned by the news endpoint.
+        ticker (TickerRecord): The ticker associated with the article.
+
+    Returns:
+        dict: The NewsArticle column values.
     """
+    return {
+        "date": datetime.strptime(result["published_utc"], "%Y-%m-%dT%H:%M:%SZ").date(),
+        "title": result.get("title", ""),
+        "description": result.get("description", ""),
+        "url": result.get("article_url", ""),
+        # Use a default value if author is not provided
+        "author": result.get("author", "Unknown"),
+        # Join keywords into a string, use empty list if not provided
+        "keywords": ", ".join(result.get("keywords", [])),
+        # Use a default value if publisher name is not provided
+        "publisher": result["publisher"].get("name", "Unknown"),
+        # Use an empty string if image_url or amp_url is not provided
+        "image_url": result.get("image_url", ""),
+        "amp_url": result.get("amp_url", ""),
+        "ticker_id": ticker.id,
+    }
 
-    # Check if the article already exists in the database
-    existing_article = NewsArticle.query().filter_by(url=article_url).first()
-    if existing_article:
-        console.info(f"Article '{title}' already exists in database.")
-        return
 
-    # Create a new NewsArticle instance
-    NewsArticle().create(
-        date=date,
-        title=title,
-        description=description,
-        url=article_url,
-        author=author,
-        keywords=keywords,
-        publisher=publisher,
-        ticker_id=ticker.id,
-        image_url=image_url,
-        amp_url=amp_url,
-    )
-    console.info(f"Article '{title}' added successfully to the database.")
+def load_cluster_index(since: date) -> SimHashIndex:
+    """Index the fingerprints of the articles published since a date.
 
+    Args:
+        since (date): The first publication date to index.
 
-def process_api_response(api_response, ticker: Ticker):
-    if api_response.get("status") != "OK":
-        console.error(
-            f"Error: {api_response.get('status')} - {api_response.get('error')}"
+    Returns:
+        SimHashIndex: The near-duplicate index of the stored articles.
+    """
+    with unit_of_work() as uow:
+        rows = uow.session.execute(
+            select(NewsArticle.simhash, NewsArticle.cluster_id).where(
+                NewsArticle.date >= since,
+                NewsArticle.simhash.is_not(None),
+                NewsArticle.cluster_id.is_not(None),
+            )
         )
+        return SimHashIndex.from_rows(rows)
+
+
+def assign_cluster(article: dict, cluster_index: SimHashIndex):
+    """Fingerprint a parsed article and assign it to its near-duplicate cluster."""
+    fingerprint = article_fingerprint(article["title"], article["description"])
+    # Articles without any text would all collide, so they stay unclustered
+    if not fingerprint:
         return
-    for result in api_response["results"]:
-        date = datetime.strptime(result["published_utc"], "%Y-%m-%dT%H:%M:%SZ").date()
-        title = result.get("title", "")
-        description = result.get("description", "")
-        article_url = result.get("article_url", "")
-        author = result.get(
-            "author", "Unknown"
-        )  # Use a default value if author is not provided
-        keywords = ", ".join(
-            result.get("keywords", [])
-        )  # Join keywords into a string, use empty list if not provided
-        publisher = result["publisher"].get(
-            "name", "Unknown"
-        )  # Use a default value if publisher name is not provided
-        image_url = result.get(
-            "image_url", ""
-        )  # Use an empty string if image_url is not provided
-        amp_url = result.get(
-            "amp_url", ""
-        )  # Use an empty string if amp_url is not provided
-        save_news_to_db(
-            date,
-            ticker,
-            title,
-            description,
-            article_url,
-            author,
-            keywords,
-            publisher,
-            image_url,
-            amp_url,
+    article["simhash"] = to_signed(fingerprint)
+    article["cluster_id"] = cluster_index.assign(fingerprint)
+
+
+def save_news_batch(
+    articles: List[dict], cluster_index: Optional[SimHashIndex] = None
+) -> Tuple[int, int]:
+    """Save a batch of parsed articles, skipping the URLs already in the database.
+
+    The batch is deduplicated in memory, checked against the database with one
+    set-based query, and the new articles are inserted in a single transaction.
+
+    Args:
+        articles (List[dict]): The NewsArticle rows built by parse_result.
+        cluster_index (Optional[SimHashIndex]): The index to cluster new articles with,
+            None to leave them unclustered.
+
+    Returns:
+        Tuple[int, int]: The number of articles added and skipped.
+    """
+    batch = {}
+    for article in articles:
+        batch.setdefault(article["url"], article)
+    if not batch:
+        return 0, len(articles)
+
+    with unit_of_work() as uow:
+        urls = list(batch)
+        existing_urls = set()
+        # Keep the IN list under SQLite's bound parameter limit
+        for i in range(0, len(urls), URL_LOOKUP_CHUNK):
+            existing_urls.update(
+                uow.session.scalars(
+                    select(NewsArticle.url).where(
+                        NewsArticle.url.in_(urls[i : i + URL_LOOKUP_CHUNK])
+                    )
+                )
+            )
+        new_articles = [
+            article for url, article in batch.items() if url not in existing_urls
+        ]
+        if cluster_index is not None:
+            for article in new_articles:
+                assign_cluster(article, cluster_index)
+        if new_articles:
+            uow.session.execute(insert(NewsArticle), new_articles)
+            uow.commit()
+
+    return len(new_articles), len(articles) - len(new_articles)
+
+
+def process_api_response(
+    api_response: Union[dict, Iterable[dict]],
+    ticker: TickerRecord,
+    cluster_index: Optional[SimHashIndex] = None,
+) -> Tuple[int, int]:
+    """Save the articles of one or more API response pages to the database.
+
+    Each page is saved as one batch.
+
+    Args:
+        api_response (Union[dict, Iterable[dict]]): A single response page, or an iterable
+            of pages such as PolygonClient.iter_news_pages. Pages are consumed one at a
+            time, so a lazy iterable keeps memory flat however many articles there are.
+        ticker (TickerRecord): The ticker associated with the articles.
+        cluster_index (Optional[SimHashIndex]): The index to cluster new articles with.
+
+    Returns:
+        Tuple[int, int]: The number of articles added and skipped.
+    """
+    added = skipped = 0
+    pages = [api_response] if isinstance(api_response, dict) else api_response
+    for page in pages:
+        if page.get("status") != "OK":
+            console.error(f"Error: {page.get('status')} - {page.get('error')}")
+            break
+        page_added, page_skipped = save_news_batch(
+            [parse_result(result, ticker) for result in page["results"]],
+            cluster_index,
         )
+        added += page_added
+        skipped += page_skipped
+    return added, skipped
 
 
-def pull_news(date_range: Tuple[str, str] = None):
-    """Pull news for all tickers and save them to the database."""
-    # Ensure the POLYGON_API_KEY is available
-    if not polygon_key:
-        raise EnvironmentError("POLYGON_API_KEY environment variable not found.")
+def news_window(date_range: Tuple[str, str] = None) -> Tuple[str, str]:
+    """Turn a (start, end) date range into inclusive published_utc bounds.
 
-    # Instantiate PolygonClient
-    polygon_client = PolygonClient(api_key=polygon_key)
+    Args:
+        date_range (Tuple[str, str]): The start and end dates in YYYY-MM-DD format,
+            yesterday and today when not given.
 
+    Returns:
+        Tuple[str, str]: The first and last UTC timestamps covered by the range.
+    """
+    if date_range is None:
+        today = date.today()
+        date_range = ((today - timedelta(days=1)).isoformat(), today.isoformat())
     # Parse the start and end dates from the date_range parameter
     start_date = datetime.strptime(date_range[0], "%Y-%m-%d")
     end_date = datetime.strptime(date_range[1], "%Y-%m-%d")
+    end_of_range = end_date + timedelta(days=1) - timedelta(seconds=1)
+    return (
+        start_date.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        end_of_range.strftime("%Y-%m-%dT%H:%M:%SZ"),
+    )
+
+
+class Watermark(NamedTuple):
+    # The newest published_utc ingested
+    published_utc: str
+    # The start of the window ingested without gaps up to published_utc, None if unknown
+    covered_from: Optional[str]
+
+
+def load_watermarks() -> Dict[int, Watermark]:
+    """Load the watermark of each ticker and how far back it holds without gaps.
+
+    Returns:
+        Dict[int, Watermark]: The watermark of each ticker id.
+    """
+    with unit_of_work() as uow:
+        rows = uow.session.execute(
+            select(
+                NewsWatermark.ticker_id,
+                NewsWatermark.published_utc,
+                NewsWatermark.covered_from,
+            )
+        ).all()
+    return {ticker_id: Watermark(*watermark) for ticker_id, *watermark in rows}
+
+
+def save_watermark(ticker_id: int, watermark: Optional[Watermark]):
+    """Record the watermark of a ticker, if there is one."""
+    if watermark:
+        NewsWatermark.upsert(
+            [{"ticker_id": ticker_id, **watermark._asdict()}],
+            index_elements=["ticker_id"],
+        )
+
+
+def newest_published(page: dict, current: Optional[str] = None) -> Optional[str]:
+    """Get the newest published_utc of a response page, or `current` if it is newer."""
+    timestamps = [result["published_utc"] for result in page.get("results") or []]
+    if current:
+        timestamps.append(current)
+    # The fixed-width UTC format sorts chronologically as text
+    return max(timestamps, default=None)
+
+
+def ticker_window(
+    start_timestamp: str, end_timestamp: str, watermark: Optional[Watermark]
+) -> str:
+    """Pick the first published_utc to request for a ticker.
+
+    The request starts at the watermark only when every article from the start of
+    the window up to the watermark is already ingested; otherwise the whole window
+    is requested and the URL dedupe drops what is already stored.
+
+    Args:
+        start_timestamp (str): The start of the requested window.
+        end_timestamp (str): The end of the requested window.
+        watermark (Optional[Watermark]): The ticker's watermark, None to fetch the
+            whole window.
+
+    Returns:
+        str: The start to request from.
+    """
+    if watermark is None or watermark.covered_from is None:
+        return start_timestamp
+    covered = watermark.covered_from <= start_timestamp <= watermark.published_utc
+    if not covered or watermark.published_utc > end_timestamp:
+        return start_timestamp
+    # Articles published in the same second as the watermark are refetched and dropped
+    # by the URL dedupe, so late arrivals in that second are not missed
+    return watermark.published_utc
+
+
+def extend_watermark(
+    watermark: Optional[Watermark], since: str, end: str, newest: Optional[str]
+) -> Optional[Watermark]:
+    """Merge a completed pull of a ticker into its watermark.
+
+    Args:
+        watermark (Optional[Watermark]): The ticker's watermark before the pull.
+        since (str): The first published_utc the pull requested.
+        end (str): The last published_utc the pull requested.
+        newest (Optional[str]): The newest published_utc the pull returned, if any.
 
-    # Iterate over each day within the date range
-    current_date = start_date
-    while current_date <= end_date:
-        timestamp = current_date.strftime("%Y-%m-%dT%H:%M:%SZ")
+    Returns:
+        Optional[Watermark]: The ticker's new watermark.
+    """
+    if watermark is None:
+        return Watermark(newest, since) if newest else None
+    # A watermark from before coverage was tracked only vouches for itself
+    covered_from = watermark.covered_from or watermark.published_utc
+    if since <= watermark.published_utc and end >= covered_from:
+        return Watermark(
+            max(watermark.published_utc, newest or watermark.published_utc),
+            min(covered_from, since),
+        )
+    if since > watermark.published_utc and newest:
+        # A gap separates the pull from the old coverage, so only the pull counts
+        return Watermark(newest, since)
+    return watermark
+
+
+def pull_news(
+    date_range: Tuple[str, str] = None,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    full: bool = False,
+    resume: bool = True,
+    polygon_client: Optional[PolygonClient] = None,
+):
+    """Pull news for all tickers and save them to the database.
+
+    By default only the articles newer than the watermark of each ticker are
+    requested; `full` requests the whole date range again. Each ticker is
+    checkpointed once its window is ingested, so an interrupted `full` run with the
+    same parameters resumes with the remaining tickers unless `resume` is False.
+    Incremental runs always start over, since the watermarks already say where
+    each ticker stopped. A long-running caller can pass its own `polygon_client`
+    to keep its connections warm.
+    """
+    if polygon_client is None:
+        # Ensure the POLYGON_API_KEY is available
+        if not polygon_key:
+            raise EnvironmentError("POLYGON_API_KEY environment variable not found.")
+
+        # Instantiate PolygonClient
+        polygon_client = PolygonClient(api_key=polygon_key, pool_size=pool_size)
+
+    # Share one session for the run; it commits after every page and finished ticker
+    with unit_of_work() as uow:
+        start_timestamp, end_timestamp = news_window(date_range)
 
         # Load the tickers
         tickers = load_tickers()
 
-        # Download news articles for all tickers
+        # Only recent articles are matched; syndicated copies arrive close together
+        cluster_index = load_cluster_index(
+            datetime.strptime(start_timestamp, "%Y-%m-%dT%H:%M:%SZ").date()
+            - timedelta(days=CLUSTER_LOOKBACK_DAYS)
+        )
+
+        watermarks = load_watermarks()
+
+        # Download news articles for all tickers, one paginated window per ticker
         console.info(
-            f"Importing and Filtering News from Polygon.io for all tickers for date {current_date.date()}"
+            f"Importing and Filtering News from Polygon.io for all tickers from {start_timestamp} to {end_timestamp}"
         )
-        for i, ticker in enumerate(tickers, start=1):
-            console.info(f"Importing news for ticker #{i}: {ticker.symbol}")
+        added = skipped = 0
+        params = {"start": start_timestamp, "end": end_timestamp, "full": full}
+        # An incremental run resumed from checkpoints would skip tickers that have
+        # news newer than their watermark, so only full runs are checkpointed
+        with job("news", params, resume=resume, checkpoint=full) as run:
+            for i, ticker in enumerate(tickers, start=1):
+                if run.is_done(ticker.id):
+                    continue
+                watermark = watermarks.get(ticker.id)
+                since = (
+                    start_timestamp
+                    if full
+                    else ticker_window(start_timestamp, end_timestamp, watermark)
+                )
+                console.info(
+                    f"Importing news for ticker #{i}: {ticker.symbol} from {since}"
+                )
 
-            # Execute the request, get the response and process it
-            try:
-                api_response = polygon_client.get_news(
-                    ticker.symbol, published_utc=timestamp
+                # Stream the response pages and process them as they arrive
+                ticker_added = ticker_skipped = 0
+                newest = None
+                complete = True
+                try:
+                    for page in polygon_client.iter_news_pages(
+                        ticker.symbol,
+                        published_utc=since,
+                        published_utc_until=end_timestamp,
+                    ):
+                        page_added, page_skipped = process_api_response(
+                            page, ticker, cluster_index
+                        )
+                        uow.commit()
+                        ticker_added += page_added
+                        ticker_skipped += page_skipped
+                        complete = page.get("status") == "OK"
+                        newest = newest_published(page, newest)
+                except InvalidTickerError as e:
+                    run.mark_skipped(ticker.id, reason=f"{ticker.symbol}: {e}")
+                    uow.commit()
+                    continue
+                except Exception as e:
+                    console.error(
+                        f"An error occurred while processing {ticker.symbol}: {e}"
+                    )
+                    complete = False
+                added += ticker_added
+                skipped += ticker_skipped
+                if not complete:
+                    run.mark_failed()
+                    continue
+                # Pages come newest first, so the watermark only moves once every page is in
+                save_watermark(
+                    ticker.id,
+                    extend_watermark(watermark, since, end_timestamp, newest),
                 )
-                process_api_response(api_response, ticker)
-            except Exception as e:
-                console.error(
-                    f"An error occurred while processing {ticker.symbol}: {e}"
+                run.mark_done(ticker.id)
+                uow.commit()
+
+                console.info(
+                    f"Finished importing and filtering news for {ticker.symbol}: "
+                    f"{ticker_added} new, {ticker_skipped} already stored"
                 )
-                continue
 
-            console.info(f"Finished importing and filtering news for {ticker.symbol}")
+    console.info(f"Articles: {added} new, {skipped} skipped as duplicates")
+    console.info(f"Polygon.io usage: {polygon_client.rate_limiter.summary()}")
+    console.info("News Capture Completed - Database Prepared")
+
+
+async def pull_news_async(
+    date_range: Tuple[str, str] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    full: bool = False,
+    resume: bool = True,
+):
+    """Pull news for up to `concurrency` tickers at once and save them to the database.
+
+    Requests run concurrently and hand their pages to a bounded queue; pages are
+    saved on the event loop thread as they arrive, so database writes are never
+    issued from several threads and memory stays bounded by the queue size.
+    Like pull_news, only articles newer than each ticker's watermark are requested
+    unless `full` is set, and finished tickers of a `full` run are checkpointed
+    for `resume`.
+    """
+    # Ensure the POLYGON_API_KEY is available
+    if not polygon_key:
+        raise EnvironmentError("POLYGON_API_KEY environment variable not found.")
+
+    start_timestamp, end_timestamp = news_window(date_range)
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def fetch(
+        polygon_client: AsyncPolygonClient, ticker: TickerRecord, since: str
+    ):
+        try:
+            async for page in polygon_client.iter_news_pages(
+                ticker.symbol,
+                published_utc=since,
+                published_utc_until=end_timestamp,
+            ):
+                await queue.put((ticker, page, None))
+        except Exception as e:
+            await queue.put((ticker, None, e))
+        # A None page marks the end of the ticker's stream
+        await queue.put((ticker, None, None))
+
+    # Share one session for the run; it commits after every page and finished ticker
+    with unit_of_work() as uow:
+        async with AsyncPolygonClient(
+            api_key=polygon_key, concurrency=concurrency, pool_size=pool_size
+        ) as polygon_client:
+            # Load the tickers
+            tickers = load_tickers()
+
+            # Only recent articles are matched; syndicated copies arrive close together
+            cluster_index = load_cluster_index(
+                datetime.strptime(start_timestamp, "%Y-%m-%dT%H:%M:%SZ").date()
+                - timedelta(days=CLUSTER_LOOKBACK_DAYS)
+            )
 
-        # Move to the next day
-        current_date += timedelta(days=1)
+            console.info(
+                f"Importing and Filtering News from Polygon.io for {len(tickers)} tickers "
+                f"from {start_timestamp} to {end_timestamp} with a concurrency of {concurrency}"
+            )
+            added = skipped = 0
+            params = {"start": start_timestamp, "end": end_timestamp, "full": full}
+            # Only full runs are checkpointed, as in pull_news
+            with job("news", params, resume=resume, checkpoint=full) as run:
+                watermarks = load_watermarks()
+                windows = {}
+                newest = {}
+                producers = []
+                for ticker in tickers:
+                    if run.is_done(ticker.id):
+                        continue
+                    since = (
+                        start_timestamp
+                        if full
+                        else ticker_window(
+                            start_timestamp, end_timestamp, watermarks.get(ticker.id)
+                        )
+                    )
+                    windows[ticker.id] = since
+                    producers.append(
+                        asyncio.create_task(fetch(polygon_client, ticker, since))
+                    )
+                failed = set()
+                invalid = {}
+                remaining = len(producers)
+                while remaining:
+                    ticker, page, error = await queue.get()
+                    if page is None and error is None:
+                        remaining -= 1
+                        if ticker.id in invalid:
+                            run.mark_skipped(
+                                ticker.id,
+                                reason=f"{ticker.symbol}: {invalid[ticker.id]}",
+                            )
+                            uow.commit()
+                        elif ticker.id in failed:
+                            run.mark_failed()
+                        else:
+                            # Every page of the ticker is in, so its watermark can move
+                            save_watermark(
+                                ticker.id,
+                                extend_watermark(
+                                    watermarks.get(ticker.id),
+                                    windows[ticker.id],
+                                    end_timestamp,
+                                    newest.get(ticker.id),
+                                ),
+                            )
+                            run.mark_done(ticker.id)
+                            uow.commit()
+                            console.info(
+                                f"Finished importing and filtering news for {ticker.symbol}"
+                            )
+                        continue
+                    if ticker.id in failed:
+                        continue
+                    try:
+                        if error:
+                            raise error
+                        if page.get("status") != "OK":
+                            failed.add(ticker.id)
+                        page_added, page_skipped = process_api_response(
+                            page, ticker, cluster_index
+                        )
+                        uow.commit()
+                        added += page_added
+                        skipped += page_skipped
+                        newest[ticker.id] = newest_published(
+                            page, newest.get(ticker.id)
+                        )
+                    except InvalidTickerError as e:
+                        failed.add(ticker.id)
+                        invalid[ticker.id] = e
+                    except Exception as e:
+                        failed.add(ticker.id)
+                        console.error(
+                            f"An error occurred while processing {ticker.symbol}: {e}"
+                        )
+                await asyncio.gather(*producers)
 
+    console.info(f"Articles: {added} new, {skipped} skipped as duplicates")
+    console.info(f"Polygon.io usage: {polygon_client.rate_limiter.summary()}")
     console.info("News Capture Completed - Database Prepared")
@@ -1,85 +1,298 @@
+import hashlib
+import json
 import os
+import time
+from dataclasses import asdict
+from typing import Dict, Iterator, List, Optional
 
-from langchain.output_parsers import PydanticOutputParser
-from langchain.prompts import PromptTemplate
-from langchain_community.chat_models import ChatOpenAI
-from langchain_core.pydantic_v1 import BaseModel, Field
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
 
-from sastocks.config import database_engine
-from sastocks.logger import logger
-from sastocks.models import NewsArticle
+from sastocks.config import APP_ROOT
+from sastocks.console import console
+from sastocks.database import unit_of_work
+from sastocks.models import NewsArticle, Ticker
+from sastocks.response_cache import DEFAULT_CACHE_MAX_BYTES, ResponseCache
+from sastocks.sentiment_backends import (
+    Sentiment,
+    SentimentBackend,
+    SentimentStats,
+    get_backend,
+)
 
-# Create a session factory using the database engine from the config module
-DatabaseSession = sessionmaker(bind=database_engine)
+# Number of articles sent to the model per batch, and written per commit
+SENTIMENT_COMMIT_BATCH = int(os.environ.get("SENTIMENT_COMMIT_BATCH", 50))
 
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+# Number of model requests in flight at once
+SENTIMENT_CONCURRENCY = int(os.environ.get("SENTIMENT_CONCURRENCY", 8))
 
+# Model results are cached on disk so a headline is only ever paid for once
+SENTIMENT_CACHE_PATH = os.environ.get(
+    "SENTIMENT_CACHE_PATH", os.path.join(APP_ROOT, "sentiment_cache.sqlite")
+)
+SENTIMENT_CACHE_MAX_BYTES = int(
+    os.environ.get("SENTIMENT_CACHE_MAX_BYTES", DEFAULT_CACHE_MAX_BYTES)
+)
 
-class Sentiment(BaseModel):
-    sentiment: str = Field(
-        description="`YES` if good news, `NO` if bad news, or `UNKNOWN` if uncertain in the first line"
-    )
-    reason: str = Field(description="one short and concise sentence")
+# Number of headlines about one company packed into a single request, 1 to send them one by one
+SENTIMENT_PACK_SIZE = int(os.environ.get("SENTIMENT_PACK_SIZE", 1))
 
 
-parser = PydanticOutputParser(pydantic_object=Sentiment)
+def sentiment_cache_key(item: dict, version: str) -> str:
+    """
+    Build the cache key of a headline.
 
-temperature = 0.0
-model = ChatOpenAI(
-    openai_api_key=OPENAI_API_KEY, model_name="gpt-4", temperature=temperature
-)
+    Args:
+        item (dict): The prompt variables of the headline.
+        version (str): The version of the backend, model and prompt the headline is scored with.
 
-sentiment_template = """# INSTRUCTIONS: 
-    Forget all your previous instructions. You are a financial expert with stock recommendation experience. 
-    Answer “YES” if good news, “NO” if bad news, or “UNKNOWN” if uncertain in the first line. 
-    Then elaborate with one short and concise sentence. 
+    Returns:
+        str: A hash of the headline, company, term and backend version.
+    """
+    raw = json.dumps([item["headline"], item["company_name"], item["term"], version])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
-# CONSTRAINTS:
-- You MUST respond in the response format (below).
-- Do not add anything before or after the response only use the below response format.
-- Do NOT make up anything.
 
-# RESPONSE FORMAT:
-{format_instructions}
+def unscored_batches(session: Session, batch_size: int) -> Iterator[List]:
+    """Yield the articles without a GPT sentiment in id order, `batch_size` at a time.
 
-# USER INPUT
-Is this headline good or bad for the stock price of {company_name} in the {term} term?
-Headline: {headline}"""
+    Each batch starts after the last id of the previous one, so articles that fail
+    to score are not fetched again in the same run.
 
+    Args:
+        session (Session): The session to query with.
+        batch_size (int): The number of articles per batch.
 
-prompt = PromptTemplate(
-    template=sentiment_template,
-    input_variables=["company_name", "term", "headline"],
-    partial_variables={"format_instructions": parser.get_format_instructions()},
-)
+    Yields:
+        List: Rows of (id, title, cluster_id, company_name).
+    """
+    last_id = 0
+    while True:
+        rows = session.execute(
+            select(
+                NewsArticle.id,
+                NewsArticle.title,
+                NewsArticle.cluster_id,
+                Ticker.name.label("company_name"),
+            )
+            .outerjoin(Ticker, NewsArticle.ticker_id == Ticker.id)
+            .where(NewsArticle.gpt_sentiment.is_(None), NewsArticle.id > last_id)
+            .order_by(NewsArticle.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def score_with_cache(
+    inputs: List[dict],
+    backend: SentimentBackend,
+    concurrency: int = SENTIMENT_CONCURRENCY,
+    cache: Optional[ResponseCache] = None,
+    stats: Optional[SentimentStats] = None,
+    pack_size: int = 1,
+) -> List[Optional[Sentiment]]:
+    """
+    Score a batch of headlines, only sending the backend those it hasn't scored before.
 
-sentiment_analyzer = prompt | model | parser
+    Repeats within the batch are also sent once. Results of backends that are not
+    worth caching always bypass the cache.
 
+    Args:
+        inputs (List[dict]): The prompt variables of each headline.
+        backend (SentimentBackend): The backend to score with.
+        concurrency (int): The maximum number of concurrent model requests.
+        cache (Optional[ResponseCache]): The store of earlier results, or None to always call the model.
+        stats (Optional[SentimentStats]): The counters to record the model calls in.
+        pack_size (int): The number of headlines per request, 1 to send them one by one.
 
-def do_news_sentiment_analysis():
-    logger.info("Starting news sentiment analysis...")
-    with DatabaseSession() as session:
-        # Retrieve all news articles with an empty gpt_sentiment value
-        articles = (
-            session.query(NewsArticle).filter(NewsArticle.gpt_sentiment == None).all()
+    Returns:
+        List[Optional[Sentiment]]: The result of each headline, None where scoring failed.
+    """
+
+    def score(items: List[dict]) -> List[Optional[Sentiment]]:
+        return backend.score(
+            items, concurrency=concurrency, stats=stats, pack_size=pack_size
         )
 
-        # Process each article
-        for article in articles:
-            result = sentiment_analyzer.invoke(
-                {
-                    "headline": article.title,
-                    # Retrieve the company name using the ticker associated with the article
-                    "company_name": article.ticker.name,
-                    "term": "short",
-                }
+    if cache is None or not backend.cacheable:
+        return score(inputs)
+
+    version = backend.version(pack_size)
+    keys = [sentiment_cache_key(item, version) for item in inputs]
+    results = {}
+    misses = {}
+    for key, item in zip(keys, inputs):
+        if key in results or key in misses:
+            continue
+        cached = cache.get(key)
+        if cached is None:
+            misses[key] = item
+        else:
+            results[key] = Sentiment(**cached)
+
+    if misses:
+        scored = score(list(misses.values()))
+        for key, result in zip(misses, scored):
+            results[key] = result
+            if result is not None:
+                cache.set(key, "sentiment", asdict(result))
+    return [results[key] for key in keys]
+
+
+def group_key(row) -> tuple:
+    """Key the articles that share one score: a near-duplicate cluster about one company."""
+    if row.cluster_id is None:
+        return ("article", row.id)
+    return ("cluster", row.cluster_id, row.company_name)
+
+
+def scored_cluster_results(session: Session, rows: List) -> Dict[tuple, Sentiment]:
+    """
+    Look up the clusters of a batch that already have a scored article.
+
+    Args:
+        session (Session): The session to query with.
+        rows (List): The unscored articles, as yielded by unscored_batches.
+
+    Returns:
+        Dict[tuple, Sentiment]: The stored result of each scored group, keyed by group_key.
+    """
+    cluster_ids = {row.cluster_id for row in rows if row.cluster_id is not None}
+    if not cluster_ids:
+        return {}
+    scored = session.execute(
+        select(
+            NewsArticle.cluster_id,
+            Ticker.name.label("company_name"),
+            NewsArticle.gpt_sentiment,
+            NewsArticle.gpt_response,
+        )
+        .outerjoin(Ticker, NewsArticle.ticker_id == Ticker.id)
+        .where(
+            NewsArticle.cluster_id.in_(cluster_ids),
+            NewsArticle.gpt_sentiment.is_not(None),
+        )
+    )
+    return {
+        ("cluster", row.cluster_id, row.company_name): Sentiment(
+            sentiment=row.gpt_sentiment, reason=row.gpt_response
+        )
+        for row in scored
+    }
+
+
+def do_news_sentiment_analysis(
+    concurrency: int = SENTIMENT_CONCURRENCY,
+    batch_size: int = SENTIMENT_COMMIT_BATCH,
+    cache: Optional[ResponseCache] = None,
+    pack_size: int = SENTIMENT_PACK_SIZE,
+    backend: Optional[SentimentBackend] = None,
+    dry_run: bool = False,
+) -> SentimentStats:
+    """Score every news article without a GPT sentiment yet.
+
+    Articles are processed in batches of `batch_size`, and each batch is written
+    back in one commit. Near-duplicate articles about the same company are scored
+    once, or take the score of a member scored earlier, and the result fans out to
+    the whole cluster. The remaining headlines go to the model with up to
+    `concurrency` requests in flight, `pack_size` headlines per request.
+
+    Results are only saved for backends that persist, so benchmarking with the fake
+    or VADER backend walks the backlog without touching the GPT sentiment columns.
+
+    Args:
+        concurrency (int): The maximum number of concurrent model requests.
+        batch_size (int): The number of articles per batch and per commit.
+        cache (Optional[ResponseCache]): The store of earlier results, or None to always call the model.
+        pack_size (int): The number of headlines about one company per request.
+        backend (Optional[SentimentBackend]): The backend to score with, the one
+            named by SENTIMENT_BACKEND when not given.
+        dry_run (bool): Whether to score without saving the results.
+
+    Returns:
+        SentimentStats: The number of articles scored and failed, and of model calls made.
+    """
+    if backend is None:
+        backend = get_backend()
+    persist = backend.persists and not dry_run
+    console.info(
+        f"Starting news sentiment analysis with the {backend.name} backend "
+        f"and a concurrency of {concurrency}..."
+    )
+    if not persist:
+        console.info(
+            f"Dry run: the results of the {backend.name} backend are not saved."
+        )
+    stats = SentimentStats()
+    started = time.perf_counter()
+    with unit_of_work() as uow:
+        for rows in unscored_batches(uow.session, batch_size):
+            groups = {}
+            for row in rows:
+                groups.setdefault(group_key(row), []).append(row)
+            results = scored_cluster_results(uow.session, rows)
+
+            # One headline per group that has no score yet
+            pending = [key for key in groups if key not in results]
+            scored = score_with_cache(
+                [
+                    {
+                        "headline": groups[key][0].title,
+                        "company_name": groups[key][0].company_name,
+                        "term": "short",
+                    }
+                    for key in pending
+                ],
+                backend=backend,
+                concurrency=concurrency,
+                cache=cache,
+                stats=stats,
+                pack_size=pack_size,
             )
-            # Update the article with the sentiment analysis results
-            article.gpt_sentiment = result.sentiment
-            article.gpt_response = result.reason
-            session.commit()
+            results.update(zip(pending, scored))
 
-            pass
+            # Update the articles with the sentiment analysis results
+            updates = []
+            for row in rows:
+                result = results.get(group_key(row))
+                if result is not None:
+                    updates.append(
+                        {
+                            "id": row.id,
+                            "gpt_sentiment": result.sentiment,
+                            "gpt_response": result.reason,
+                        }
+                    )
+            if updates and persist:
+                uow.session.execute(update(NewsArticle), updates)
+                uow.commit()
+            stats.scored += len(updates)
+            stats.failed += len(rows) - len(updates)
+            console.info(
+                f"Scored {stats.scored} articles so far, {stats.failed} failed."
+            )
 
-    logger.info("Finished news sentiment analysis.")
+    elapsed = time.perf_counter() - started
+    rate = stats.scored / elapsed if elapsed else 0.0
+    coverage = stats.scored / stats.requests if stats.requests else 0.0
+    console.info(
+        f"Finished news sentiment analysis: {stats.scored} scored, {stats.failed} failed "
+        f"in {elapsed:.1f}s ({rate:.1f} articles/s)."
+    )
+    console.info(
+        f"Model calls: {stats.requests} requests for {stats.headlines_sent} headlines "
+        f"({coverage:.1f} articles covered per request)."
+    )
+    if stats.scored:
+        console.info(
+            f"Model usage: {stats.requests} requests, {stats.prompt_tokens} prompt tokens "
+            f"({stats.prompt_tokens / stats.scored:.0f} per article), "
+            f"{stats.model_seconds:.1f}s waiting "
+            f"({stats.model_seconds / stats.scored * 1000:.0f} ms per article)."
+        )
+    if cache:
+        console.info(f"Sentiment cache: {cache.summary()}")
+    return stats
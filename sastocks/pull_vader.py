@@ -0,0 +1,151 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from sastocks.console import console
+from sastocks.database import unit_of_work
+from sastocks.models import NewsArticle
+from sastocks.sentiment_backends import load_vader_analyzer, vader_polarity
+
+# Number of articles read from the database, and written back, per commit
+VADER_BATCH_SIZE = int(os.environ.get("VADER_BATCH_SIZE", 2000))
+
+# Number of worker processes, and of articles sent to a worker per task
+VADER_WORKERS = int(os.environ.get("VADER_WORKERS", os.cpu_count() or 1))
+VADER_CHUNK_SIZE = int(os.environ.get("VADER_CHUNK_SIZE", 250))
+
+# The analyzer of the current process, loaded once by init_worker
+_analyzer = None
+
+
+def init_worker():
+    """Load the VADER lexicon once in each worker process."""
+    global _analyzer
+    _analyzer = load_vader_analyzer()
+
+
+# The vader_sentiment labels of the original SAStocks script for each VADER polarity
+VADER_LABELS = {1: "Good", -1: "Bad", 0: "Neutral"}
+
+
+def vader_label(compound: float) -> str:
+    """Label a compound score for the vader_sentiment column."""
+    return VADER_LABELS[vader_polarity(compound)]
+
+
+def article_text(title: Optional[str], description: Optional[str]) -> str:
+    """Join the title and description that VADER scores together."""
+    return " ".join(part for part in (title, description) if part)
+
+
+def score_chunk(chunk: List[Tuple[int, str]]) -> List[Tuple[int, float]]:
+    """
+    Score a chunk of articles with the analyzer of the current process.
+
+    Args:
+        chunk (List[Tuple[int, str]]): The id and text of each article.
+
+    Returns:
+        List[Tuple[int, float]]: The id and compound score of each article.
+    """
+    if _analyzer is None:
+        init_worker()
+    return [(id, _analyzer.polarity_scores(text)["compound"]) for id, text in chunk]
+
+
+def unvadered_batches(session: Session, batch_size: int) -> Iterator[List]:
+    """Yield the articles without a VADER score in id order, `batch_size` at a time.
+
+    Args:
+        session (Session): The session to query with.
+        batch_size (int): The number of articles per batch.
+
+    Yields:
+        List: Rows of (id, title, description).
+    """
+    last_id = 0
+    while True:
+        rows = session.execute(
+            select(NewsArticle.id, NewsArticle.title, NewsArticle.description)
+            .where(NewsArticle.vader_compound.is_(None), NewsArticle.id > last_id)
+            .order_by(NewsArticle.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def do_vader_sentiment_analysis(
+    batch_size: int = VADER_BATCH_SIZE,
+    workers: int = VADER_WORKERS,
+    chunk_size: int = VADER_CHUNK_SIZE,
+) -> int:
+    """Score every news article without a VADER score yet.
+
+    Articles are streamed from the database in batches of `batch_size`. Each batch
+    is split into chunks of `chunk_size` that are scored across `workers`
+    processes, each loading the lexicon once, and the compound scores and labels
+    are written back with one bulk update per batch.
+
+    Args:
+        batch_size (int): The number of articles per batch and per commit.
+        workers (int): The number of worker processes, 1 to score in this process.
+        chunk_size (int): The number of articles sent to a worker at a time.
+
+    Returns:
+        int: The number of articles scored.
+    """
+    # Fail before starting any workers when the lexicon is missing
+    init_worker()
+    console.info(f"Starting VADER sentiment analysis with {workers} workers...")
+    executor = (
+        ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+        if workers > 1
+        else None
+    )
+    scored = 0
+    started = time.perf_counter()
+    try:
+        with unit_of_work() as uow:
+            for rows in unvadered_batches(uow.session, batch_size):
+                texts = [
+                    (row.id, article_text(row.title, row.description)) for row in rows
+                ]
+                chunks = [
+                    texts[i : i + chunk_size] for i in range(0, len(texts), chunk_size)
+                ]
+                results = (
+                    executor.map(score_chunk, chunks)
+                    if executor
+                    else map(score_chunk, chunks)
+                )
+                updates = [
+                    {
+                        "id": id,
+                        "vader_compound": compound,
+                        "vader_sentiment": vader_label(compound),
+                    }
+                    for chunk in results
+                    for id, compound in chunk
+                ]
+                uow.session.execute(update(NewsArticle), updates)
+                uow.commit()
+                scored += len(updates)
+                console.info(f"Scored {scored} articles so far.")
+    finally:
+        if executor:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - started
+    rate = scored / elapsed if elapsed else 0.0
+    console.info(
+        f"Finished VADER sentiment analysis: {scored} scored in {elapsed:.1f}s "
+        f"({rate:.0f} articles/s)."
+    )
+    return scored
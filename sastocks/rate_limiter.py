@@ -0,0 +1,175 @@
+"""Token-bucket rate limiting for the Polygon.io API.
+
+A single RateLimiter is shared by every PolygonClient in the process, including
+the worker threads behind AsyncPolygonClient, so concurrent pulls draw from one
+budget instead of each tripping the plan limit on its own.
+"""
+
+import asyncio
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional, Tuple
+
+# Requests allowed by each Polygon.io plan, as (requests, period in seconds).
+# Paid plans are unlimited; Polygon asks clients to stay under ~100 requests/second.
+PLAN_LIMITS = {
+    "basic": (5, 60),
+    "starter": (100, 1),
+    "developer": (100, 1),
+    "advanced": (100, 1),
+    "unlimited": None,
+}
+
+PERIODS = {
+    "s": 1,
+    "sec": 1,
+    "second": 1,
+    "m": 60,
+    "min": 60,
+    "minute": 60,
+}
+
+
+def parse_rate_limit(spec: Optional[str]) -> Optional[Tuple[int, float]]:
+    """
+    Parse a rate limit specification.
+
+    Args:
+        spec (Optional[str]): A plan name from PLAN_LIMITS, or a rate such as `5/min` or `100/s`.
+
+    Returns:
+        Optional[Tuple[int, float]]: The number of requests allowed per period in seconds,
+                                     or None for no limit.
+    """
+    if not spec:
+        return None
+    spec = spec.strip().lower()
+    if spec in PLAN_LIMITS:
+        return PLAN_LIMITS[spec]
+    match = re.match(r"^(\d+)\s*/\s*([a-z]+)$", spec)
+    if not match or match.group(2) not in PERIODS:
+        raise ValueError(
+            f"Invalid rate limit: {spec}. Use a plan name ({', '.join(PLAN_LIMITS)}) "
+            "or a rate such as '5/min' or '100/s'."
+        )
+    return int(match.group(1)), PERIODS[match.group(2)]
+
+
+@dataclass
+class RateLimitStats:
+    requests: int = 0
+    delayed: int = 0
+    wait_seconds: float = 0.0
+    throttled: int = 0
+    retries: int = 0
+
+
+class RateLimiter:
+    """Thread-safe token bucket with a shared back-off for 429 responses."""
+
+    def __init__(self, requests: Optional[int] = None, period: float = 1.0):
+        """
+        Args:
+            requests (Optional[int]): The number of requests allowed per period, None for no limit.
+            period (float): The length of the period in seconds.
+        """
+        if requests is not None and (requests < 1 or period <= 0):
+            raise ValueError(
+                "Invalid rate limit. Requests and period must be positive."
+            )
+        self.capacity = requests
+        self.rate = requests / period if requests else None
+        self.tokens = float(requests or 0)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.stats = RateLimitStats()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_spec(cls, spec: Optional[str]) -> "RateLimiter":
+        """Build a limiter from a plan name or a rate such as `5/min`."""
+        limit = parse_rate_limit(spec)
+        if limit is None:
+            return cls()
+        return cls(*limit)
+
+    def _reserve(self) -> float:
+        """Take a token if one is available, otherwise return how long to wait."""
+        with self._lock:
+            now = time.monotonic()
+            if self.blocked_until > now:
+                return self.blocked_until - now
+            if self.rate is None:
+                self.stats.requests += 1
+                return 0.0
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.stats.requests += 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def _record_wait(self, delay: float):
+        with self._lock:
+            self.stats.delayed += 1
+            self.stats.wait_seconds += delay
+
+    def acquire(self):
+        """Block the calling thread until a request may be sent."""
+        while True:
+            delay = self._reserve()
+            if not delay:
+                return
+            self._record_wait(delay)
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """Wait without blocking the event loop until a request may be sent."""
+        while True:
+            delay = self._reserve()
+            if not delay:
+                return
+            self._record_wait(delay)
+            await asyncio.sleep(delay)
+
+    def throttle(self, retry_after: float):
+        """
+        Pause every caller after the API answered 429 Too Many Requests.
+
+        Args:
+            retry_after (float): The number of seconds to hold all requests back.
+        """
+        with self._lock:
+            self.stats.throttled += 1
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            # Start the next window with an empty bucket so waiting callers trickle back
+            self.tokens = 0.0
+            self.updated_at = self.blocked_until
+
+    def record_retry(self):
+        with self._lock:
+            self.stats.retries += 1
+
+    def snapshot(self) -> dict:
+        """Return a copy of the request counters."""
+        with self._lock:
+            return asdict(self.stats)
+
+    def summary(self) -> str:
+        """Describe the request counters in one line for the console."""
+        stats = self.snapshot()
+        return (
+            f"{stats['requests']} requests, {stats['delayed']} delayed "
+            f"({stats['wait_seconds']:.1f}s waiting), {stats['throttled']} throttled, "
+            f"{stats['retries']} retries"
+        )
+
+
+# Process-wide limiter configured by POLYGON_RATE_LIMIT (a plan name or e.g. `5/min`)
+default_rate_limiter = RateLimiter.from_spec(os.environ.get("POLYGON_RATE_LIMIT"))
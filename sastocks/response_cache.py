@@ -0,0 +1,201 @@
+"""Persistent on-disk cache for Polygon.io API responses.
+
+Responses are stored as JSON in a small SQLite file, keyed by the endpoint path and
+its normalized query parameters (the API key is never part of the key). Entries
+either live forever, for data about completed trading days that can no longer
+change, or expire after a TTL. The least recently used entries are evicted once
+the cache grows past its size budget.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from sastocks.config import APP_ROOT
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "POLYGON_CACHE_PATH", os.path.join(APP_ROOT, "polygon_cache.sqlite")
+)
+
+# Size budget of the cache file contents, 256 MB unless configured otherwise
+DEFAULT_CACHE_MAX_BYTES = int(
+    os.environ.get("POLYGON_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+)
+
+# Query parameters that never change the response and must not end up in keys
+IGNORED_PARAMS = {"apiKey"}
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+
+class ResponseCache:
+    """Thread-safe SQLite store of JSON responses with TTLs and LRU eviction."""
+
+    def __init__(
+        self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_CACHE_MAX_BYTES
+    ):
+        """
+        Args:
+            path (str): The SQLite file to keep the cache in, or `:memory:`.
+            max_bytes (int): The total size of cached bodies that triggers eviction.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                body TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_response_cache_last_access "
+            "ON response_cache (last_access)"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def make_key(url: str, params: Optional[dict] = None) -> str:
+        """
+        Build a cache key from a request URL and its parameters.
+
+        Args:
+            url (str): The request URL, possibly with a query string.
+            params (Optional[dict]): Additional query parameters.
+
+        Returns:
+            str: A hash of the endpoint path and its sorted parameters, without the API key.
+        """
+        parts = urlsplit(url)
+        query = dict(parse_qsl(parts.query))
+        query.update({k: str(v) for k, v in (params or {}).items()})
+        normalized = sorted((k, v) for k, v in query.items() if k not in IGNORED_PARAMS)
+        raw = f"{parts.path}?{urlencode(normalized)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Look up a cached response.
+
+        Args:
+            key (str): The key built by make_key.
+
+        Returns:
+            Optional[dict]: The cached response, or None when missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                if row is not None:
+                    self._connection.execute(
+                        "DELETE FROM response_cache WHERE key = ?", (key,)
+                    )
+                    self._connection.commit()
+                self.stats.misses += 1
+                return None
+            self._connection.execute(
+                "UPDATE response_cache SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._connection.commit()
+            self.stats.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, endpoint: str, value: dict, ttl: Optional[float] = None):
+        """
+        Store a response.
+
+        Args:
+            key (str): The key built by make_key.
+            endpoint (str): The endpoint path, kept for inspection and targeted clearing.
+            value (dict): The JSON response to store.
+            ttl (Optional[float]): Seconds until the entry expires, or None to keep it forever.
+        """
+        body = json.dumps(value, separators=(",", ":"))
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO response_cache "
+                "(key, endpoint, body, size, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint, body, len(body), expires_at, now),
+            )
+            self.stats.writes += 1
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self):
+        """Drop expired entries, then the least recently used ones, until under budget."""
+        cursor = self._connection.execute(
+            "DELETE FROM response_cache WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (time.time(),),
+        )
+        self.stats.evictions += max(cursor.rowcount, 0)
+        (total,) = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM response_cache"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        # Shrink to 90% of the budget so eviction doesn't run on every write
+        excess = total - int(self.max_bytes * 0.9)
+        freed = 0
+        stale_keys = []
+        for key, size in self._connection.execute(
+            "SELECT key, size FROM response_cache ORDER BY last_access"
+        ):
+            if freed >= excess:
+                break
+            stale_keys.append((key,))
+            freed += size
+        self._connection.executemany(
+            "DELETE FROM response_cache WHERE key = ?", stale_keys
+        )
+        self.stats.evictions += len(stale_keys)
+
+    def clear(self):
+        """Remove every cached response."""
+        with self._lock:
+            self._connection.execute("DELETE FROM response_cache")
+            self._connection.commit()
+
+    def snapshot(self) -> dict:
+        """Return a copy of the hit/miss counters."""
+        with self._lock:
+            return asdict(self.stats)
+
+    def summary(self) -> str:
+        """Describe the cache counters in one line for the console."""
+        stats = self.snapshot()
+        lookups = stats["hits"] + stats["misses"]
+        hit_rate = stats["hits"] / lookups if lookups else 0.0
+        return (
+            f"{stats['hits']} hits, {stats['misses']} misses ({hit_rate:.0%} hit rate), "
+            f"{stats['writes']} writes, {stats['evictions']} evictions"
+        )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,555 @@
+"""Backends that score the sentiment of news headlines.
+
+Every backend takes the same prompt variables (`headline`, `company_name` and
+`term`) and returns one Sentiment per headline, None where scoring failed:
+
+- `langchain`: the GPT model behind a LangChain prompt and output parser.
+- `vader`: NLTK's VADER lexicon, offline and free, but blind to the company.
+- `fake`: a deterministic stand-in with configurable latency that makes no
+  network calls, for benchmarking the scoring pipeline on an offline machine.
+
+The backend is picked by name with get_backend, by default from SENTIMENT_BACKEND.
+Heavy dependencies are imported when a backend is created, not with this module.
+"""
+
+import hashlib
+import os
+from abc import ABC, abstractmethod
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+
+from sastocks.console import console
+
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+
+DEFAULT_BACKEND = os.environ.get("SENTIMENT_BACKEND", "langchain")
+DEFAULT_MODEL_NAME = os.environ.get("SENTIMENT_MODEL", "gpt-4")
+
+# Seconds the fake backend takes per request
+DEFAULT_FAKE_LATENCY = float(os.environ.get("SENTIMENT_FAKE_LATENCY", 0.5))
+
+# VADER compound scores beyond these thresholds count as good or bad news
+VADER_POSITIVE_THRESHOLD = 0.05
+VADER_NEGATIVE_THRESHOLD = -0.05
+
+
+@dataclass
+class Sentiment:
+    sentiment: str
+    reason: str
+
+
+@dataclass
+class SentimentStats:
+    scored: int = 0
+    failed: int = 0
+    # Headlines actually sent to the backend, after clustering and the cache, each
+    # counted once even when a failed pack is retried one by one
+    headlines_sent: int = 0
+    # Requests made to the backend, the tokens of their prompts, and the time spent waiting
+    requests: int = 0
+    prompt_tokens: int = 0
+    model_seconds: float = 0.0
+
+
+def prompt_version(template: str, format_instructions: str = "") -> str:
+    """Hash a prompt, so cached results of an older prompt are never reused."""
+    raw = template + format_instructions
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def pack_inputs(inputs: List[dict], pack_size: int) -> List[List[int]]:
+    """
+    Split headlines into packs that can share one request.
+
+    Args:
+        inputs (List[dict]): The prompt variables of each headline.
+        pack_size (int): The maximum number of headlines per pack.
+
+    Returns:
+        List[List[int]]: The positions in `inputs` of the headlines of each pack.
+    """
+    # Only headlines about the same company and term can share a prompt
+    positions_by_subject = {}
+    for position, item in enumerate(inputs):
+        subject = item["company_name"], item["term"]
+        positions_by_subject.setdefault(subject, []).append(position)
+    return [
+        positions[i : i + pack_size]
+        for positions in positions_by_subject.values()
+        for i in range(0, len(positions), pack_size)
+    ]
+
+
+def number_headlines(inputs: List[dict], pack: List[int]) -> str:
+    """List the headlines of a pack one per line, numbered from 1."""
+    return "\n".join(
+        f"{number}. {' '.join(inputs[position]['headline'].split())}"
+        for number, position in enumerate(pack, start=1)
+    )
+
+
+class SentimentBackend(ABC):
+    """Interface of the sentiment backends."""
+
+    name = "base"
+    # Whether results are worth keeping in the sentiment cache
+    cacheable = False
+    # Whether results may be saved as the GPT sentiment of articles; the stand-in
+    # backends are only for benchmarks and would otherwise shadow the model's score
+    persists = False
+
+    def version(self, pack_size: int = 1) -> str:
+        """Identify the backend configuration that results depend on, for cache keys."""
+        return self.name
+
+    @abstractmethod
+    def score(
+        self,
+        inputs: List[dict],
+        concurrency: int,
+        stats: Optional[SentimentStats] = None,
+        pack_size: int = 1,
+    ) -> List[Optional[Sentiment]]:
+        """
+        Score a batch of headlines.
+
+        Args:
+            inputs (List[dict]): The prompt variables of each headline.
+            concurrency (int): The maximum number of concurrent requests.
+            stats (Optional[SentimentStats]): The counters to record the requests in.
+            pack_size (int): The number of headlines about one company per request,
+                for backends that support packing.
+
+        Returns:
+            List[Optional[Sentiment]]: The result of each headline, None where scoring failed.
+        """
+
+
+class LangChainBackend(SentimentBackend):
+    """GPT scoring through a LangChain prompt, model and output parser."""
+
+    name = "langchain"
+    cacheable = True
+    persists = True
+
+    single_template = """# INSTRUCTIONS: 
+    Forget all your previous instructions. You are a financial expert with stock recommendation experience. 
+    Answer “YES” if good news, “NO” if bad news, or “UNKNOWN” if uncertain in the first line. 
+    Then elaborate with one short and concise sentence. 
+
+# CONSTRAINTS:
+- You MUST respond in the response format (below).
+- Do not add anything before or after the response only use the below response format.
+- Do NOT make up anything.
+
+# RESPONSE FORMAT:
+{format_instructions}
+
+# USER INPUT
+Is this headline good or bad for the stock price of {company_name} in the {term} term?
+Headline: {headline}"""
+
+    packed_template = """# INSTRUCTIONS: 
+    Forget all your previous instructions. You are a financial expert with stock recommendation experience. 
+    For each numbered headline, answer “YES” if good news, “NO” if bad news, or “UNKNOWN” if uncertain. 
+    Then elaborate with one short and concise sentence. 
+
+# CONSTRAINTS:
+- You MUST respond in the response format (below).
+- Give exactly one result per headline, with the number of the headline as its index.
+- Do not add anything before or after the response only use the below response format.
+- Do NOT make up anything.
+
+# RESPONSE FORMAT:
+{format_instructions}
+
+# USER INPUT
+Are these headlines good or bad for the stock price of {company_name} in the {term} term?
+Headlines:
+{headlines}"""
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL_NAME,
+        api_key: Optional[str] = OPENAI_API_KEY,
+        temperature: float = 0.0,
+    ):
+        """
+        Args:
+            model_name (str): The OpenAI chat model to use.
+            api_key (Optional[str]): The OpenAI API key.
+            temperature (float): The sampling temperature of the model.
+        """
+        from langchain.output_parsers import PydanticOutputParser
+        from langchain.prompts import PromptTemplate
+        from langchain_community.chat_models import ChatOpenAI
+        from langchain_core.pydantic_v1 import BaseModel, Field
+
+        class ParsedSentiment(BaseModel):
+            sentiment: str = Field(
+                description="`YES` if good news, `NO` if bad news, or `UNKNOWN` if uncertain in the first line"
+            )
+            reason: str = Field(description="one short and concise sentence")
+
+        class PackedSentiment(BaseModel):
+            index: int = Field(description="the number of the headline")
+            sentiment: str = Field(
+                description="`YES` if good news, `NO` if bad news, or `UNKNOWN` if uncertain"
+            )
+            reason: str = Field(description="one short and concise sentence")
+
+        class PackedSentiments(BaseModel):
+            results: List[PackedSentiment] = Field(
+                description="one result per headline, in the order of the headlines"
+            )
+
+        self.model_name = model_name
+        self.model = ChatOpenAI(
+            openai_api_key=api_key, model_name=model_name, temperature=temperature
+        )
+
+        parser = PydanticOutputParser(pydantic_object=ParsedSentiment)
+        self.prompt = PromptTemplate(
+            template=self.single_template,
+            input_variables=["company_name", "term", "headline"],
+            partial_variables={"format_instructions": parser.get_format_instructions()},
+        )
+        self.sentiment_analyzer = self.prompt | self.model | parser
+
+        packed_parser = PydanticOutputParser(pydantic_object=PackedSentiments)
+        self.packed_prompt = PromptTemplate(
+            template=self.packed_template,
+            input_variables=["company_name", "term", "headlines"],
+            partial_variables={
+                "format_instructions": packed_parser.get_format_instructions()
+            },
+        )
+        self.packed_analyzer = self.packed_prompt | self.model | packed_parser
+
+        self.prompt_version = prompt_version(
+            self.single_template, parser.get_format_instructions()
+        )
+        self.packed_prompt_version = prompt_version(
+            self.packed_template, packed_parser.get_format_instructions()
+        )
+
+    def version(self, pack_size: int = 1) -> str:
+        prompt = self.packed_prompt_version if pack_size > 1 else self.prompt_version
+        return f"{self.name}:{self.model_name}:{prompt}"
+
+    def count_tokens(self, text: str) -> int:
+        """Count the tokens of a prompt, or estimate them when no tokenizer is available."""
+        try:
+            return self.model.get_num_tokens(text)
+        except Exception:
+            # About four characters per token for English text
+            return len(text) // 4
+
+    def run_chain(
+        self,
+        chain,
+        chain_prompt,
+        requests: List[dict],
+        concurrency: int,
+        stats: Optional[SentimentStats] = None,
+    ) -> list:
+        """
+        Run a chain over several requests at once, recording its cost in `stats`.
+
+        Args:
+            chain: The runnable to batch.
+            chain_prompt (PromptTemplate): The prompt of the chain, used to count tokens.
+            requests (List[dict]): The prompt variables of each request.
+            concurrency (int): The maximum number of concurrent model requests.
+            stats (Optional[SentimentStats]): The counters to record the requests in.
+
+        Returns:
+            list: The result of each request, or the exception it raised.
+        """
+        started = time.perf_counter()
+        results = chain.batch(
+            requests, config={"max_concurrency": concurrency}, return_exceptions=True
+        )
+        if stats is not None:
+            stats.model_seconds += time.perf_counter() - started
+            stats.requests += len(requests)
+            stats.prompt_tokens += sum(
+                self.count_tokens(chain_prompt.format(**request))
+                for request in requests
+            )
+        return results
+
+    def score_headlines(
+        self,
+        inputs: List[dict],
+        concurrency: int,
+        stats: Optional[SentimentStats] = None,
+    ) -> List[Optional[Sentiment]]:
+        """Score headlines one per request, with up to `concurrency` requests in flight."""
+        results = self.run_chain(
+            self.sentiment_analyzer, self.prompt, inputs, concurrency, stats
+        )
+        scored = []
+        for item, result in zip(inputs, results):
+            if isinstance(result, Exception):
+                console.error(
+                    f"Failed to score headline '{item['headline']}': {result}"
+                )
+                scored.append(None)
+            else:
+                scored.append(Sentiment(result.sentiment, result.reason))
+        return scored
+
+    @staticmethod
+    def unpack_results(result, size: int) -> Optional[List[Sentiment]]:
+        """
+        Check a packed response and turn it into one result per headline.
+
+        Args:
+            result: The parsed response, or the exception raised while getting it.
+            size (int): The number of headlines in the request.
+
+        Returns:
+            Optional[List[Sentiment]]: The results in headline order, None if the response
+                failed or doesn't cover every headline exactly once.
+        """
+        if isinstance(result, Exception):
+            return None
+        by_index = {item.index: item for item in result.results}
+        if len(result.results) != size or sorted(by_index) != list(range(1, size + 1)):
+            return None
+        return [
+            Sentiment(by_index[i].sentiment, by_index[i].reason)
+            for i in range(1, size + 1)
+        ]
+
+    def score_packed(
+        self,
+        inputs: List[dict],
+        pack_size: int,
+        concurrency: int,
+        stats: Optional[SentimentStats] = None,
+    ) -> List[Optional[Sentiment]]:
+        """
+        Score headlines `pack_size` at a time per company, sharing one prompt per request.
+
+        Headlines whose packed response fails or can't be parsed are scored again one by one.
+        """
+        packs = pack_inputs(inputs, pack_size)
+        requests = [
+            {
+                "company_name": inputs[pack[0]]["company_name"],
+                "term": inputs[pack[0]]["term"],
+                "headlines": number_headlines(inputs, pack),
+            }
+            for pack in packs
+        ]
+        results = self.run_chain(
+            self.packed_analyzer, self.packed_prompt, requests, concurrency, stats
+        )
+
+        scored: List[Optional[Sentiment]] = [None] * len(inputs)
+        fallback = []
+        for pack, result in zip(packs, results):
+            unpacked = self.unpack_results(result, len(pack))
+            if unpacked is None:
+                fallback.extend(pack)
+                continue
+            for position, sentiment in zip(pack, unpacked):
+                scored[position] = sentiment
+
+        if fallback:
+            console.info(
+                f"Could not parse packed results, scoring {len(fallback)} headlines one by one."
+            )
+            retried = self.score_headlines(
+                [inputs[position] for position in fallback], concurrency, stats
+            )
+            for position, sentiment in zip(fallback, retried):
+                scored[position] = sentiment
+        return scored
+
+    def score(
+        self,
+        inputs: List[dict],
+        concurrency: int,
+        stats: Optional[SentimentStats] = None,
+        pack_size: int = 1,
+    ) -> List[Optional[Sentiment]]:
+        if stats is not None:
+            stats.headlines_sent += len(inputs)
+        if pack_size > 1:
+            return self.score_packed(inputs, pack_size, concurrency, stats)
+        return self.score_headlines(inputs, concurrency, stats)
+
+
+def vader_polarity(compound: float) -> int:
+    """Classify a VADER compound score as positive (1), negative (-1) or neutral (0)."""
+    if compound >= VADER_POSITIVE_THRESHOLD:
+        return 1
+    if compound <= VADER_NEGATIVE_THRESHOLD:
+        return -1
+    return 0
+
+
+# The answers of the GPT prompt for each VADER polarity
+VADER_ANSWERS = {1: "YES", -1: "NO", 0: "UNKNOWN"}
+
+
+def vader_answer(compound: float) -> str:
+    """Map a VADER compound score onto the YES/NO/UNKNOWN answers of the GPT prompt."""
+    return VADER_ANSWERS[vader_polarity(compound)]
+
+
+def load_vader_analyzer():
+    """
+    Load NLTK's VADER analyzer.
+
+    Returns:
+        SentimentIntensityAnalyzer: The analyzer, with its lexicon loaded.
+
+    Raises:
+        LookupError: If the VADER lexicon is not installed.
+    """
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+    try:
+        return SentimentIntensityAnalyzer()
+    except LookupError as e:
+        raise LookupError(
+            "The VADER lexicon is missing. Install it with "
+            "`python -m nltk.downloader vader_lexicon`."
+        ) from e
+
+
+class VaderBackend(SentimentBackend):
+    """Lexicon-based scoring with NLTK's VADER, without any network calls."""
+
+    name = "vader"
+
+    def __init__(self):
+        self.analyzer = load_vader_analyzer()
+
+    def score(
+        self,
+        inputs: List[dict],
+        concurrency: int,
+        stats: Optional[SentimentStats] = None,
+        pack_size: int = 1,
+    ) -> List[Optional[Sentiment]]:
+        started = time.perf_counter()
+        scored = []
+        for item in inputs:
+            compound = self.analyzer.polarity_scores(item["headline"])["compound"]
+            scored.append(
+                Sentiment(
+                    vader_answer(compound), f"VADER compound score {compound:.3f}"
+                )
+            )
+        if stats is not None:
+            stats.headlines_sent += len(inputs)
+            stats.requests += len(inputs)
+            stats.model_seconds += time.perf_counter() - started
+        return scored
+
+
+class FakeBackend(SentimentBackend):
+    """Deterministic offline stand-in for the LLM, with a fixed latency per request.
+
+    Results only depend on the headline and company, and requests run on a thread
+    pool of `concurrency` workers, so the batching, packing and concurrency of the
+    pipeline can be benchmarked without a model. Prompt tokens are estimated as a
+    fixed overhead for the instructions plus about four characters per headline token.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        latency: float = DEFAULT_FAKE_LATENCY,
+        failure_rate: float = 0.0,
+        overhead_tokens: int = 300,
+    ):
+        """
+        Args:
+            latency (float): The seconds each request takes.
+            failure_rate (float): The share of headlines that deterministically fail.
+            overhead_tokens (int): The prompt tokens of the instructions of each request.
+        """
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.overhead_tokens = overhead_tokens
+
+    @staticmethod
+    def _digest(item: dict) -> int:
+        raw = f"{item['headline']}\n{item['company_name']}"
+        return int.from_bytes(hashlib.sha256(raw.encode("utf-8")).digest()[:8], "big")
+
+    def _answer(self, item: dict) -> Optional[Sentiment]:
+        digest = self._digest(item)
+        if (digest % 10_000) < self.failure_rate * 10_000:
+            return None
+        label = ("YES", "NO", "UNKNOWN")[digest % 3]
+        return Sentiment(label, f"Stand-in result for {item['company_name']}.")
+
+    def _request(self, items: List[dict]) -> List[Optional[Sentiment]]:
+        time.sleep(self.latency)
+        return [self._answer(item) for item in items]
+
+    def score(
+        self,
+        inputs: List[dict],
+        concurrency: int,
+        stats: Optional[SentimentStats] = None,
+        pack_size: int = 1,
+    ) -> List[Optional[Sentiment]]:
+        packs = pack_inputs(inputs, max(pack_size, 1))
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+            results = list(
+                executor.map(
+                    self._request,
+                    [[inputs[position] for position in pack] for pack in packs],
+                )
+            )
+        scored: List[Optional[Sentiment]] = [None] * len(inputs)
+        for pack, pack_results in zip(packs, results):
+            for position, result in zip(pack, pack_results):
+                scored[position] = result
+        if stats is not None:
+            stats.headlines_sent += len(inputs)
+            stats.requests += len(packs)
+            stats.model_seconds += time.perf_counter() - started
+            stats.prompt_tokens += self.overhead_tokens * len(packs) + sum(
+                len(item["headline"]) // 4 for item in inputs
+            )
+        return scored
+
+
+BACKENDS = {
+    LangChainBackend.name: LangChainBackend,
+    VaderBackend.name: VaderBackend,
+    FakeBackend.name: FakeBackend,
+}
+
+
+def get_backend(name: Optional[str] = None, **options) -> SentimentBackend:
+    """
+    Create a sentiment backend by name.
+
+    Args:
+        name (Optional[str]): A name from BACKENDS, SENTIMENT_BACKEND when not given.
+        **options: The arguments of the backend class.
+
+    Returns:
+        SentimentBackend: The backend.
+    """
+    name = (name or DEFAULT_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Invalid sentiment backend: {name}. Use one of: {', '.join(BACKENDS)}."
+        )
+    return BACKENDS[name](**options)
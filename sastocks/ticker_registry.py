@@ -0,0 +1,104 @@
+"""In-process cache of the tracked tickers.
+
+The pipeline stages only need the id, symbol and name of each ticker, so the
+registry loads them once as plain tuples instead of ORM objects: they don't
+belong to a session, and they are cheap to keep for the life of the process.
+Writes through sastocks.tickers invalidate the registry, and a long-running
+process reloads it after TICKER_REGISTRY_TTL seconds to pick up tickers added by
+other processes.
+"""
+
+import os
+import time
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from sqlalchemy import select
+
+from sastocks.console import console
+from sastocks.database import unit_of_work
+from sastocks.models import Ticker
+
+# Seconds a loaded registry is trusted before it is read again, 0 to never expire
+TICKER_REGISTRY_TTL = float(os.environ.get("TICKER_REGISTRY_TTL", 5 * 60))
+
+
+class TickerRecord(NamedTuple):
+    id: int
+    symbol: str
+    name: str
+
+
+def load_ticker_records() -> List[TickerRecord]:
+    """Read the id, symbol and name of every ticker, in id order."""
+    with unit_of_work() as uow:
+        rows = uow.session.execute(
+            select(Ticker.id, Ticker.symbol, Ticker.name).order_by(Ticker.id)
+        ).all()
+    return [TickerRecord(*row) for row in rows]
+
+
+class TickerRegistry:
+    def __init__(
+        self,
+        ttl: float = TICKER_REGISTRY_TTL,
+        loader: Callable[[], List[TickerRecord]] = load_ticker_records,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize an empty registry; the tickers are loaded on first use.
+
+        Args:
+            ttl (float): The seconds a load is trusted for, 0 to keep it until invalidated.
+            loader (Callable[[], List[TickerRecord]]): The function that reads the tickers.
+            clock (Callable[[], float]): The monotonic clock to expire loads with.
+        """
+        self.ttl = ttl
+        self.loader = loader
+        self.clock = clock
+        self._records: Optional[List[TickerRecord]] = None
+        self._by_symbol: Dict[str, TickerRecord] = {}
+        self._by_id: Dict[int, TickerRecord] = {}
+        self._loaded_at = 0.0
+
+    def _expired(self) -> bool:
+        return self.ttl > 0 and self.clock() - self._loaded_at > self.ttl
+
+    def records(self) -> List[TickerRecord]:
+        """The tracked tickers in id order, loaded if the registry is empty or stale."""
+        if self._records is None or self._expired():
+            records = self.loader()
+            self._by_id = {record.id: record for record in records}
+            # A symbol that was added twice resolves to its first row
+            self._by_symbol = {}
+            for record in records:
+                self._by_symbol.setdefault(record.symbol.upper(), record)
+            self._records = records
+            self._loaded_at = self.clock()
+            console.info(f"Loaded {len(records)} tickers.")
+        return self._records
+
+    def get(self, symbol: str) -> Optional[TickerRecord]:
+        """Look a ticker up by symbol, in any case."""
+        self.records()
+        return self._by_symbol.get(symbol.upper())
+
+    def by_id(self, id: int) -> Optional[TickerRecord]:
+        """Look a ticker up by id."""
+        self.records()
+        return self._by_id.get(id)
+
+    def invalidate(self):
+        """Drop the loaded tickers, so the next lookup reads them again."""
+        self._records = None
+        self._by_symbol = {}
+        self._by_id = {}
+
+    def __iter__(self) -> Iterator[TickerRecord]:
+        return iter(self.records())
+
+    def __len__(self) -> int:
+        return len(self.records())
+
+
+# The registry shared by every stage of the process
+ticker_registry = TickerRegistry()
@@ -1,8 +1,17 @@
+import csv
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select, update
+
 from sastocks.console import console
+from sastocks.database import unit_of_work
 from sastocks.models import Ticker
 from sastocks.polygon_client import PolygonClient
+from sastocks.ticker_registry import load_ticker_records, ticker_registry
 
-polygon_client = PolygonClient()
+# Accepted CSV headers for the symbol and company name columns, lower-cased
+SYMBOL_COLUMNS = ("ticker", "symbol")
+NAME_COLUMNS = ("company name", "name")
 
 
 def add_ticker(symbol: str):
@@ -14,6 +23,9 @@ def add_ticker(symbol: str):
     Returns:
         None
     """
+    # Symbols are stored upper-cased, as the CSV import and the reference list have them
+    symbol = symbol.strip().upper()
+    polygon_client = PolygonClient()
     try:
         # Use PolygonClient to get ticker details
         ticker_details = polygon_client.get_ticker_details(symbol)
@@ -26,7 +38,10 @@ def add_ticker(symbol: str):
 
     try:
         # Check if the symbol already exists in the database
-        existing_ticker = Ticker.query().filter_by(symbol=symbol).first()
+        with unit_of_work() as uow:
+            existing_ticker = uow.session.scalars(
+                select(Ticker.id).where(func.upper(Ticker.symbol) == symbol)
+            ).first()
         if existing_ticker:
             console.info(f"Symbol '{symbol}' already exists in the database.")
             return
@@ -34,6 +49,192 @@ def add_ticker(symbol: str):
         # Extract the name and other details from PolygonClient ticker details
         name = ticker_details["results"].get("name", "Unknown")
         Ticker().create(symbol=symbol, name=name)
+        ticker_registry.invalidate()
         console.info(f"Ticker '{symbol}' added successfully.")
     except Exception as e:
         console.error(f"Failed to add ticker '{symbol}'. Exception: {e}")
+
+
+def read_ticker_csv(path: str) -> Dict[str, Optional[str]]:
+    """
+    Read the symbols, and the company names when present, of a ticker CSV.
+
+    The symbol column is `ticker` or `symbol` and the name column, which is
+    optional, `company name` or `name`, in any case.
+
+    Args:
+        path (str): The path of the CSV file.
+
+    Returns:
+        Dict[str, Optional[str]]: The company name of each upper-cased symbol, in file order.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        reader = csv.DictReader(file)
+        columns = {
+            (column or "").strip().lower(): column for column in reader.fieldnames or []
+        }
+        symbol_column = next(
+            (columns[name] for name in SYMBOL_COLUMNS if name in columns), None
+        )
+        if symbol_column is None:
+            raise ValueError(
+                f"{path} has no ticker column, expected one of: {', '.join(SYMBOL_COLUMNS)}"
+            )
+        name_column = next(
+            (columns[name] for name in NAME_COLUMNS if name in columns), None
+        )
+
+        tickers = {}
+        for row in reader:
+            symbol = (row.get(symbol_column) or "").strip().upper()
+            if not symbol:
+                continue
+            name = (row.get(name_column) or "").strip() if name_column else ""
+            tickers[symbol] = name or None
+        return tickers
+
+
+def fetch_reference_names(polygon_client) -> Dict[str, str]:
+    """
+    Page through the ticker reference list for the name of every active stock.
+
+    Args:
+        polygon_client (PolygonClient): The client to list the tickers with.
+
+    Returns:
+        Dict[str, str]: The company name of each symbol.
+    """
+    return {
+        result["ticker"]: result.get("name") or result["ticker"]
+        for result in polygon_client.iter_tickers()
+    }
+
+
+def load_ticker_names() -> Dict[str, Tuple[int, str]]:
+    """The id and name of each upper-cased symbol in the ticker table, read fresh."""
+    existing = {}
+    for record in load_ticker_records():
+        # Keep the first row of a symbol that was added twice, in any case
+        existing.setdefault(record.symbol.upper(), (record.id, record.name))
+    return existing
+
+
+def diff_tickers(
+    existing: Dict[str, Tuple[int, str]], wanted: Dict[str, str]
+) -> Tuple[List[dict], List[dict]]:
+    """
+    Work out the rows to insert and update to bring the ticker table to `wanted`.
+
+    Args:
+        existing (Dict[str, Tuple[int, str]]): The id and name of each symbol in the table.
+        wanted (Dict[str, str]): The name each symbol should have.
+
+    Returns:
+        Tuple[List[dict], List[dict]]: The new rows, and the id and name of the rows
+            whose name changed.
+    """
+    inserts = []
+    updates = []
+    for symbol, name in wanted.items():
+        if symbol not in existing:
+            inserts.append({"symbol": symbol, "name": name})
+            continue
+        id, current_name = existing[symbol]
+        if name != current_name:
+            updates.append({"id": id, "name": name})
+    return inserts, updates
+
+
+def save_tickers(inserts: List[dict], updates: List[dict]):
+    """
+    Write new tickers and renamed tickers in a single transaction.
+
+    Args:
+        inserts (List[dict]): The symbol and name of each new ticker.
+        updates (List[dict]): The id and new name of each renamed ticker.
+    """
+    if not inserts and not updates:
+        return
+    with unit_of_work() as uow:
+        if inserts:
+            uow.session.execute(insert(Ticker), inserts)
+        if updates:
+            uow.session.execute(update(Ticker), updates)
+        uow.commit()
+    ticker_registry.invalidate()
+
+
+def import_tickers(
+    path: str, lookup: bool = True, polygon_client=None
+) -> Tuple[int, int]:
+    """
+    Add the tickers of a CSV file to the database in bulk.
+
+    With `lookup`, the symbols are validated and named from the ticker reference
+    list, paged through once, instead of one details request per symbol; symbols
+    that aren't listed are reported and skipped. Without it, the CSV is trusted
+    and its company names are used as they are.
+
+    Args:
+        path (str): The path of the CSV file.
+        lookup (bool): Whether to validate and name the symbols with Polygon.io.
+        polygon_client (Optional[PolygonClient]): The client to list the tickers with.
+
+    Returns:
+        Tuple[int, int]: The number of tickers added and renamed.
+    """
+    tickers = read_ticker_csv(path)
+    console.info(f"Read {len(tickers)} tickers from {path}.")
+
+    if lookup:
+        polygon_client = polygon_client or PolygonClient()
+        reference = fetch_reference_names(polygon_client)
+        unknown = [symbol for symbol in tickers if symbol not in reference]
+        if unknown:
+            console.error(
+                f"Skipping {len(unknown)} symbols not found on Polygon.io: "
+                + ", ".join(unknown)
+            )
+        wanted = {
+            symbol: reference[symbol] for symbol in tickers if symbol in reference
+        }
+    else:
+        wanted = {symbol: name or symbol for symbol, name in tickers.items()}
+
+    inserts, updates = diff_tickers(load_ticker_names(), wanted)
+    save_tickers(inserts, updates)
+    console.info(
+        f"Imported tickers: {len(inserts)} added, {len(updates)} renamed, "
+        f"{len(wanted) - len(inserts) - len(updates)} unchanged."
+    )
+    return len(inserts), len(updates)
+
+
+def sync_tickers(polygon_client=None) -> int:
+    """
+    Refresh the names of the tickers in the database from the ticker reference list.
+
+    Symbols that are no longer actively traded are reported and left as they are.
+
+    Args:
+        polygon_client (Optional[PolygonClient]): The client to list the tickers with.
+
+    Returns:
+        int: The number of tickers renamed.
+    """
+    polygon_client = polygon_client or PolygonClient()
+    existing = load_ticker_names()
+    reference = fetch_reference_names(polygon_client)
+
+    inactive = [symbol for symbol in existing if symbol not in reference]
+    if inactive:
+        console.error(
+            f"{len(inactive)} symbols are not actively traded: " + ", ".join(inactive)
+        )
+    wanted = {symbol: reference[symbol] for symbol in existing if symbol in reference}
+    _, updates = diff_tickers(existing, wanted)
+    save_tickers([], updates)
+    console.info(
+        f"Synced {len(existing)} tickers: {len(updates)} renamed, {len(inactive)} inactive."
+    )
+    return len(updates)
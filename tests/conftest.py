@@ -0,0 +1,27 @@
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from sastocks.models import Base
+from sastocks.ticker_registry import ticker_registry
+
+
+@pytest.fixture(autouse=True)
+def fresh_ticker_registry():
+    """Start every test without the tickers loaded by an earlier one."""
+    ticker_registry.invalidate()
+    yield
+    ticker_registry.invalidate()
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """A session factory for an empty database in a temporary file, used by every unit of work."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.sqlite'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    with patch("sastocks.database.DatabaseSession", factory):
+        yield factory
+    engine.dispose()
@@ -0,0 +1,115 @@
+import random
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from sastocks.daemon import Stage, next_delay, run_stages
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class AdvancingEvent(threading.Event):
+    """A stop event whose waits move a fake clock forward instead of sleeping."""
+
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def wait(self, timeout=None):
+        self.clock.now += timeout
+        return self.is_set()
+
+
+def test_next_delay_stays_within_the_jitter():
+    rng = random.Random(1)
+    delays = [next_delay(100, 0.1, rng) for _ in range(1000)]
+
+    assert 90 <= min(delays) and max(delays) <= 110
+    assert len(set(delays)) > 1
+
+
+def test_stages_run_on_their_intervals_until_stopped():
+    clock = FakeClock()
+    stop = AdvancingEvent(clock)
+    runs = []
+
+    def news():
+        runs.append(("news", clock.now))
+        if clock.now >= 300:
+            stop.set()
+
+    def sentiment():
+        runs.append(("sentiment", clock.now))
+        raise RuntimeError("model unavailable")
+
+    stages = [
+        Stage("news", news, 100),
+        Stage("sentiment", sentiment, 250),
+        Stage("disabled", lambda: runs.append(("disabled", clock.now)), 0),
+    ]
+    run_stages(stages, stop, jitter=0, clock=clock)
+
+    assert runs == [
+        ("news", 0.0),
+        ("sentiment", 0.0),
+        ("news", 100.0),
+        ("news", 200.0),
+        ("sentiment", 250.0),
+        ("news", 300.0),
+    ]
+    # A failing stage keeps being scheduled
+    assert stages[1].failures == 2
+
+
+def test_daemon_refuses_backends_that_dont_save_results():
+    from sastocks.daemon import run_daemon
+
+    with pytest.raises(ValueError):
+        run_daemon(backend_name="fake", stop=threading.Event())
+
+
+def test_scheduled_news_runs_refetch_healthy_tickers(session_factory):
+    from sastocks.daemon import run_daemon
+    from sastocks.models import Ticker
+
+    with session_factory() as session:
+        session.add_all(
+            [
+                Ticker(id=1, symbol="AAPL", name="Apple Inc."),
+                Ticker(id=2, symbol="MSFT", name="Microsoft Corp."),
+            ]
+        )
+        session.commit()
+
+    stop = threading.Event()
+    fetched = []
+
+    def iter_news_pages(symbol, **kwargs):
+        fetched.append(symbol)
+        if fetched.count("AAPL") == 2:
+            stop.set()
+        if symbol == "MSFT":
+            raise RuntimeError("Service unavailable")
+        return [{"status": "OK", "results": []}]
+
+    with patch("sastocks.pull_news.polygon_key", "test_api_key"), patch(
+        "sastocks.polygon_client.PolygonClient.iter_news_pages",
+        side_effect=iter_news_pages,
+    ):
+        run_daemon(
+            news_interval=0.01,
+            finance_interval=0,
+            sentiment_interval=0,
+            jitter=0,
+            stop=stop,
+        )
+
+    # The MSFT failure in the first run doesn't stop AAPL from being pulled again
+    assert fetched == ["AAPL", "MSFT", "AAPL", "MSFT"]
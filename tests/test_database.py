@@ -0,0 +1,123 @@
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import text
+
+from sastocks.database import build_engine, get_session, unit_of_work
+
+
+@pytest.fixture
+def mock_session_factory():
+    with patch("sastocks.database.DatabaseSession") as mock:
+        yield mock
+
+
+def test_nested_units_share_one_session(mock_session_factory):
+    session = mock_session_factory.return_value
+
+    with unit_of_work() as outer:
+        with unit_of_work() as inner:
+            assert inner.session is outer.session
+            assert get_session() is session
+        # The inner unit neither commits nor closes the shared session
+        session.commit.assert_not_called()
+        session.close.assert_not_called()
+
+    mock_session_factory.assert_called_once_with(expire_on_commit=False)
+    session.commit.assert_called_once()
+    session.close.assert_called_once()
+
+
+def test_unit_rolls_back_and_closes_on_error(mock_session_factory):
+    session = mock_session_factory.return_value
+
+    with pytest.raises(RuntimeError):
+        with unit_of_work():
+            raise RuntimeError("boom")
+
+    session.rollback.assert_called_once()
+    session.commit.assert_not_called()
+    session.close.assert_called_once()
+
+    # The next unit opens a fresh session
+    with unit_of_work():
+        pass
+    assert mock_session_factory.call_count == 2
+
+
+def test_checkpoint_commits_every_batch(mock_session_factory):
+    session = mock_session_factory.return_value
+
+    with unit_of_work(batch_size=3) as uow:
+        commits = [uow.checkpoint() for _ in range(7)]
+
+    assert commits == [False, False, True, False, False, True, False]
+    # Two batch commits and the final one when the unit closes
+    assert session.commit.call_count == 3
+
+
+def test_joined_units_only_flush(mock_session_factory):
+    session = mock_session_factory.return_value
+
+    with unit_of_work() as outer:
+        with unit_of_work() as inner:
+            inner.commit()
+        session.flush.assert_called_once()
+        session.commit.assert_not_called()
+        outer.commit()
+        session.commit.assert_called_once()
+
+
+def test_helpers_commit_with_the_outer_unit(session_factory):
+    from sastocks.models import Ticker
+
+    with pytest.raises(RuntimeError):
+        with unit_of_work():
+            Ticker.create(symbol="AAPL", name="Apple Inc.")
+            raise RuntimeError("boom")
+
+    with session_factory() as session:
+        assert session.query(Ticker).count() == 0
+
+
+def test_decorator_opens_a_unit_per_call(mock_session_factory):
+    @unit_of_work()
+    def job():
+        return get_session()
+
+    assert job() is mock_session_factory.return_value
+    job()
+
+    assert mock_session_factory.call_count == 2
+    assert mock_session_factory.return_value.close.call_count == 2
+
+
+def test_performance_profile_applies_pragmas(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'test.sqlite'}", "performance")
+
+    with engine.connect() as connection:
+
+        def pragma(name):
+            return connection.execute(text(f"PRAGMA {name}")).scalar()
+
+        assert pragma("journal_mode") == "wal"
+        # NORMAL
+        assert pragma("synchronous") == 1
+        assert pragma("cache_size") == -64 * 1024
+        # MEMORY
+        assert pragma("temp_store") == 2
+        assert pragma("busy_timeout") == 5000
+    engine.dispose()
+
+
+def test_default_profile_keeps_sqlite_defaults(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'test.sqlite'}", "default")
+
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "delete"
+    engine.dispose()
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError):
+        build_engine("sqlite://", "fastest")
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from sastocks.indicators import IndicatorEngine, compute_indicators
+
+
+def wilder_rsi(closes, window):
+    """Straightforward single-series RSI to check the vectorized engine against."""
+    changes = np.diff(closes)
+    gains = np.clip(changes, 0, None)
+    losses = np.clip(-changes, 0, None)
+    avg_gain, avg_loss = gains[:window].mean(), losses[:window].mean()
+    values = [100 - 100 / (1 + avg_gain / avg_loss)]
+    for gain, loss in zip(gains[window:], losses[window:]):
+        avg_gain = (avg_gain * (window - 1) + gain) / window
+        avg_loss = (avg_loss * (window - 1) + loss) / window
+        values.append(100 - 100 / (1 + avg_gain / avg_loss))
+    return np.array(values)
+
+
+def ema(values, window):
+    alpha = 2 / (window + 1)
+    result = [values[0]]
+    for value in values[1:]:
+        result.append(result[-1] + alpha * (value - result[-1]))
+    return np.array(result)
+
+
+@pytest.fixture
+def closes():
+    rng = np.random.default_rng(7)
+    return 100 + np.cumsum(rng.normal(size=(3, 60)), axis=1)
+
+
+def test_rsi_matches_wilder(closes):
+    values = compute_indicators(closes, rsi_window=14)
+
+    assert np.isnan(values.rsi[:, :14]).all()
+    for series, rsi in zip(closes, values.rsi):
+        np.testing.assert_allclose(rsi[14:], wilder_rsi(series, 14))
+
+
+def test_macd_matches_ema_difference(closes):
+    values = compute_indicators(closes, short_window=3, long_window=6, signal_window=4)
+
+    expected = ema(closes[0], 3) - ema(closes[0], 6)
+    np.testing.assert_allclose(values.macd[0, 5:], expected[5:])
+    np.testing.assert_allclose(values.signal[0, 8:], ema(expected[5:], 4)[3:])
+    np.testing.assert_allclose(
+        values.histogram[0, 8:], values.macd[0, 8:] - values.signal[0, 8:]
+    )
+    assert np.isnan(values.macd[0, :5]).all()
+
+
+def test_incremental_updates_match_batch(closes):
+    batch = compute_indicators(closes)
+
+    engine = IndicatorEngine(closes.shape[0])
+    compute_rows = [engine.update(closes[:, day]) for day in range(closes.shape[1])]
+
+    np.testing.assert_allclose(
+        np.stack([row.rsi for row in compute_rows], axis=1), batch.rsi
+    )
+    np.testing.assert_allclose(
+        np.stack([row.macd for row in compute_rows], axis=1), batch.macd
+    )
+
+
+def test_missing_closes_are_skipped(closes):
+    gapped = closes.copy()
+    gapped[1, :10] = np.nan
+
+    values = compute_indicators(gapped, rsi_window=14)
+
+    # The late series warms up from its own first close
+    assert np.isnan(values.rsi[1, :24]).all()
+    np.testing.assert_allclose(values.rsi[1, 24:], wilder_rsi(closes[1, 10:], 14))
+    np.testing.assert_allclose(values.rsi[0], compute_indicators(closes).rsi[0])
+
+
+def test_invalid_windows():
+    with pytest.raises(ValueError):
+        IndicatorEngine(1, short_window=26, long_window=12)
@@ -0,0 +1,70 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+from sastocks.jobs import COMPLETED, RUNNING, job
+from sastocks.models import Job
+
+
+def statuses(factory):
+    with factory() as session:
+        return session.scalars(select(Job.status).order_by(Job.id)).all()
+
+
+def test_interrupted_job_resumes_where_it_stopped(session_factory):
+    params = {"start": "2024-01-01", "end": "2024-01-03"}
+    days = [date(2024, 1, day) for day in (1, 2, 3)]
+
+    with pytest.raises(KeyboardInterrupt):
+        with job("finance", params) as run:
+            for day in days:
+                if day == date(2024, 1, 3):
+                    raise KeyboardInterrupt
+                run.mark_done(day=day)
+    assert statuses(session_factory) == [RUNNING]
+
+    processed = []
+    with job("finance", params) as run:
+        assert run.resumed
+        for day in days:
+            if run.is_done(day=day):
+                continue
+            processed.append(day)
+            run.mark_done(day=day)
+
+    assert processed == [date(2024, 1, 3)]
+    assert statuses(session_factory) == [COMPLETED]
+
+
+def test_failed_units_keep_the_job_open(session_factory):
+    with job("news", {"start": "a"}) as run:
+        run.mark_done(1)
+        run.mark_failed()
+    assert statuses(session_factory) == [RUNNING]
+
+    with job("news", {"start": "a"}) as run:
+        assert run.is_done(1) and not run.is_done(2)
+
+
+def test_jobs_only_resume_with_the_same_parameters(session_factory):
+    with pytest.raises(RuntimeError):
+        with job("news", {"start": "a"}) as run:
+            run.mark_done(1)
+            raise RuntimeError("boom")
+
+    with job("news", {"start": "b"}) as run:
+        assert not run.is_done(1)
+    # Without resume the unfinished job is abandoned and started over
+    with job("news", {"start": "a"}, resume=False) as run:
+        assert not run.is_done(1)
+
+    assert statuses(session_factory) == ["abandoned", COMPLETED, COMPLETED]
+
+
+def test_skipped_units_dont_keep_the_job_open(session_factory):
+    with job("finance-backfill", {"start": "a"}) as run:
+        run.mark_done(1)
+        run.mark_skipped(2, reason="BAD$: invalid symbol")
+    assert run.skipped == 1 and run.is_done(2)
+    assert statuses(session_factory) == [COMPLETED]
@@ -0,0 +1,131 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from sastocks.database import migrations
+from sastocks.models import Base
+
+LEGACY_SCHEMA = [
+    "CREATE TABLE ticker (id INTEGER PRIMARY KEY, symbol VARCHAR(10), name VARCHAR(255))",
+    "CREATE TABLE news_article (id INTEGER PRIMARY KEY, date DATE, title VARCHAR, "
+    "description VARCHAR, url VARCHAR, author VARCHAR, keywords VARCHAR, "
+    "publisher VARCHAR, image_url VARCHAR, amp_url VARCHAR, vader_sentiment VARCHAR, "
+    "gpt_sentiment VARCHAR, gpt_response VARCHAR, ticker_id INTEGER)",
+    "CREATE TABLE sentiment_scores (id INTEGER PRIMARY KEY, date VARCHAR, "
+    "historical_price_high FLOAT, historical_price_low FLOAT, "
+    "historical_price_open FLOAT, historical_price_close FLOAT, "
+    "historical_price_after_hours FLOAT, historical_price_volume FLOAT, "
+    "aggregated_score FLOAT, rsi FLOAT, macd FLOAT, ticker_id INTEGER)",
+]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.sqlite'}")
+    yield engine
+    engine.dispose()
+
+
+def index_names(engine, table_name):
+    return {index["name"] for index in inspect(engine).get_indexes(table_name)}
+
+
+def test_upgrade_legacy_database_in_place(engine):
+    with engine.begin() as connection:
+        for statement in LEGACY_SCHEMA:
+            connection.execute(text(statement))
+        connection.execute(
+            text(
+                "INSERT INTO sentiment_scores (id, ticker_id, date, historical_price_close) "
+                "VALUES (1, 1, '2023-01-10', 1.0), (2, 1, '2023-01-10', 2.0), "
+                "(3, 1, '2023-01-11', 3.0)"
+            )
+        )
+
+    applied = migrations.upgrade(engine)
+
+    assert [migration.version for migration in applied] == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert migrations.current_version(engine) == len(migrations.MIGRATIONS)
+    assert {
+        "ix_news_article_url",
+        "ix_news_article_ticker_id",
+        "ix_news_article_unscored",
+    } <= index_names(engine, "news_article")
+    with engine.connect() as connection:
+        rows = connection.execute(
+            text("SELECT id, historical_price_close FROM sentiment_scores ORDER BY id")
+        ).all()
+    # The latest duplicate of each ticker and date is kept
+    assert rows == [(2, 2.0), (3, 3.0)]
+    assert "uq_sentiment_scores_ticker_date" in index_names(engine, "sentiment_scores")
+    columns = {column["name"] for column in inspect(engine).get_columns("news_article")}
+    assert {"simhash", "cluster_id"} <= columns
+    assert "ix_news_article_cluster_id" in index_names(engine, "news_article")
+    assert "vader_compound" in columns
+    assert "ix_news_article_vader_unscored" in index_names(engine, "news_article")
+    assert {"news_watermark", "job", "job_checkpoint", "indicator_state"} <= set(
+        inspect(engine).get_table_names()
+    )
+
+
+def test_upgrade_is_idempotent_on_a_fresh_database(engine):
+    Base.metadata.create_all(bind=engine)
+
+    assert len(migrations.upgrade(engine)) == len(migrations.MIGRATIONS)
+    assert migrations.upgrade(engine) == []
+    # The unique constraint from the model is not duplicated by an index
+    assert "uq_sentiment_scores_ticker_date" not in index_names(
+        engine, "sentiment_scores"
+    )
+
+
+def test_unscored_backlog_uses_the_partial_index(engine):
+    migrations.upgrade(engine)
+
+    with engine.connect() as connection:
+        plan = connection.execute(
+            text(
+                "EXPLAIN QUERY PLAN SELECT id FROM news_article "
+                "WHERE gpt_sentiment IS NULL"
+            )
+        ).all()
+
+    assert "ix_news_article_unscored" in " ".join(row[-1] for row in plan)
+
+
+def test_upgrade_stops_at_target(engine):
+    assert [migration.version for migration in migrations.upgrade(engine, 1)] == [1]
+    assert migrations.current_version(engine) == 1
+
+
+def test_require_current_points_at_the_upgrade_command(engine):
+    with pytest.raises(RuntimeError, match="sastocks db init"):
+        migrations.require_current(engine)
+
+    migrations.upgrade(engine, target=2)
+    with pytest.raises(RuntimeError, match="sastocks db upgrade"):
+        migrations.require_current(engine)
+
+    migrations.upgrade(engine)
+    migrations.require_current(engine)
+
+
+def test_watermarks_from_before_coverage_have_none(engine):
+    migrations.upgrade(engine, 7)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE news_watermark"))
+        connection.execute(
+            text(
+                "CREATE TABLE news_watermark "
+                "(ticker_id INTEGER PRIMARY KEY, published_utc VARCHAR NOT NULL)"
+            )
+        )
+        connection.execute(
+            text("INSERT INTO news_watermark VALUES (1, '2024-01-02T15:00:00Z')")
+        )
+
+    assert [migration.version for migration in migrations.upgrade(engine)] == [8]
+    with engine.connect() as connection:
+        rows = connection.execute(
+            text("SELECT published_utc, covered_from FROM news_watermark")
+        ).all()
+    assert rows == [("2024-01-02T15:00:00Z", None)]
@@ -0,0 +1,72 @@
+import pytest
+
+from sastocks.near_duplicates import (
+    SimHashIndex,
+    article_fingerprint,
+    simhash,
+    to_signed,
+    to_unsigned,
+)
+
+STORY = (
+    "Apple shares rise after record iPhone sales beat expectations",
+    "Apple Inc. reported record iPhone sales for the quarter, beating analyst "
+    "expectations as demand in China recovered.",
+)
+SYNDICATED = (
+    "Apple Shares Rise After Record iPhone Sales Beat Expectations",
+    "Apple Inc reported record iPhone sales for the quarter, beating analysts' "
+    "expectations as demand in China recovered.",
+)
+OPPOSITE = (
+    "Apple shares fall after weak iPhone sales miss expectations",
+    "Apple Inc. reported weak iPhone sales for the quarter, missing analyst "
+    "expectations as demand in China slowed.",
+)
+UNRELATED = (
+    "Tesla recalls 2 million vehicles over autopilot",
+    "Tesla is recalling over 2 million vehicles in the US to fix its Autopilot system.",
+)
+
+
+def distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def test_simhash_ignores_case_and_punctuation():
+    assert simhash("Apple beats estimates!") == simhash("apple beats  estimates")
+    assert simhash("") == 0
+
+
+def test_rewordings_are_closer_than_different_stories():
+    story = article_fingerprint(*STORY)
+
+    assert distance(story, article_fingerprint(*SYNDICATED)) <= 5
+    assert distance(story, article_fingerprint(*OPPOSITE)) > 5
+    assert distance(story, article_fingerprint(*UNRELATED)) > 16
+
+
+def test_index_clusters_near_duplicates():
+    index = SimHashIndex()
+
+    story = index.assign(article_fingerprint(*STORY))
+    assert index.assign(article_fingerprint(*SYNDICATED)) == story
+    assert index.assign(article_fingerprint(*OPPOSITE)) != story
+    assert index.assign(article_fingerprint(*UNRELATED)) != story
+    assert len(index) == 4
+
+
+def test_index_round_trips_through_stored_values():
+    fingerprint = article_fingerprint(*STORY)
+    stored = to_signed(fingerprint)
+
+    assert -(1 << 63) <= stored < 1 << 63
+    assert to_unsigned(stored) == fingerprint
+
+    index = SimHashIndex.from_rows([(stored, 42)])
+    assert index.find(article_fingerprint(*SYNDICATED)) == 42
+
+
+def test_max_distance_must_fit_the_bands():
+    with pytest.raises(ValueError):
+        SimHashIndex(max_distance=8)
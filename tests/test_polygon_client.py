@@ -1,8 +1,10 @@
-from unittest.mock import patch
+import asyncio
+from unittest.mock import MagicMock, patch
 
 import pytest
 
-from sastocks.polygon_client import PolygonClient, BASE_URL
+from sastocks.polygon_client import AsyncPolygonClient, PolygonClient, BASE_URL
+from sastocks.rate_limiter import RateLimiter
 
 
 @pytest.fixture
@@ -10,7 +12,7 @@ def polygon_client():
     return PolygonClient(api_key="test_api_key")
 
 
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_get_ticker_details(mock_get, polygon_client):
     # Arrange
     # Mock response for /v3/reference/tickers/{ticker}
@@ -72,7 +74,7 @@ def test_get_ticker_details(mock_get, polygon_client):
     assert "Invalid ticker symbol" in str(context.value)
 
 
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_get_news(mock_get, polygon_client):
     # Mock response for /v2/reference/news with filters
     mock_response = {
@@ -117,7 +119,7 @@ def test_get_news(mock_get, polygon_client):
     assert response == mock_response
 
 
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_get_open_close(mock_get, polygon_client):
     # Arrange
     # Mock response for /v1/open-close/{ticker}/{date}
@@ -165,7 +167,7 @@ def test_get_open_close(mock_get, polygon_client):
     assert "Invalid date format" in str(context_date.value)
 
 
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_get_rsi(mock_get, polygon_client):
     # Arrange
     mock_get.return_value.json.return_value = {
@@ -182,7 +184,7 @@ def test_get_rsi(mock_get, polygon_client):
     assert response["results"][0]["value"] == 50.0
 
 
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_get_macd(mock_get, polygon_client):
     # Arrange
     mock_get.return_value.json.return_value = {
@@ -197,3 +199,150 @@ def test_get_macd(mock_get, polygon_client):
     mock_get.assert_called_once()
     assert response["status"] == "OK"
     assert response["results"][0]["value"] == 1.5
+
+
+def test_session_is_pooled():
+    client = PolygonClient(api_key="test_api_key", pool_size=4)
+    adapter = client.session.get_adapter(BASE_URL)
+
+    assert adapter._pool_maxsize == 4
+    assert "gzip" in client.session.headers["Accept-Encoding"]
+
+    with pytest.raises(ValueError):
+        PolygonClient(api_key="test_api_key", pool_size=0)
+
+
+@patch("requests.Session.get")
+def test_async_client_shares_pool(mock_get):
+    mock_get.return_value.json.return_value = {"status": "OK", "results": []}
+
+    async def pull(symbols):
+        async with AsyncPolygonClient(api_key="test_api_key", concurrency=2) as client:
+            assert client.client.pool_size >= 2
+            return await asyncio.gather(*(client.get_news(s) for s in symbols))
+
+    responses = asyncio.run(pull(["AAPL", "MSFT", "NVDA"]))
+
+    assert responses == [{"status": "OK", "results": []}] * 3
+    assert mock_get.call_count == 3
+
+
+@patch("requests.Session.get")
+def test_retries_after_429(mock_get):
+    throttled = MagicMock(status_code=429, headers={"Retry-After": "0"})
+    ok = MagicMock(status_code=200)
+    ok.json.return_value = {"status": "OK", "results": []}
+    mock_get.side_effect = [throttled, ok]
+    client = PolygonClient(api_key="test_api_key", rate_limiter=RateLimiter())
+
+    response = client.get_news("AAPL")
+
+    assert response == {"status": "OK", "results": []}
+    assert mock_get.call_count == 2
+    assert client.stats["throttled"] == 1
+    assert client.stats["retries"] == 1
+
+
+@patch("requests.Session.get")
+def test_iter_news_pages_follows_next_url(mock_get, polygon_client):
+    next_url = f"{BASE_URL}/v2/reference/news?cursor=abc"
+    mock_get.return_value.json.side_effect = [
+        {"status": "OK", "results": [{"title": "First"}], "next_url": next_url},
+        {"status": "OK", "results": [{"title": "Second"}]},
+    ]
+
+    articles = list(polygon_client.iter_news("AAPL"))
+
+    assert [article["title"] for article in articles] == ["First", "Second"]
+    assert mock_get.call_args_list[0].kwargs["params"]["limit"] == 1000
+    mock_get.assert_called_with(next_url, params={"apiKey": "test_api_key"})
+
+
+@patch("requests.Session.get")
+def test_get_grouped_daily(mock_get, polygon_client):
+    mock_response = {
+        "status": "OK",
+        "resultsCount": 1,
+        "results": [{"T": "AAPL", "o": 130.2, "h": 133.4, "l": 129.9, "c": 130.1}],
+    }
+    mock_get.return_value.json.return_value = mock_response
+
+    response = polygon_client.get_grouped_daily("2023-01-09")
+
+    assert response == mock_response
+    mock_get.assert_called_once_with(
+        f"{BASE_URL}/v2/aggs/grouped/locale/us/market/stocks/2023-01-09",
+        params={"adjusted": "true", "include_otc": "false", "apiKey": "test_api_key"},
+    )
+
+    with pytest.raises(ValueError) as context:
+        polygon_client.get_grouped_daily("01/09/2023")
+    assert "Invalid date format" in str(context.value)
+
+
+@patch("requests.Session.get")
+def test_iter_aggregates_follows_next_url(mock_get, polygon_client):
+    next_url = (
+        f"{BASE_URL}/v2/aggs/ticker/AAPL/range/1/day/2023-01-09/2023-12-29?cursor=abc"
+    )
+    mock_get.return_value.json.side_effect = [
+        {
+            "status": "OK",
+            "results": [{"t": 1673240400000, "c": 130.1}],
+            "next_url": next_url,
+        },
+        {"status": "OK", "results": [{"t": 1673326800000, "c": 130.7}]},
+    ]
+
+    bars = list(polygon_client.iter_aggregates("AAPL", "2023-01-09", "2023-12-29"))
+
+    assert [bar["c"] for bar in bars] == [130.1, 130.7]
+    assert mock_get.call_args_list[0].args[0] == (
+        f"{BASE_URL}/v2/aggs/ticker/AAPL/range/1/day/2023-01-09/2023-12-29"
+    )
+    mock_get.assert_called_with(next_url, params={"apiKey": "test_api_key"})
+
+
+@patch("requests.Session.get")
+def test_iter_tickers_follows_next_url(mock_get, polygon_client):
+    next_url = f"{BASE_URL}/v3/reference/tickers?cursor=abc"
+    mock_get.return_value.json.side_effect = [
+        {
+            "status": "OK",
+            "results": [{"ticker": "A", "name": "Agilent"}],
+            "next_url": next_url,
+        },
+        {"status": "OK", "results": [{"ticker": "AAPL", "name": "Apple Inc."}]},
+    ]
+
+    tickers = list(polygon_client.iter_tickers())
+
+    assert [ticker["ticker"] for ticker in tickers] == ["A", "AAPL"]
+    assert mock_get.call_args_list[0].kwargs["params"] == {
+        "apiKey": "test_api_key",
+        "market": "stocks",
+        "active": "true",
+        "limit": 1000,
+    }
+    mock_get.assert_called_with(next_url, params={"apiKey": "test_api_key"})
+
+
+def test_class_share_symbols_are_valid():
+    from sastocks.polygon_client import InvalidTickerError, validate_ticker
+
+    for symbol in ("AAPL", "BRK.B", "bf.b"):
+        validate_ticker(symbol)
+    for symbol in ("BRK.", ".B", "BRK..B", "BRK/B", "BRK.B.C", "", None):
+        with pytest.raises(InvalidTickerError):
+            validate_ticker(symbol)
+
+
+@patch("requests.Session.get")
+def test_get_ticker_details_of_a_class_share(mock_get, polygon_client):
+    mock_get.return_value.json.return_value = {"status": "OK", "results": {}}
+
+    polygon_client.get_ticker_details("brk.b")
+
+    mock_get.assert_called_with(
+        f"{BASE_URL}/v3/reference/tickers/BRK.B?&apiKey={polygon_client.api_key}"
+    )
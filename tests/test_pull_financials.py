@@ -0,0 +1,246 @@
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from sastocks.indicators import compute_indicators
+from sastocks.jobs import COMPLETED, RUNNING
+from sastocks.models import IndicatorState, Job, JobCheckpoint, SentimentScore, Ticker
+from sastocks.polygon_client import PolygonClient, validate_ticker
+from sastocks.pull_financials import (
+    backfill_financials,
+    backfill_financials_async,
+    match_grouped_daily,
+    pull_financials,
+    pull_financials_async,
+    save_daily_bars,
+    update_indicators,
+)
+from sastocks.ticker_registry import TickerRecord
+
+AAPL = TickerRecord(1, "AAPL", "Apple Inc.")
+
+
+def test_saving_bars_keeps_the_after_hours_price(session_factory):
+    with session_factory() as session:
+        session.add(
+            SentimentScore(
+                ticker_id=1,
+                date="2024-01-02",
+                historical_price_close=185.0,
+                historical_price_after_hours=184.5,
+            )
+        )
+        session.commit()
+
+    save_daily_bars(datetime(2024, 1, 2), {"AAPL": (AAPL, {"c": 185.6, "v": 100})})
+
+    with session_factory() as session:
+        row = session.scalars(select(SentimentScore)).one()
+    assert row.historical_price_close == 185.6
+    assert row.historical_price_after_hours == 184.5
+
+
+def test_grouped_bars_go_to_the_first_row_of_a_symbol():
+    duplicate = TickerRecord(2, "aapl", "Apple Inc.")
+    grouped = {"status": "OK", "results": [{"T": "AAPL", "c": 185.6}]}
+
+    assert match_grouped_daily(grouped, [AAPL, duplicate]) == {
+        "AAPL": (AAPL, {"T": "AAPL", "c": 185.6})
+    }
+
+
+def test_days_without_trading_are_skipped(session_factory):
+    polygon_client = MagicMock()
+    polygon_client.get_grouped_daily.return_value = {"status": "OK", "results": []}
+
+    pull_financials(("2024-01-06", "2024-01-07"), polygon_client=polygon_client)
+
+    assert polygon_client.get_grouped_daily.call_count == 2
+    with session_factory() as session:
+        assert session.scalars(select(SentimentScore)).all() == []
+
+
+def test_indicators_continue_from_the_stored_state(session_factory):
+    rng = np.random.default_rng(3)
+    closes = 100 + np.cumsum(rng.normal(size=(2, 60)), axis=1)
+    days = [(date(2024, 1, 1) + timedelta(days=day)).isoformat() for day in range(60)]
+    with session_factory() as session:
+        session.add_all(
+            SentimentScore(
+                ticker_id=ticker_id,
+                date=day,
+                historical_price_close=float(closes[ticker_id - 1, i]),
+            )
+            for ticker_id in (1, 2)
+            for i, day in enumerate(days)
+        )
+        session.commit()
+
+    assert update_indicators(datetime(2024, 1, 1), datetime(2024, 2, 9)) == 80
+    # The state before the window is stored, and only the window is filled in
+    assert update_indicators(datetime(2024, 2, 10), datetime(2024, 2, 29)) == 40
+
+    expected = compute_indicators(closes)
+    with session_factory() as session:
+        rows = session.execute(
+            select(SentimentScore.ticker_id, SentimentScore.rsi, SentimentScore.macd)
+            .where(SentimentScore.date > days[39])
+            .order_by(SentimentScore.ticker_id, SentimentScore.date)
+        ).all()
+        states = session.scalars(select(IndicatorState)).all()
+    rsi = np.array([row.rsi for row in rows]).reshape(2, 20)
+    macd = np.array([row.macd for row in rows]).reshape(2, 20)
+    np.testing.assert_allclose(rsi, expected.rsi[:, 40:])
+    np.testing.assert_allclose(macd, expected.macd[:, 40:])
+    assert [state.date for state in states] == [days[39], days[39]]
+
+
+def test_rerunning_a_window_continues_from_the_state_before_it(session_factory):
+    rng = np.random.default_rng(5)
+    closes = 100 + np.cumsum(rng.normal(size=(1, 40)), axis=1)
+    days = [(date(2024, 1, 1) + timedelta(days=day)).isoformat() for day in range(40)]
+    with session_factory() as session:
+        session.add_all(
+            SentimentScore(
+                ticker_id=1, date=day, historical_price_close=float(closes[0, i])
+            )
+            for i, day in enumerate(days)
+        )
+        session.commit()
+    window = datetime(2024, 2, 8), datetime(2024, 2, 9)
+
+    assert update_indicators(*window) == 2
+    # Break every close before the window: a run that reread them would go wrong
+    with session_factory() as session:
+        for row in session.scalars(
+            select(SentimentScore).where(SentimentScore.date < days[38])
+        ):
+            row.historical_price_close = -1.0
+        session.commit()
+    assert update_indicators(*window) == 2
+
+    expected = compute_indicators(closes)
+    with session_factory() as session:
+        rows = session.execute(
+            select(SentimentScore.rsi, SentimentScore.macd)
+            .where(SentimentScore.date >= days[38])
+            .order_by(SentimentScore.date)
+        ).all()
+        state = session.scalars(select(IndicatorState)).one()
+    np.testing.assert_allclose([row.rsi for row in rows], expected.rsi[0, 38:])
+    np.testing.assert_allclose([row.macd for row in rows], expected.macd[0, 38:])
+    assert state.date == days[37]
+
+
+def seed_tickers(factory, *symbols):
+    with factory() as session:
+        session.add_all(
+            Ticker(id=i, symbol=symbol, name=symbol)
+            for i, symbol in enumerate(symbols, start=1)
+        )
+        session.commit()
+
+
+def epoch_ms(day: str) -> int:
+    return int(
+        datetime.fromisoformat(day).replace(tzinfo=timezone.utc).timestamp() * 1000
+    )
+
+
+def job_state(factory):
+    """The job statuses, checkpointed units and stored price rows."""
+    with factory() as session:
+        return (
+            session.scalars(select(Job.status)).all(),
+            set(session.execute(select(JobCheckpoint.ticker_id, JobCheckpoint.date))),
+            set(session.execute(select(SentimentScore.ticker_id, SentimentScore.date))),
+        )
+
+
+def test_pull_financials_async_checkpoints_saved_days(session_factory):
+    seed_tickers(session_factory, "AAPL", "MSFT")
+    unavailable = {"2024-01-03"}
+
+    def get_grouped_daily(day, **kwargs):
+        if day in unavailable:
+            raise RuntimeError("Service unavailable")
+        return {
+            "status": "OK",
+            "results": [{"T": "AAPL", "c": 185.6}, {"T": "MSFT", "c": 370.1}],
+        }
+
+    date_range = ("2024-01-02", "2024-01-04")
+    with patch("sastocks.pull_financials.API_KEY", "test_api_key"), patch.object(
+        PolygonClient, "get_grouped_daily", side_effect=get_grouped_daily
+    ) as grouped_daily:
+        asyncio.run(pull_financials_async(date_range, concurrency=2))
+        # The failed day keeps the job open; the others are written and checkpointed
+        assert job_state(session_factory) == (
+            [RUNNING],
+            {(None, "2024-01-02"), (None, "2024-01-04")},
+            {(t, d) for t in (1, 2) for d in ("2024-01-02", "2024-01-04")},
+        )
+
+        unavailable.clear()
+        asyncio.run(pull_financials_async(date_range, concurrency=2))
+
+    days = [call.args[0] for call in grouped_daily.call_args_list]
+    assert sorted(days[:3]) == ["2024-01-02", "2024-01-03", "2024-01-04"]
+    # The resumed run only pulls the day that failed
+    assert days[3:] == ["2024-01-03"]
+    assert job_state(session_factory) == (
+        [COMPLETED],
+        {(None, day) for day in ("2024-01-02", "2024-01-03", "2024-01-04")},
+        {(t, d) for t in (1, 2) for d in ("2024-01-02", "2024-01-03", "2024-01-04")},
+    )
+
+
+@pytest.mark.parametrize(
+    "backfill",
+    [
+        lambda date_range: backfill_financials(date_range),
+        lambda date_range: asyncio.run(
+            backfill_financials_async(date_range, concurrency=2)
+        ),
+    ],
+    ids=["sync", "async"],
+)
+def test_backfill_checkpoints_saved_tickers(session_factory, backfill):
+    seed_tickers(session_factory, "AAPL", "MSFT", "BAD$")
+    unavailable = {"MSFT"}
+    days = ["2024-01-02", "2024-01-03"]
+
+    def iter_aggregates(symbol, from_date, to_date, **kwargs):
+        validate_ticker(symbol)
+        if symbol in unavailable:
+            raise RuntimeError("Service unavailable")
+        # Aggregate bars are stamped with their day's midnight UTC in milliseconds
+        return [{"t": epoch_ms(day), "c": 1.0} for day in days]
+
+    with patch("sastocks.pull_financials.API_KEY", "test_api_key"), patch.object(
+        PolygonClient, "iter_aggregates", side_effect=iter_aggregates
+    ) as aggregates:
+        backfill(tuple(days))
+        # MSFT keeps the job open; the invalid symbol is checkpointed as skipped
+        assert job_state(session_factory) == (
+            [RUNNING],
+            {(1, None), (3, None)},
+            {(1, day) for day in days},
+        )
+
+        unavailable.clear()
+        backfill(tuple(days))
+
+    symbols = [call.args[0] for call in aggregates.call_args_list]
+    assert sorted(symbols[:3]) == ["AAPL", "BAD$", "MSFT"]
+    # The resumed run only pulls the ticker that failed
+    assert symbols[3:] == ["MSFT"]
+    assert job_state(session_factory) == (
+        [COMPLETED],
+        {(1, None), (2, None), (3, None)},
+        {(t, day) for t in (1, 2) for day in days},
+    )
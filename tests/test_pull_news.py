@@ -1,14 +1,22 @@
+import asyncio
 from unittest.mock import patch
 
 import pytest
+from sqlalchemy import func, select
 
 from sastocks.models import Ticker
 from sastocks.pull_news import pull_news
 
 
+@pytest.fixture(autouse=True)
+def polygon_key():
+    with patch("sastocks.pull_news.polygon_key", "test_api_key"):
+        yield
+
+
 @pytest.fixture
 def mock_session():
-    with patch("sastocks.pull_news.DatabaseSession") as mock:
+    with patch("sastocks.database.DatabaseSession") as mock:
         yield mock
 
 
@@ -39,7 +47,7 @@ def test_pull_news_success(mock_session, mock_polygon_client):
     }
 
     ticker = Ticker(id=1, symbol="AAPL", name="Apple Inc.")
-    mock_session.return_value.__enter__.return_value.query.return_value.filter_by.return_value.first.return_value = (
+    mock_session.return_value.query.return_value.filter_by.return_value.first.return_value = (
         ticker
     )
 
@@ -56,7 +64,7 @@ def test_pull_news_api_error(mock_session, mock_polygon_client):
     }
 
     ticker = Ticker(id=1, symbol="AAPL", name="Apple Inc.")
-    mock_session.return_value.__enter__.return_value.query.return_value.filter_by.return_value.first.return_value = (
+    mock_session.return_value.query.return_value.filter_by.return_value.first.return_value = (
         ticker
     )
 
@@ -64,18 +72,296 @@ def test_pull_news_api_error(mock_session, mock_polygon_client):
     pull_news()
 
     # Assert
-    mock_session.return_value.__enter__.return_value.add.assert_not_called()
+    mock_session.return_value.add.assert_not_called()
 
 
 def test_pull_news_no_tickers(mock_session, mock_polygon_client):
     # Arrange
-    mock_session.return_value.__enter__.return_value.query.return_value.all.return_value = (
-        []
-    )
+    mock_session.return_value.query.return_value.all.return_value = []
 
     # Act
     pull_news()
 
     # Assert
-    mock_session.return_value.__enter__.return_value.add.assert_not_called()
-    mock_session.return_value.__enter__.return_value.add.assert_not_called()
+    mock_session.return_value.add.assert_not_called()
+    mock_session.return_value.add.assert_not_called()
+
+
+def test_ticker_window_starts_at_the_watermark():
+    from sastocks.pull_news import Watermark, ticker_window
+
+    start, end = "2024-01-02T00:00:00Z", "2024-01-03T23:59:59Z"
+    covered = "2024-01-01T00:00:00Z"
+
+    assert ticker_window(start, end, None) == start
+    assert (
+        ticker_window(start, end, Watermark("2024-01-01T12:00:00Z", covered)) == start
+    )
+    assert (
+        ticker_window(start, end, Watermark("2024-01-03T09:30:00Z", covered))
+        == "2024-01-03T09:30:00Z"
+    )
+    # Without coverage back to the start of the window, the watermark isn't trusted
+    assert ticker_window(start, end, Watermark("2024-01-03T09:30:00Z", None)) == start
+    assert (
+        ticker_window(
+            start, end, Watermark("2024-01-03T09:30:00Z", "2024-01-02T12:00:00Z")
+        )
+        == start
+    )
+    # A window older than the watermark may never have been pulled, so it is fetched
+    assert (
+        ticker_window(start, end, Watermark("2024-01-04T00:00:00Z", covered)) == start
+    )
+
+
+def test_extend_watermark_keeps_coverage_contiguous():
+    from sastocks.pull_news import Watermark, extend_watermark
+
+    watermark = Watermark("2024-01-02T15:00:00Z", "2024-01-02T00:00:00Z")
+
+    assert (
+        extend_watermark(None, "2024-01-01T00:00:00Z", "2024-01-01T23:59:59Z", None)
+        is None
+    )
+    # A pull overlapping the coverage widens it at either end
+    assert extend_watermark(
+        watermark,
+        "2024-01-01T00:00:00Z",
+        "2024-01-03T23:59:59Z",
+        "2024-01-03T08:00:00Z",
+    ) == Watermark("2024-01-03T08:00:00Z", "2024-01-01T00:00:00Z")
+    # A pull after a gap starts the coverage over
+    assert extend_watermark(
+        watermark,
+        "2024-01-05T00:00:00Z",
+        "2024-01-05T23:59:59Z",
+        "2024-01-05T08:00:00Z",
+    ) == Watermark("2024-01-05T08:00:00Z", "2024-01-05T00:00:00Z")
+    # A pull before the coverage leaves it as it is
+    assert (
+        extend_watermark(
+            watermark, "2023-12-01T00:00:00Z", "2023-12-01T23:59:59Z", None
+        )
+        == watermark
+    )
+
+
+def test_pull_news_resumes_from_the_watermark(session_factory):
+    from sastocks.models import NewsWatermark
+
+    factory = session_factory
+    with factory() as session:
+        session.add(Ticker(id=1, symbol="AAPL", name="Apple Inc."))
+        session.commit()
+
+    def page(*published):
+        return {
+            "status": "OK",
+            "results": [
+                {
+                    "published_utc": timestamp,
+                    "title": f"News at {timestamp}",
+                    "description": "Details.",
+                    "article_url": f"https://example.com/{timestamp}",
+                    "publisher": {"name": "Example News"},
+                }
+                for timestamp in published
+            ],
+        }
+
+    with patch("sastocks.pull_news.PolygonClient.iter_news_pages") as iter_news_pages:
+        iter_news_pages.return_value = [
+            page("2024-01-02T15:00:00Z", "2024-01-02T09:00:00Z")
+        ]
+        pull_news(("2024-01-01", "2024-01-02"))
+        iter_news_pages.return_value = [page("2024-01-02T15:00:00Z")]
+        pull_news(("2024-01-01", "2024-01-02"))
+        pull_news(("2024-01-01", "2024-01-02"), full=True)
+
+    first, second, full = iter_news_pages.call_args_list
+    assert first.kwargs["published_utc"] == "2024-01-01T00:00:00Z"
+    assert second.kwargs["published_utc"] == "2024-01-02T15:00:00Z"
+    assert full.kwargs["published_utc"] == "2024-01-01T00:00:00Z"
+    with factory() as session:
+        assert session.get(NewsWatermark, 1).published_utc == "2024-01-02T15:00:00Z"
+
+
+def test_incremental_runs_refetch_every_healthy_ticker(session_factory):
+    from sastocks.models import Job
+    from sastocks.polygon_client import validate_ticker
+
+    factory = session_factory
+    with factory() as session:
+        session.add_all(
+            [
+                Ticker(id=1, symbol="AAPL", name="Apple Inc."),
+                Ticker(id=2, symbol="MSFT", name="Microsoft Corp."),
+                Ticker(id=3, symbol="BAD$", name="Not a symbol"),
+            ]
+        )
+        session.commit()
+
+    def iter_news_pages(symbol, **kwargs):
+        validate_ticker(symbol)
+        if symbol == "MSFT":
+            raise RuntimeError("Service unavailable")
+        return [{"status": "OK", "results": []}]
+
+    with patch(
+        "sastocks.pull_news.PolygonClient.iter_news_pages", side_effect=iter_news_pages
+    ) as mock:
+        pull_news(("2024-01-01", "2024-01-02"))
+        pull_news(("2024-01-01", "2024-01-02"))
+
+    fetched = [call.args[0] for call in mock.call_args_list]
+    assert fetched.count("AAPL") == 2
+    # The watermarks track incremental runs, so no job is left open by the MSFT failure
+    with factory() as session:
+        assert session.scalars(select(Job)).all() == []
+
+
+def test_older_windows_are_pulled_without_moving_the_watermark(session_factory):
+    from sastocks.models import NewsArticle, NewsWatermark
+
+    factory = session_factory
+    with factory() as session:
+        session.add(Ticker(id=1, symbol="AAPL", name="Apple Inc."))
+        session.add(NewsWatermark(ticker_id=1, published_utc="2024-02-01T12:00:00Z"))
+        session.commit()
+
+    older_page = {
+        "status": "OK",
+        "results": [
+            {
+                "published_utc": "2024-01-02T09:00:00Z",
+                "title": "Older news",
+                "description": "Details.",
+                "article_url": "https://example.com/older",
+                "publisher": {"name": "Example News"},
+            }
+        ],
+    }
+    with patch(
+        "sastocks.pull_news.PolygonClient.iter_news_pages", return_value=[older_page]
+    ) as iter_news_pages:
+        pull_news(("2024-01-01", "2024-01-02"))
+
+    assert iter_news_pages.call_args.kwargs["published_utc"] == "2024-01-01T00:00:00Z"
+    with factory() as session:
+        assert session.scalars(select(NewsArticle.title)).all() == ["Older news"]
+        assert session.get(NewsWatermark, 1).published_utc == "2024-02-01T12:00:00Z"
+
+
+def test_windows_starting_before_the_coverage_are_pulled_in_full(session_factory):
+    from sastocks.models import NewsWatermark
+
+    factory = session_factory
+    with factory() as session:
+        session.add(Ticker(id=1, symbol="AAPL", name="Apple Inc."))
+        session.add(
+            NewsWatermark(
+                ticker_id=1,
+                published_utc="2024-03-01T10:00:00Z",
+                covered_from="2024-02-28T00:00:00Z",
+            )
+        )
+        session.commit()
+
+    with patch(
+        "sastocks.pull_news.PolygonClient.iter_news_pages",
+        return_value=[{"status": "OK", "results": []}],
+    ) as iter_news_pages:
+        pull_news(("2023-01-01", "2024-03-01"))
+        pull_news(("2023-06-01", "2024-03-02"))
+
+    first, second = iter_news_pages.call_args_list
+    # The months before the coverage are requested rather than skipped
+    assert first.kwargs["published_utc"] == "2023-01-01T00:00:00Z"
+    # Once they are in, a window inside the coverage starts at the watermark
+    assert second.kwargs["published_utc"] == "2024-03-01T10:00:00Z"
+    with factory() as session:
+        watermark = session.get(NewsWatermark, 1)
+        assert (watermark.published_utc, watermark.covered_from) == (
+            "2024-03-01T10:00:00Z",
+            "2023-01-01T00:00:00Z",
+        )
+
+
+def test_pull_news_async_checkpoints_finished_tickers(session_factory):
+    from sastocks.jobs import COMPLETED, RUNNING
+    from sastocks.models import Job, JobCheckpoint, NewsArticle, NewsWatermark
+    from sastocks.polygon_client import BASE_URL, PolygonClient, validate_ticker
+    from sastocks.pull_news import pull_news_async
+
+    factory = session_factory
+    with factory() as session:
+        session.add_all(
+            [
+                Ticker(id=1, symbol="AAPL", name="Apple Inc."),
+                Ticker(id=2, symbol="MSFT", name="Microsoft Corp."),
+                Ticker(id=3, symbol="BAD$", name="Not a symbol"),
+            ]
+        )
+        session.commit()
+
+    def page(symbol, published, next_url=None):
+        return {
+            "status": "OK",
+            "results": [
+                {
+                    "published_utc": published,
+                    "title": f"{symbol} news at {published}",
+                    "description": "Details.",
+                    "article_url": f"https://example.com/{symbol}/{published}",
+                    "publisher": {"name": "Example News"},
+                }
+            ],
+            "next_url": next_url,
+        }
+
+    unavailable = {"MSFT"}
+
+    def get_news(symbol, **kwargs):
+        validate_ticker(symbol)
+        next_url = f"{BASE_URL}/v2/reference/news?cursor={symbol}"
+        return page(symbol, "2024-01-02T15:00:00Z", next_url)
+
+    def get_next_page(next_url):
+        symbol = next_url.rsplit("=", 1)[1]
+        if symbol in unavailable:
+            raise RuntimeError("Service unavailable")
+        return page(symbol, "2024-01-02T09:00:00Z")
+
+    def job_state():
+        with factory() as session:
+            return (
+                session.scalars(select(Job.status)).all(),
+                set(session.scalars(select(JobCheckpoint.ticker_id))),
+                dict(
+                    session.execute(
+                        select(NewsArticle.ticker_id, func.count()).group_by(
+                            NewsArticle.ticker_id
+                        )
+                    ).all()
+                ),
+                set(session.scalars(select(NewsWatermark.ticker_id))),
+            )
+
+    news_window = ("2024-01-01", "2024-01-02")
+    with patch.object(
+        PolygonClient, "get_news", side_effect=get_news
+    ) as news, patch.object(PolygonClient, "get_next_page", side_effect=get_next_page):
+        asyncio.run(pull_news_async(news_window, concurrency=2, full=True))
+        # MSFT failed after its first page, so it keeps the job open without a
+        # watermark; the invalid symbol is checkpointed as skipped
+        assert job_state() == ([RUNNING], {1, 3}, {1: 2, 2: 1}, {1})
+
+        unavailable.clear()
+        asyncio.run(pull_news_async(news_window, concurrency=2, full=True))
+
+    fetched = [call.args[0] for call in news.call_args_list]
+    assert sorted(fetched[:3]) == ["AAPL", "BAD$", "MSFT"]
+    # The resumed run only pulls the ticker that failed
+    assert fetched[3:] == ["MSFT"]
+    assert job_state() == ([COMPLETED], {1, 2, 3}, {1: 2, 2: 2}, {1, 2})
@@ -3,45 +3,100 @@ from unittest.mock import patch
 import pytest
 
 from sastocks.pull_sentiment import do_news_sentiment_analysis
+from sastocks.sentiment_backends import FakeBackend, Sentiment
 
 
 @pytest.fixture
 def mock_session():
-    with patch("sastocks.pull_sentiment.DatabaseSession") as mock:
-        yield mock
+    with patch("sastocks.pull_sentiment.unit_of_work") as mock:
+        session = mock.return_value.__enter__.return_value.session
+        session.execute.return_value.all.return_value = []
+        yield session
 
 
-@pytest.fixture
-def mock_sentiment_analyzer():
-    with patch("sastocks.pull_sentiment.sentiment_analyzer") as mock:
-        yield mock
-
-
-def test_do_news_sentiment_analysis(mock_session, mock_sentiment_analyzer):
-    # Arrange
-    # mock_db_session = mock_session.return_value.__enter__.return_value
-    # mock_article = NewsArticle(
-    #     id=1,
-    #     title="Test Article",
-    #     description="This is a test article for sentiment analysis.",
-    #     url="http://example.com/news/test-article",
-    #     author="Test Author",
-    #     keywords="test, article",
-    #     publisher="Test Publisher",
-    #     ticker=Ticker(id=1, symbol="TEST", name="Test Inc."),
-    #     gpt_sentiment=None
-    # )
-    # mock_db_session.query.return_value.filter.return_value.all.return_value = [mock_article]
-    # mock_sentiment_analyzer.invoke.return_value = {
-    #     "sentiment": "Positive",
-    #     "reason": "The test article is positive."
-    # }
-
-    # Act
-    do_news_sentiment_analysis()
-
-    # Assert
-    # mock_db_session.query.assert_called_with(NewsArticle)
-    # mock_db_session.query.return_value.filter.assert_called_with(NewsArticle.gpt_sentiment == None)
-    # mock_sentiment_analyzer.invoke.assert_called_once()
-    # assert mock_article.gpt_sentiment == "Positive", "The gpt_sentiment should be updated to 'Positive'"
+def test_do_news_sentiment_analysis(mock_session):
+    stats = do_news_sentiment_analysis(backend=FakeBackend(latency=0))
+
+    mock_session.execute.assert_called_once()
+    assert stats.scored == 0
+    assert stats.headlines_sent == 0
+
+
+def test_score_with_cache_only_sends_new_headlines():
+    from sastocks.pull_sentiment import score_with_cache
+    from sastocks.response_cache import ResponseCache
+
+    cache = ResponseCache(path=":memory:")
+    backend = FakeBackend(latency=0)
+    backend.cacheable = True
+    item = {"headline": "Record profits", "company_name": "Apple Inc.", "term": "short"}
+
+    with patch.object(backend, "score", wraps=backend.score) as score:
+        # The repeated headline is sent once, then served from the cache
+        first = score_with_cache([item, dict(item)], backend=backend, cache=cache)
+        second = score_with_cache([item], backend=backend, cache=cache)
+
+    assert first == [first[0], first[0]]
+    assert second == [first[0]]
+    score.assert_called_once()
+    assert score.call_args.args[0] == [item]
+    assert cache.snapshot()["hits"] == 1
+    cache.close()
+
+
+def test_score_with_cache_skips_backends_not_worth_caching():
+    from sastocks.pull_sentiment import score_with_cache
+    from sastocks.response_cache import ResponseCache
+
+    cache = ResponseCache(path=":memory:")
+    item = {"headline": "Record profits", "company_name": "Apple Inc.", "term": "short"}
+
+    results = score_with_cache([item], backend=FakeBackend(latency=0), cache=cache)
+
+    assert isinstance(results[0], Sentiment)
+    assert cache.snapshot()["writes"] == 0
+    cache.close()
+
+
+def test_group_key_shares_scores_within_a_cluster_and_company():
+    from types import SimpleNamespace
+
+    from sastocks.pull_sentiment import group_key
+
+    def row(id, cluster_id, company_name):
+        return SimpleNamespace(id=id, cluster_id=cluster_id, company_name=company_name)
+
+    assert group_key(row(1, 7, "Apple Inc.")) == group_key(row(2, 7, "Apple Inc."))
+    # The same story about another company is scored separately
+    assert group_key(row(1, 7, "Apple Inc.")) != group_key(row(3, 7, "Microsoft"))
+    # Unclustered articles are scored on their own
+    assert group_key(row(4, None, "Apple Inc.")) != group_key(
+        row(5, None, "Apple Inc.")
+    )
+
+
+def test_benchmark_backends_leave_the_gpt_columns_alone(session_factory):
+    from datetime import date
+
+    from sastocks.models import NewsArticle
+
+    with session_factory() as session:
+        session.add(
+            NewsArticle(
+                date=date(2024, 1, 2),
+                title="Record profits",
+                description="",
+                url="https://example.com/1",
+                author="Reporter",
+                keywords="",
+                publisher="Example News",
+                amp_url="",
+            )
+        )
+        session.commit()
+
+    stats = do_news_sentiment_analysis(backend=FakeBackend(latency=0))
+
+    assert stats.scored == 1
+    with session_factory() as session:
+        assert session.query(NewsArticle).one().gpt_sentiment is None
@@ -0,0 +1,68 @@
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import select
+
+from sastocks import pull_vader
+from sastocks.models import NewsArticle
+
+
+class FakeAnalyzer:
+    """Scores a text by its first word, like a one-word lexicon."""
+
+    scores = {"Record": 0.6, "Plant": -0.4}
+
+    def polarity_scores(self, text):
+        return {"compound": self.scores.get(text.split()[0], 0.0)}
+
+
+@pytest.fixture
+def fake_analyzer():
+    with patch.object(pull_vader, "load_vader_analyzer", FakeAnalyzer), patch.object(
+        pull_vader, "_analyzer", None
+    ):
+        yield
+
+
+def add_articles(factory, titles):
+    with factory() as session:
+        for i, title in enumerate(titles):
+            session.add(
+                NewsArticle(
+                    date=date(2024, 1, 2),
+                    title=title,
+                    description="Details.",
+                    url=f"https://example.com/{i}",
+                    author="Reporter",
+                    keywords="",
+                    publisher="Example News",
+                    amp_url="",
+                )
+            )
+        session.commit()
+
+
+def test_vader_label_thresholds():
+    assert pull_vader.vader_label(0.05) == "Good"
+    assert pull_vader.vader_label(0.0) == "Neutral"
+    assert pull_vader.vader_label(-0.05) == "Bad"
+
+
+def test_scores_every_article_in_batches(session_factory, fake_analyzer):
+    add_articles(session_factory, ["Record profits", "Plant closes", "New CEO"] * 3)
+
+    scored = pull_vader.do_vader_sentiment_analysis(
+        batch_size=4, workers=1, chunk_size=2
+    )
+
+    assert scored == 9
+    with session_factory() as session:
+        rows = session.execute(
+            select(NewsArticle.vader_compound, NewsArticle.vader_sentiment).order_by(
+                NewsArticle.id
+            )
+        ).all()
+    assert rows[:3] == [(0.6, "Good"), (-0.4, "Bad"), (0.0, "Neutral")]
+    # Scored articles are not picked up again
+    assert pull_vader.do_vader_sentiment_analysis(batch_size=4, workers=1) == 0
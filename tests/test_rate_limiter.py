@@ -0,0 +1,50 @@
+from unittest.mock import patch
+
+import pytest
+
+from sastocks.rate_limiter import RateLimiter, parse_rate_limit
+
+
+def test_parse_rate_limit():
+    assert parse_rate_limit("basic") == (5, 60)
+    assert parse_rate_limit("100/s") == (100, 1)
+    assert parse_rate_limit("5 / min") == (5, 60)
+    assert parse_rate_limit(None) is None
+
+    with pytest.raises(ValueError) as context:
+        parse_rate_limit("fast")
+    assert "Invalid rate limit" in str(context.value)
+
+
+def test_bucket_refills_at_configured_rate():
+    limiter = RateLimiter(2, 1)
+
+    assert limiter._reserve() == 0.0
+    assert limiter._reserve() == 0.0
+
+    # The bucket is empty, so the next request has to wait for about half a second
+    delay = limiter._reserve()
+    assert 0 < delay <= 0.5
+    assert limiter.snapshot()["requests"] == 2
+
+
+@patch("sastocks.rate_limiter.time.sleep")
+def test_acquire_sleeps_until_a_token_is_free(mock_sleep):
+    limiter = RateLimiter(1, 60)
+    limiter.acquire()
+    # Refill the bucket as soon as the limiter goes to sleep
+    mock_sleep.side_effect = lambda delay: setattr(limiter, "tokens", 1.0)
+
+    limiter.acquire()
+
+    mock_sleep.assert_called_once()
+    assert limiter.snapshot()["delayed"] == 1
+
+
+def test_throttle_blocks_every_caller():
+    limiter = RateLimiter()
+
+    limiter.throttle(30)
+
+    assert limiter._reserve() > 29
+    assert limiter.snapshot()["throttled"] == 1
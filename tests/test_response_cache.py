@@ -0,0 +1,106 @@
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from sastocks.polygon_client import BASE_URL, PolygonClient, TODAY_CACHE_TTL
+from sastocks.rate_limiter import RateLimiter
+from sastocks.response_cache import ResponseCache
+
+
+@pytest.fixture
+def cache():
+    cache = ResponseCache(path=":memory:")
+    yield cache
+    cache.close()
+
+
+def test_make_key_ignores_api_key_and_param_order():
+    key = ResponseCache.make_key(
+        f"{BASE_URL}/v1/indicators/rsi/AAPL", {"window": 14, "apiKey": "one"}
+    )
+
+    assert key == ResponseCache.make_key(
+        f"{BASE_URL}/v1/indicators/rsi/AAPL?apiKey=two", {"window": "14"}
+    )
+    assert key != ResponseCache.make_key(
+        f"{BASE_URL}/v1/indicators/rsi/AAPL", {"window": 20}
+    )
+
+
+def test_get_and_set(cache):
+    assert cache.get("missing") is None
+
+    cache.set("key", "/v1/open-close", {"status": "OK"})
+
+    assert cache.get("key") == {"status": "OK"}
+    assert cache.snapshot() == {"hits": 1, "misses": 1, "writes": 1, "evictions": 0}
+
+
+def test_expired_entries_are_misses(cache):
+    cache.set("key", "/v1/open-close", {"status": "OK"}, ttl=-1)
+
+    assert cache.get("key") is None
+
+
+def test_evicts_least_recently_used(cache):
+    cache.max_bytes = 40
+    cache.set("old", "/v1/open-close", {"value": "a" * 10})
+    cache.set("new", "/v1/open-close", {"value": "b" * 10})
+
+    assert cache.get("old") is None
+    assert cache.get("new") == {"value": "b" * 10}
+    assert cache.snapshot()["evictions"] == 1
+
+
+@patch("requests.Session.get")
+def test_client_caches_completed_days_forever(mock_get, cache):
+    mock_get.return_value = MagicMock(status_code=200)
+    mock_get.return_value.json.return_value = {"status": "OK", "close": 325.12}
+    client = PolygonClient(
+        api_key="test_api_key", rate_limiter=RateLimiter(), cache=cache
+    )
+
+    first = client.get_open_close("AAPL", "2023-01-09")
+    second = client.get_open_close("AAPL", "2023-01-09")
+
+    assert first == second == {"status": "OK", "close": 325.12}
+    mock_get.assert_called_once()
+    assert PolygonClient._date_ttl("2023-01-09") is None
+    assert PolygonClient._date_ttl("2999-01-01") == TODAY_CACHE_TTL
+    assert PolygonClient._date_ttl(None) == TODAY_CACHE_TTL
+
+
+def test_days_settle_after_the_new_york_close():
+    day = "2024-01-09"
+    # Already January 10 in Tokyo, but 11:00 in New York with the market open
+    trading = datetime(2024, 1, 9, 16, 0, tzinfo=timezone.utc)
+    # 18:30 in New York, inside the grace period after the close
+    evening = datetime(2024, 1, 9, 23, 30, tzinfo=timezone.utc)
+    next_morning = datetime(2024, 1, 10, 14, 0, tzinfo=timezone.utc)
+
+    assert PolygonClient._date_ttl(day, trading) == TODAY_CACHE_TTL
+    assert PolygonClient._date_ttl(day, evening) == TODAY_CACHE_TTL
+    assert PolygonClient._date_ttl(day, next_morning) is None
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"status": "OK", "resultsCount": 0, "results": []},
+        {"status": "DELAYED", "resultsCount": 1, "results": [{"T": "AAPL"}]},
+        {"status": "OK"},
+    ],
+)
+@patch("requests.Session.get")
+def test_empty_or_delayed_days_are_not_cached_forever(mock_get, cache, body):
+    mock_get.return_value = MagicMock(status_code=200)
+    mock_get.return_value.json.return_value = body
+    client = PolygonClient(
+        api_key="test_api_key", rate_limiter=RateLimiter(), cache=cache
+    )
+
+    with patch.object(cache, "set", wraps=cache.set) as cache_set:
+        client.get_grouped_daily("2023-01-09")
+
+    assert cache_set.call_args.kwargs["ttl"] == TODAY_CACHE_TTL
@@ -0,0 +1,119 @@
+import time
+from unittest.mock import patch
+
+import pytest
+
+from sastocks.sentiment_backends import (
+    FakeBackend,
+    SentimentBackend,
+    SentimentStats,
+    get_backend,
+    pack_inputs,
+    vader_answer,
+)
+
+
+def headlines(*titles, company_name="Apple Inc."):
+    return [
+        {"headline": title, "company_name": company_name, "term": "short"}
+        for title in titles
+    ]
+
+
+def test_pack_inputs_keeps_companies_apart():
+    inputs = headlines("Record profits", "New CEO", "Plant closes") + headlines(
+        "Cloud growth", company_name="Microsoft"
+    )
+
+    assert pack_inputs(inputs, 2) == [[0, 1], [2], [3]]
+
+
+def test_fake_backend_is_deterministic():
+    inputs = headlines("Record profits", "New CEO", "Plant closes")
+
+    first = FakeBackend(latency=0).score(inputs, concurrency=2)
+    second = FakeBackend(latency=0).score(list(reversed(inputs)), concurrency=1)
+
+    assert first == list(reversed(second))
+    assert {result.sentiment for result in first} <= {"YES", "NO", "UNKNOWN"}
+
+
+def test_fake_backend_runs_requests_concurrently_and_packs():
+    inputs = headlines(*(f"Headline {i}" for i in range(8)))
+    stats = SentimentStats()
+
+    started = time.perf_counter()
+    FakeBackend(latency=0.1).score(inputs, concurrency=4, stats=stats, pack_size=2)
+    elapsed = time.perf_counter() - started
+
+    # Four packs of two headlines, all in flight at once
+    assert stats.requests == 4
+    assert stats.headlines_sent == 8
+    assert stats.prompt_tokens > 0
+    assert elapsed < 0.3
+
+
+def test_fake_backend_failures_are_deterministic():
+    inputs = headlines(*(f"Headline {i}" for i in range(200)))
+
+    results = FakeBackend(latency=0, failure_rate=0.5).score(inputs, concurrency=8)
+    again = FakeBackend(latency=0, failure_rate=0.5).score(inputs, concurrency=8)
+
+    failed = [result is None for result in results]
+    assert failed == [result is None for result in again]
+    assert 50 < sum(failed) < 150
+
+
+def test_vader_answer_thresholds():
+    assert vader_answer(0.05) == "YES"
+    assert vader_answer(0.0) == "UNKNOWN"
+    assert vader_answer(-0.05) == "NO"
+
+
+def test_get_backend_rejects_unknown_names():
+    assert isinstance(get_backend("fake", latency=0), FakeBackend)
+    with pytest.raises(ValueError):
+        get_backend("bert")
+
+
+def test_backends_without_score_fail_when_created():
+    class Unfinished(SentimentBackend):
+        name = "unfinished"
+
+    with pytest.raises(TypeError):
+        Unfinished()
+
+
+def test_langchain_packed_results_fall_back_to_single_headlines():
+    pytest.importorskip("langchain")
+    from sastocks.sentiment_backends import LangChainBackend, Sentiment
+
+    backend = LangChainBackend(api_key="test")
+    inputs = headlines("Record profits", "New CEO", "Plant closes")
+
+    def packed(*results):
+        return type("Packed", (), {"results": list(results)})()
+
+    def item(index, sentiment):
+        return type(
+            "Item", (), {"index": index, "sentiment": sentiment, "reason": "Why."}
+        )()
+
+    stats = SentimentStats()
+    with patch.object(backend, "packed_analyzer") as packed_analyzer, patch.object(
+        backend, "sentiment_analyzer"
+    ) as sentiment_analyzer:
+        # The second pack comes back without a result for its headline
+        packed_analyzer.batch.return_value = [
+            packed(item(1, "YES"), item(2, "UNKNOWN")),
+            packed(),
+        ]
+        sentiment_analyzer.batch.return_value = [item(1, "NO")]
+        results = backend.score(inputs, concurrency=2, stats=stats, pack_size=2)
+
+    assert [result.sentiment for result in results] == ["YES", "UNKNOWN", "NO"]
+    assert isinstance(results[0], Sentiment)
+    assert sentiment_analyzer.batch.call_args.args[0] == [inputs[2]]
+    assert stats.requests == 3
+    # The retried headline is only counted once
+    assert stats.headlines_sent == 3
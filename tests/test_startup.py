@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+
+# Seconds the CLI may take to import, well above the ~0.15s it takes today
+IMPORT_BUDGET = float(os.environ.get("SASTOCKS_IMPORT_BUDGET", 1.0))
+
+HEAVY_MODULES = ("sqlalchemy", "requests", "numpy", "nltk", "langchain")
+
+PROBE = f"""
+import sys, time
+started = time.perf_counter()
+import sastocks.main
+elapsed = time.perf_counter() - started
+heavy = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+print(elapsed, ",".join(heavy))
+"""
+
+
+def run_probe():
+    env = dict(os.environ)
+    # Startup must not depend on the API key either
+    env.pop("POLYGON_API_KEY", None)
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    elapsed, heavy = result.stdout.split(" ")
+    return float(elapsed), heavy.strip()
+
+
+def test_cli_imports_no_heavy_dependencies():
+    _, heavy = run_probe()
+
+    assert heavy == ""
+
+
+def test_cli_import_stays_within_budget():
+    # The best of a few runs, to keep a busy machine from failing the test
+    elapsed = min(run_probe()[0] for _ in range(3))
+
+    assert elapsed < IMPORT_BUDGET
@@ -0,0 +1,39 @@
+from unittest.mock import MagicMock
+
+from sastocks.ticker_registry import TickerRecord, TickerRegistry
+
+RECORDS = [
+    TickerRecord(1, "AAPL", "Apple Inc."),
+    TickerRecord(2, "MSFT", "Microsoft Corp"),
+]
+
+
+def test_registry_loads_once_and_looks_up():
+    loader = MagicMock(return_value=RECORDS)
+    registry = TickerRegistry(ttl=0, loader=loader)
+
+    assert list(registry) == RECORDS
+    assert registry.get("msft") == RECORDS[1]
+    assert registry.by_id(1).name == "Apple Inc."
+    assert registry.get("NVDA") is None
+    assert len(registry) == 2
+    loader.assert_called_once()
+
+
+def test_registry_reloads_when_invalidated_or_stale():
+    loader = MagicMock(return_value=RECORDS)
+    now = [0.0]
+    registry = TickerRegistry(ttl=60, loader=loader, clock=lambda: now[0])
+
+    registry.records()
+    now[0] = 30
+    registry.records()
+    assert loader.call_count == 1
+
+    registry.invalidate()
+    registry.records()
+    assert loader.call_count == 2
+
+    now[0] = 100
+    registry.records()
+    assert loader.call_count == 3
@@ -1,64 +1,179 @@
-from unittest.mock import patch, MagicMock
+from unittest.mock import MagicMock, patch
+
 import pytest
-from sastocks.tickers import add_ticker
+from sqlalchemy import select
+
 from sastocks.models import Ticker
-from sastocks.polygon_client import PolygonClient
+from sastocks.tickers import (
+    add_ticker,
+    diff_tickers,
+    import_tickers,
+    read_ticker_csv,
+    sync_tickers,
+)
 
-@pytest.fixture
-def mock_session():
-    with patch("sastocks.tickers.DatabaseSession") as mock:
-        yield mock
 
 @pytest.fixture
 def mock_polygon_client():
     with patch("sastocks.tickers.PolygonClient") as mock:
         yield mock
 
-def test_add_valid_ticker(mock_session, mock_polygon_client):
-    # Arrange
-    mock_polygon_client_instance = mock_polygon_client.return_value
-    mock_polygon_client_instance.get_ticker_details.return_value = {
+
+def tickers(factory):
+    with factory() as session:
+        return session.execute(
+            select(Ticker.symbol, Ticker.name).order_by(Ticker.id)
+        ).all()
+
+
+def reference_client(*results):
+    client = MagicMock()
+    client.iter_tickers.return_value = [
+        {"ticker": symbol, "name": name} for symbol, name in results
+    ]
+    return client
+
+
+def test_add_valid_ticker(session_factory, mock_polygon_client):
+    mock_polygon_client.return_value.get_ticker_details.return_value = {
         "status": "OK",
-        "results": {"name": "Apple Inc."}
+        "results": {"name": "Apple Inc."},
     }
-    mock_db_session = mock_session.return_value.__enter__.return_value
-    mock_db_session.query.return_value.filter_by.return_value.first.return_value = None
 
-    # Act
     add_ticker("AAPL")
 
-    # Assert
-    mock_db_session.add.assert_called_once()
-    mock_db_session.commit.assert_called_once()
+    assert tickers(session_factory) == [("AAPL", "Apple Inc.")]
+
 
-def test_add_duplicate_ticker(mock_session, mock_polygon_client):
-    # Arrange
-    mock_polygon_client_instance = mock_polygon_client.return_value
-    mock_polygon_client_instance.get_ticker_details.return_value = {
+def test_add_duplicate_ticker(session_factory, mock_polygon_client):
+    mock_polygon_client.return_value.get_ticker_details.return_value = {
         "status": "OK",
-        "results": {"name": "Apple Inc."}
+        "results": {"name": "Apple Inc."},
     }
-    mock_db_session = mock_session.return_value.__enter__.return_value
-    mock_db_session.query.return_value.filter_by.return_value.first.return_value = Ticker(id=1, symbol="AAPL", name="Apple Inc.")
 
-    # Act
     add_ticker("AAPL")
+    add_ticker("AAPL")
+
+    assert tickers(session_factory) == [("AAPL", "Apple Inc.")]
 
-    # Assert
-    mock_db_session.add.assert_not_called()
-    mock_db_session.commit.assert_not_called()
 
-def test_add_invalid_ticker(mock_session, mock_polygon_client):
-    # Arrange
-    mock_polygon_client_instance = mock_polygon_client.return_value
-    mock_polygon_client_instance.get_ticker_details.return_value = {
+def test_add_ticker_stores_upper_case_symbols(session_factory, mock_polygon_client):
+    mock_polygon_client.return_value.get_ticker_details.return_value = {
+        "status": "OK",
+        "results": {"name": "Apple Inc."},
+    }
+    Ticker.create(symbol="msft", name="Microsoft Corp")
+
+    add_ticker("aapl")
+    add_ticker("MSFT")
+
+    assert tickers(session_factory) == [
+        ("msft", "Microsoft Corp"),
+        ("AAPL", "Apple Inc."),
+    ]
+
+
+def test_add_invalid_ticker(session_factory, mock_polygon_client):
+    mock_polygon_client.return_value.get_ticker_details.return_value = {
         "status": "ERROR",
-        "error": "Invalid ticker symbol"
+        "error": "Invalid ticker symbol",
     }
 
-    # Act
     add_ticker("INVALID")
 
-    # Assert
-    mock_session.return_value.__enter__.return_value.add.assert_not_called()
-    mock_session.return_value.__enter__.return_value.commit.assert_not_called()
\ No newline at end of file
+    assert tickers(session_factory) == []
+
+
+def test_read_ticker_csv(tmp_path):
+    path = tmp_path / "tickers.csv"
+    path.write_bytes(
+        b"Company number,Company name,ticker\r\n"
+        b"1,Apple Inc.,AAPL\r\n"
+        b"2,Berkshire Hathaway, brk.b \r\n"
+        b"3,,\r\n"
+    )
+
+    assert read_ticker_csv(str(path)) == {
+        "AAPL": "Apple Inc.",
+        "BRK.B": "Berkshire Hathaway",
+    }
+
+
+def test_read_ticker_csv_requires_a_ticker_column(tmp_path):
+    path = tmp_path / "tickers.csv"
+    path.write_text("name\nApple Inc.\n")
+
+    with pytest.raises(ValueError):
+        read_ticker_csv(str(path))
+
+
+def test_diff_tickers():
+    existing = {"AAPL": (1, "Apple Inc."), "MSFT": (2, "Microsoft")}
+    wanted = {"AAPL": "Apple Inc.", "MSFT": "Microsoft Corp", "NVDA": "Nvidia Corp"}
+
+    inserts, updates = diff_tickers(existing, wanted)
+
+    assert inserts == [{"symbol": "NVDA", "name": "Nvidia Corp"}]
+    assert updates == [{"id": 2, "name": "Microsoft Corp"}]
+
+
+def test_import_tickers_looks_up_names_in_bulk(session_factory, tmp_path):
+    path = tmp_path / "tickers.csv"
+    path.write_text("ticker,name\nAAPL,Apple\nMSFT,Microsoft\nNOPE,Nope\n")
+    Ticker.create(symbol="AAPL", name="Apple")
+    client = reference_client(
+        ("AAPL", "Apple Inc."), ("MSFT", "Microsoft Corp"), ("NVDA", "Nvidia Corp")
+    )
+
+    added, renamed = import_tickers(str(path), polygon_client=client)
+
+    assert (added, renamed) == (1, 1)
+    client.get_ticker_details.assert_not_called()
+    assert tickers(session_factory) == [
+        ("AAPL", "Apple Inc."),
+        ("MSFT", "Microsoft Corp"),
+    ]
+
+
+def test_import_matches_stored_symbols_in_any_case(session_factory, tmp_path):
+    path = tmp_path / "tickers.csv"
+    path.write_text("ticker,name\nAAPL,Apple Inc.\n")
+    Ticker.create(symbol="aapl", name="Apple")
+
+    assert import_tickers(str(path), lookup=False) == (0, 1)
+    assert tickers(session_factory) == [("aapl", "Apple Inc.")]
+
+
+def test_import_tickers_without_lookup(session_factory, tmp_path, mock_polygon_client):
+    path = tmp_path / "tickers.csv"
+    path.write_text("symbol\nAAPL\nMSFT\n")
+
+    import_tickers(str(path), lookup=False)
+
+    mock_polygon_client.assert_not_called()
+    assert tickers(session_factory) == [("AAPL", "AAPL"), ("MSFT", "MSFT")]
+
+
+def test_sync_tickers_renames_and_keeps_inactive(session_factory):
+    Ticker.create(symbol="AAPL", name="Apple")
+    Ticker.create(symbol="GONE", name="Delisted Inc.")
+    client = reference_client(("AAPL", "Apple Inc."), ("MSFT", "Microsoft Corp"))
+
+    assert sync_tickers(polygon_client=client) == 1
+
+    assert tickers(session_factory) == [
+        ("AAPL", "Apple Inc."),
+        ("GONE", "Delisted Inc."),
+    ]
+
+
+def test_import_invalidates_the_ticker_registry(session_factory, tmp_path):
+    from sastocks.ticker_registry import ticker_registry
+
+    assert len(ticker_registry) == 0
+    path = tmp_path / "tickers.csv"
+    path.write_text("ticker\nAAPL\n")
+
+    import_tickers(str(path), lookup=False)
+
+    assert ticker_registry.get("AAPL").name == "AAPL"